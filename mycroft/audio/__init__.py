@@ -13,16 +13,114 @@
 # limitations under the License.
 #
 import time
+from threading import Condition
 
 from mycroft.util.signal import check_for_signal, create_signal
 
 
+class SpeakingState:
+    """Speaking state of the audio service, pushed over the messagebus.
+
+    The audio service emits "mycroft.audio.speaking" whenever speech starts
+    or ends. Once bound to a bus connection the state is tracked locally and
+    waiting threads are woken immediately on changes instead of polling the
+    isSpeaking signal.
+
+    A speak request which hasn't started playing yet counts as pending
+    speech for up to PENDING_TIMEOUT seconds, replacing the fixed delay
+    previously used to let queued speech begin. The end of speech clears
+    pending requests, the audio service reports it once its queue is empty.
+    """
+    PENDING_TIMEOUT = 0.3
+
+    def __init__(self):
+        self.bus = None
+        self.condition = Condition()
+        self.speaking = False
+        self._requested_at = 0.0
+        self._started_at = 0.0
+
+    @property
+    def bound(self):
+        return self.bus is not None
+
+    def bind(self, bus):
+        """Track the speaking state using a messagebus connection.
+
+        Arguments:
+            bus: connected messagebus client
+        """
+        self.bus = bus
+        bus.on('mycroft.audio.speaking', self.handle_speaking)
+        bus.on('speak', self.handle_speak)
+        # Fetch the current state in case speech is already ongoing
+        from mycroft.messagebus.message import Message
+        bus.emit(Message('mycroft.audio.is_speaking'))
+
+    def handle_speaking(self, message):
+        with self.condition:
+            self.speaking = message.data.get('speaking', False)
+            if self.speaking:
+                self._started_at = time.monotonic()
+            else:
+                # Speak requests handled while speaking have been played
+                self._requested_at = 0.0
+            self.condition.notify_all()
+
+    def handle_speak(self, _):
+        self.speak_requested()
+
+    def speak_requested(self):
+        """Mark that speech has been requested but not started yet."""
+        with self.condition:
+            self._requested_at = time.monotonic()
+            self.condition.notify_all()
+
+    def _pending_time_left(self):
+        """Seconds to keep waiting for requested speech to start."""
+        if self._requested_at <= self._started_at:
+            return 0.0
+        return self._requested_at + self.PENDING_TIMEOUT - time.monotonic()
+
+    def is_speaking(self):
+        with self.condition:
+            return self.speaking
+
+    def wait_while_speaking(self, timeout=None):
+        """Block until speaking has ended.
+
+        Arguments:
+            timeout (float): max seconds to wait, None waits indefinitely
+
+        Returns:
+            bool: False if the timeout expired while still speaking
+        """
+        end_time = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                pending = self._pending_time_left()
+                if not self.speaking and pending <= 0:
+                    return True
+                wait_time = None if self.speaking else pending
+                if end_time is not None:
+                    time_left = end_time - time.monotonic()
+                    if time_left <= 0:
+                        return False
+                    wait_time = min(wait_time or time_left, time_left)
+                self.condition.wait(wait_time)
+
+
+speaking_state = SpeakingState()
+
+
 def is_speaking():
     """Determine if Text to Speech is occurring
 
     Returns:
         bool: True while still speaking
     """
+    if speaking_state.bound:
+        return speaking_state.is_speaking()
     return check_for_signal("isSpeaking", -1)
 
 
@@ -33,6 +131,10 @@ def wait_while_speaking():
     briefly to ensure that any preceeding request to speak has time to
     begin.
     """
+    if speaking_state.bound:
+        speaking_state.wait_while_speaking()
+        return
+
     time.sleep(0.3)  # Wait briefly in for any queued speech to begin
     while is_speaking():
         time.sleep(0.1)
@@ -41,13 +143,18 @@ def wait_while_speaking():
 def stop_speaking():
     # TODO: Less hacky approach to this once Audio Manager is implemented
     # Skills should only be able to stop speech they've initiated
-    from mycroft.messagebus.send import send
     create_signal('stoppingTTS')
-    send('mycroft.audio.speech.stop')
+    if speaking_state.bound:
+        from mycroft.messagebus.message import Message
+        speaking_state.bus.emit(Message('mycroft.audio.speech.stop'))
+        speaking_state.wait_while_speaking()
+    else:
+        from mycroft.messagebus.send import send
+        send('mycroft.audio.speech.stop')
 
-    # Block until stopped
-    while check_for_signal("isSpeaking", -1):
-        time.sleep(0.25)
+        # Block until stopped
+        while check_for_signal("isSpeaking", -1):
+            time.sleep(0.25)
 
     # This consumes the signal
     check_for_signal('stoppingTTS')
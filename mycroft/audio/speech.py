@@ -14,11 +14,11 @@
 #
 import re
 import time
-from threading import Lock
+from threading import Lock, Thread
 
 from mycroft.configuration import Configuration
 from mycroft.metrics import report_timing, Stopwatch
-from mycroft.tts import TTSFactory
+from mycroft.tts import TTSFactory, cache_handler
 from mycroft.util import check_for_signal
 from mycroft.util.log import LOG
 from mycroft.messagebus.message import Message
@@ -112,10 +112,13 @@ def mute_and_speak(utterance, ident, listen=False):
         # Stop tts playback thread
         tts.playback.stop()
         tts.playback.join()
+        tts.pipeline.shutdown()
         # Create new tts instance
         tts = TTSFactory.create()
         tts.init(bus)
+        tts.synthesis_error_handler = handle_synthesis_error
         tts_hash = hash(str(config.get('tts', '')))
+        start_prewarm(tts)
 
     LOG.info("Speak: " + utterance)
     try:
@@ -127,6 +130,25 @@ def mute_and_speak(utterance, ident, listen=False):
         LOG.error('TTS execution failed ({})'.format(repr(e)))
 
 
+def start_prewarm(tts):
+    """Pre-warm the TTS cache with dialogs in the background.
+
+    Which dialogs are pre-warmed is set by "prewarm" in the tts config.
+    """
+    prewarm = config.get('tts', {}).get('prewarm', 'core')
+    if prewarm not in ('core', 'all'):
+        return
+    Thread(target=cache_handler.prewarm_tts, args=(tts, prewarm == 'all', 2),
+           daemon=True).start()
+
+
+def handle_synthesis_error(utterance, ident, error):
+    """Fall back to mimic if a remote TTS failed to synthesize a chunk."""
+    if isinstance(error, RemoteTTSTimeoutException):
+        LOG.error(error)
+        mimic_fallback_tts(utterance, ident)
+
+
 def mimic_fallback_tts(utterance, ident):
     global mimic_fallback_obj
     # fallback if connection is lost
@@ -153,6 +175,12 @@ def handle_stop(event):
         bus.emit(Message("mycroft.stop.handled", {"by": "TTS"}))
 
 
+def handle_is_speaking(event):
+    """Reply with the current speaking state."""
+    speaking = check_for_signal("isSpeaking", -1)
+    bus.emit(event.reply('mycroft.audio.speaking', {'speaking': speaking}))
+
+
 def init(messagebus):
     """Start speech related handlers.
 
@@ -171,10 +199,13 @@ def init(messagebus):
     bus.on('mycroft.stop', handle_stop)
     bus.on('mycroft.audio.speech.stop', handle_stop)
     bus.on('speak', handle_speak)
+    bus.on('mycroft.audio.is_speaking', handle_is_speaking)
 
     tts = TTSFactory.create()
     tts.init(bus)
+    tts.synthesis_error_handler = handle_synthesis_error
     tts_hash = hash(str(config.get('tts', '')))
+    start_prewarm(tts)
 
 
 def shutdown():
@@ -185,6 +216,8 @@ def shutdown():
     if tts:
         tts.playback.stop()
         tts.playback.join()
+        tts.pipeline.shutdown()
     if mimic_fallback_obj:
         mimic_fallback_obj.playback.stop()
         mimic_fallback_obj.playback.join()
+        mimic_fallback_obj.pipeline.shutdown()
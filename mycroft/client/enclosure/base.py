@@ -13,8 +13,10 @@
 # limitations under the License.
 #
 from collections import namedtuple
+from functools import partial
 from threading import Lock
 
+from mycroft.audio import speaking_state
 from mycroft.configuration import Configuration
 from mycroft.messagebus.client import MessageBusClient
 from mycroft.util import create_daemon
@@ -61,6 +63,8 @@ class Enclosure:
     def __init__(self):
         # Establish Enclosure's websocket connection to the messagebus
         self.bus = MessageBusClient()
+        # Track the speaking state once connected
+        self.bus.once('open', partial(speaking_state.bind, self.bus))
 
         # Load full config
         Configuration.set_config_update_handlers(self.bus)
@@ -23,7 +23,7 @@ import serial
 import mycroft.dialog
 from mycroft.client.enclosure.base import Enclosure
 from mycroft.api import has_been_paired
-from mycroft.audio import wait_while_speaking
+from mycroft.audio import speaking_state, wait_while_speaking
 from mycroft.client.enclosure.mark1.arduino import EnclosureArduino
 from mycroft.client.enclosure.mark1.eyes import EnclosureEyes
 from mycroft.client.enclosure.mark1.mouth import EnclosureMouth
@@ -161,6 +161,7 @@ class EnclosureReader(Thread):
             self.bus.emit(Message("system.wifi.setup", {'lang': self.lang}))
 
         if "unit.factory-reset" in data:
+            speaking_state.speak_requested()
             self.bus.emit(Message("speak", {
                 'utterance': mycroft.dialog.get("reset to factory defaults")}))
             subprocess.call(
@@ -22,6 +22,7 @@ from mycroft.identity import IdentityManager
 from mycroft.lock import Lock as PIDLock  # Create/Support PID locking file
 from mycroft.messagebus.client import MessageBusClient
 from mycroft.messagebus.message import Message
+from mycroft.metrics.tracing import start_trace
 from mycroft.util import create_daemon, wait_for_exit_signal, \
     reset_sigint_handler, create_echo_function
 from mycroft.util.log import LOG
@@ -66,7 +67,8 @@ def handle_utterance(event):
     if 'ident' in event:
         ident = event.pop('ident')
         context['ident'] = ident
-    bus.emit(Message('recognizer_loop:utterance', event, context))
+    bus.emit(start_trace(Message('recognizer_loop:utterance', event, context),
+                         context.get('ident')))
 
 
 def handle_unknown():
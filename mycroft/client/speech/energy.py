@@ -0,0 +1,175 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Audio energy (loudness) estimation used by the speech client.
+
+The estimators compute the RMS of raw PCM audio, either one chunk at a time
+or for a block of consecutive chunks in one call. The listener measures
+one chunk at a time, where audioop has the least overhead per call, so it's
+the default. The numpy estimator is faster for blocks of chunks and is used
+where audioop isn't available (it's removed in newer Pythons).
+"""
+import math
+
+from mycroft.util.log import LOG
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import audioop
+except ImportError:
+    audioop = None
+
+
+class EnergyEstimator:
+    """Base class for audio energy estimators.
+
+    Energies are calculated as the integer root mean square of the samples,
+    the same value audioop.rms() would return.
+    """
+    def calc_energy(self, chunk, sample_width):
+        """Calculate the energy of a chunk of audio.
+
+        Arguments:
+            chunk (bytes): raw audio data
+            sample_width (int): bytes per sample
+
+        Returns:
+            int: RMS of the audio samples
+        """
+        raise NotImplementedError
+
+    def calc_energies(self, data, sample_width, chunk_size):
+        """Calculate the energy for each chunk in a block of audio.
+
+        Arguments:
+            data (bytes): raw audio data containing consecutive chunks
+            sample_width (int): bytes per sample
+            chunk_size (int): number of bytes in each chunk, a trailing
+                              partial chunk gets its own energy value
+
+        Returns:
+            list: RMS for each chunk
+        """
+        data = memoryview(data)
+        return [self.calc_energy(data[i:i + chunk_size], sample_width)
+                for i in range(0, len(data), chunk_size)]
+
+
+class AudioopEnergyEstimator(EnergyEstimator):
+    """Energy estimator using the audioop module."""
+    def calc_energy(self, chunk, sample_width):
+        return audioop.rms(chunk, sample_width)
+
+
+class NumpyEnergyEstimator(EnergyEstimator):
+    """Energy estimator using numpy, processing blocks in a single pass."""
+    DTYPES = {1: 'int8', 2: 'int16', 4: 'int32'}
+
+    def _samples(self, data, sample_width):
+        if sample_width not in self.DTYPES:
+            raise ValueError('Unsupported sample width: '
+                             '{}'.format(sample_width))
+        samples = numpy.frombuffer(data, dtype=self.DTYPES[sample_width])
+        return samples.astype(numpy.float64)
+
+    def calc_energy(self, chunk, sample_width):
+        if not len(chunk):
+            return 0
+        samples = self._samples(chunk, sample_width)
+        return int(math.sqrt(samples.dot(samples) / len(samples)))
+
+    def calc_energies(self, data, sample_width, chunk_size):
+        num_full = len(data) // chunk_size
+        full_size = num_full * chunk_size
+        energies = []
+        if num_full:
+            samples = self._samples(memoryview(data)[:full_size],
+                                    sample_width)
+            samples = samples.reshape(num_full, -1)
+            mean_squares = numpy.einsum('ij,ij->i', samples, samples)
+            mean_squares /= samples.shape[1]
+            energies = [int(e) for e in numpy.sqrt(mean_squares)]
+        if full_size < len(data):
+            energies.append(self.calc_energy(memoryview(data)[full_size:],
+                                             sample_width))
+        return energies
+
+
+class RollingMean:
+    """Average of the most recent values in a fixed size window.
+
+    The mean is maintained incrementally so adding a value is O(1)
+    regardless of the window size. While the window is filling up the
+    value is the sum of the values seen divided by the full window size.
+
+    Arguments:
+        num_samples (int): size of the window
+    """
+    def __init__(self, num_samples):
+        self.num_samples = num_samples
+        self.values = []
+        self.index = 0
+        self.value = 0.0
+
+    @property
+    def is_full(self):
+        return len(self.values) >= self.num_samples
+
+    def append(self, value):
+        """Add a value to the window, dropping the oldest when full."""
+        if not self.is_full:
+            self.values.append(value)
+            self.value += float(value) / self.num_samples
+        else:
+            self.value -= float(self.values[self.index]) / self.num_samples
+            self.value += float(value) / self.num_samples
+            self.values[self.index] = value
+            self.index = (self.index + 1) % self.num_samples
+
+
+ESTIMATORS = {
+    'numpy': NumpyEnergyEstimator,
+    'audioop': AudioopEnergyEstimator
+}
+
+
+def create_energy_estimator(name=None):
+    """Create an energy estimator.
+
+    Arguments:
+        name (str): 'numpy' or 'audioop', if not specified audioop is
+                    used if it's available.
+
+    Returns:
+        EnergyEstimator: the estimator
+    """
+    default = 'audioop' if audioop else 'numpy'
+    name = name or default
+    if name not in ESTIMATORS:
+        LOG.error('Unknown energy estimator {}'.format(name))
+        name = default
+    if name == 'numpy' and not numpy:
+        LOG.warning('numpy is not installed, falling back to audioop')
+        name = 'audioop'
+    if name == 'audioop' and not audioop:
+        if numpy:
+            name = 'numpy'
+        else:
+            raise ImportError('No energy estimator available, '
+                              'please install numpy')
+    return ESTIMATORS[name]()
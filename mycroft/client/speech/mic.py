@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import audioop
 from time import sleep, time as get_time
 
 from collections import deque
@@ -34,6 +33,8 @@ from tempfile import gettempdir
 from threading import Thread, Lock
 
 from mycroft.api import DeviceApi
+from mycroft.client.speech.energy import create_energy_estimator, RollingMean
+from mycroft.client.speech.vad import create_vad
 from mycroft.configuration import Configuration
 from mycroft.session import SessionManager
 from mycroft.util import (
@@ -185,26 +186,100 @@ def get_silence(num_bytes):
     return b'\0' * num_bytes
 
 
+class CyclicAudioBuffer:
+    """A fixed size audio buffer backed by a preallocated bytearray.
+
+    Appending data never reallocates, the oldest audio is overwritten once
+    the buffer is full. Every write is mirrored into a second copy of the
+    buffer so that the most recent data can always be returned as a single
+    contiguous memoryview without copying.
+
+    Arguments:
+        size (int): Number of bytes of audio to keep
+        initial_data (bytes): optional data to start the buffer with
+    """
+    def __init__(self, size, initial_data=None):
+        self.size = size
+        self._buffer = bytearray(2 * size)
+        self._view = memoryview(self._buffer)
+        self._pos = 0  # position of the next write
+        self._length = 0  # number of valid bytes in the buffer
+        if initial_data:
+            self.append(initial_data)
+
+    def __len__(self):
+        return self._length
+
+    def clear(self):
+        """Forget all data in the buffer."""
+        self._pos = 0
+        self._length = 0
+
+    def _write(self, start, data):
+        """Write data at start and at the mirrored position."""
+        end = start + len(data)
+        self._view[start:end] = data
+        self._view[start + self.size:end + self.size] = data
+
+    def append(self, data):
+        """Add new audio data to the end of the buffer.
+
+        Arguments:
+            data (bytes): audio data to append
+        """
+        size = self.size
+        num_bytes = len(data)
+        if num_bytes >= size:
+            # Only the tail of the data fits
+            self._write(0, memoryview(data)[num_bytes - size:])
+            self._pos = 0
+            self._length = size
+            return
+
+        first = min(num_bytes, size - self._pos)
+        data = memoryview(data)
+        self._write(self._pos, data[:first])
+        if first < num_bytes:
+            self._write(0, data[first:])
+        self._pos = (self._pos + num_bytes) % size
+        self._length = min(size, self._length + num_bytes)
+
+    def get_last(self, num_bytes):
+        """Get the most recent audio as a contiguous view.
+
+        The view is only valid until the next append, convert it using
+        bytes() if it needs to be kept.
+
+        Arguments:
+            num_bytes (int): Number of bytes to return, capped at the amount
+                             of data in the buffer.
+
+        Returns:
+            (memoryview) the latest num_bytes bytes of audio
+        """
+        num_bytes = min(num_bytes, self._length)
+        # The mirrored copy guarantees that the range [pos, pos + size)
+        # contains the whole buffer in order
+        end = self._pos + self.size
+        return self._view[end - num_bytes:end]
+
+    def get(self):
+        """Get the entire buffer content as bytes.
+
+        Returns:
+            (bytes) all audio in the buffer
+        """
+        return bytes(self.get_last(self._length))
+
+
 class ResponsiveRecognizer(speech_recognition.Recognizer):
     # Padding of silence when feeding to pocketsphinx
     SILENCE_SEC = 0.01
 
-    # The minimum seconds of noise before a
-    # phrase can be considered complete
-    MIN_LOUD_SEC_PER_PHRASE = 0.5
-
-    # The minimum seconds of silence required at the end
-    # before a phrase will be considered complete
-    MIN_SILENCE_AT_END = 0.25
-
     # The maximum seconds a phrase can be recorded,
     # provided there is noise the entire time
     RECORDING_TIMEOUT = 10.0
 
-    # The maximum time it will continue to record silence
-    # when not enough noise has been detected
-    RECORDING_TIMEOUT_WITH_SILENCE = 3.0
-
     # Time between pocketsphinx checks for the wake word
     SEC_BETWEEN_WW_CHECKS = 0.2
 
@@ -222,6 +297,9 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         self.audio = pyaudio.PyAudio()
         self.multiplier = listener_config.get('multiplier')
         self.energy_ratio = listener_config.get('energy_ratio')
+        self.energy_estimator = create_energy_estimator(
+            listener_config.get('energy_estimator'))
+        self.vad = create_vad(listener_config.get('vad'))
         # check the config for the flag to save wake words.
 
         self.save_utterances = listener_config.get('save_utterances', False)
@@ -267,9 +345,8 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
     def record_sound_chunk(self, source):
         return source.stream.read(source.CHUNK, self.overflow_exc)
 
-    @staticmethod
-    def calc_energy(sound_chunk, sample_width):
-        return audioop.rms(sound_chunk, sample_width)
+    def calc_energy(self, sound_chunk, sample_width):
+        return self.energy_estimator.calc_energy(sound_chunk, sample_width)
 
     def _record_phrase(
         self,
@@ -298,34 +375,12 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                        silence at the end of the user's utterance
         """
 
-        num_loud_chunks = 0
-        noise = 0
-
-        max_noise = 25
-        min_noise = 0
-
-        silence_duration = 0
-
-        def increase_noise(level):
-            if level < max_noise:
-                return level + 200 * sec_per_buffer
-            return level
-
-        def decrease_noise(level):
-            if level > min_noise:
-                return level - 100 * sec_per_buffer
-            return level
-
-        # Smallest number of loud chunks required to return
-        min_loud_chunks = int(self.MIN_LOUD_SEC_PER_PHRASE / sec_per_buffer)
-
         # Maximum number of chunks to record before timing out
         max_chunks = int(self.RECORDING_TIMEOUT / sec_per_buffer)
         num_chunks = 0
 
-        # Will return if exceeded this even if there's not enough loud chunks
-        max_chunks_of_silence = int(self.RECORDING_TIMEOUT_WITH_SILENCE /
-                                    sec_per_buffer)
+        self.vad.reset(source.SAMPLE_RATE, source.SAMPLE_WIDTH,
+                       sec_per_buffer)
 
         # bytearray to store audio in
         byte_data = get_silence(source.SAMPLE_WIDTH)
@@ -347,30 +402,13 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
             energy = self.calc_energy(chunk, source.SAMPLE_WIDTH)
             test_threshold = self.energy_threshold * self.multiplier
-            is_loud = energy > test_threshold
-            if is_loud:
-                noise = increase_noise(noise)
-                num_loud_chunks += 1
-            else:
-                noise = decrease_noise(noise)
+            phrase_complete = self.vad.update(chunk, energy, test_threshold)
+            if energy <= test_threshold:
                 self._adjust_threshold(energy, sec_per_buffer)
 
             if num_chunks % 10 == 0:
                 self.write_mic_level(energy, source)
 
-            was_loud_enough = num_loud_chunks > min_loud_chunks
-
-            quiet_enough = noise <= min_noise
-            if quiet_enough:
-                silence_duration += sec_per_buffer
-                if silence_duration < self.MIN_SILENCE_AT_END:
-                    quiet_enough = False  # gotta be silent for min of 1/4 sec
-            else:
-                silence_duration = 0
-            recorded_too_much_silence = num_chunks > max_chunks_of_silence
-            if quiet_enough and (was_loud_enough or recorded_too_much_silence):
-                phrase_complete = True
-
             # Pressing top-button will end recording immediately
             if check_for_signal('buttonPress'):
                 phrase_complete = True
@@ -462,25 +500,23 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
         silence = get_silence(num_silent_bytes)
 
-        # bytearray to store audio in
-        byte_data = silence
-
         buffers_per_check = self.SEC_BETWEEN_WW_CHECKS / sec_per_buffer
         buffers_since_check = 0.0
 
-        # Max bytes for byte_data before audio is removed from the front
+        # Max bytes of audio to keep, older audio is overwritten
         max_size = self.sec_to_bytes(self.SAVED_WW_SEC, source)
         test_size = self.sec_to_bytes(self.TEST_WW_SEC, source)
 
+        # Preallocated ring buffer to store audio in
+        audio_buffer = CyclicAudioBuffer(max_size, silence)
+
         said_wake_word = False
 
         # Rolling buffer to track the audio energy (loudness) heard on
         # the source recently.  An average audio energy is maintained
         # based on these levels.
-        energies = []
-        idx_energy = 0
-        avg_energy = 0.0
         energy_avg_samples = int(5 / sec_per_buffer)  # avg over last 5 secs
+        energies = RollingMean(energy_avg_samples)
         counter = 0
 
         # These are frames immediately after wake word is detected
@@ -497,19 +533,12 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             if energy < self.energy_threshold * self.multiplier:
                 self._adjust_threshold(energy, sec_per_buffer)
 
-            if len(energies) < energy_avg_samples:
-                # build the average
-                energies.append(energy)
-                avg_energy += float(energy) / energy_avg_samples
-            else:
-                # maintain the running average and rolling buffer
-                avg_energy -= float(energies[idx_energy]) / energy_avg_samples
-                avg_energy += float(energy) / energy_avg_samples
-                energies[idx_energy] = energy
-                idx_energy = (idx_energy + 1) % energy_avg_samples
-
+            # maintain the running average and rolling buffer
+            was_full = energies.is_full
+            energies.append(energy)
+            if was_full:
                 # maintain the threshold using average
-                if energy < avg_energy * 1.5:
+                if energy < energies.value * 1.5:
                     if energy > self.energy_threshold:
                         # bump the threshold to just above this value
                         self.energy_threshold = energy * 1.2
@@ -521,20 +550,15 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             counter += 1
 
             # At first, the buffer is empty and must fill up.  After that
-            # just drop the first chunk bytes to keep it the same size.
-            needs_to_grow = len(byte_data) < max_size
-            if needs_to_grow:
-                byte_data += chunk
-            else:  # Remove beginning of audio and add new chunk to end
-                byte_data = byte_data[len(chunk):] + chunk
+            # the oldest audio is overwritten in place.
+            audio_buffer.append(chunk)
 
             buffers_since_check += 1.0
             self.wake_word_recognizer.update(chunk)
             if buffers_since_check > buffers_per_check:
                 buffers_since_check -= buffers_per_check
-                chopped = byte_data[-test_size:] \
-                    if test_size < len(byte_data) else byte_data
-                audio_data = chopped + silence
+                chopped = audio_buffer.get_last(test_size)
+                audio_data = b''.join((chopped, silence))
                 said_wake_word = \
                     self.wake_word_recognizer.found_wake_word(audio_data)
 
@@ -549,6 +573,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
                     audio = None
                     mtd = None
+                    byte_data = audio_buffer.get()
                     if self.save_wake_words:
                         # Save wake word locally
                         audio = self._create_audio_data(byte_data, source)
@@ -0,0 +1,258 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Voice activity detection used to find the end of a spoken phrase.
+
+The detector is selected by the "vad" section of the listener config:
+
+    "vad": {
+        "module": "spectral",   // "spectral", "energy" or "legacy"
+        "silence_sec": 0.5,     // silence ending the phrase
+        "min_speech_sec": 0.3   // speech needed before silence ends it
+    }
+"""
+from mycroft.util.log import LOG
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class VAD:
+    """Base class for voice activity detectors.
+
+    The detector is fed the recorded audio chunk by chunk and decides if
+    each chunk contains speech. The phrase is complete once min_speech_sec
+    of speech has been followed by silence_sec of silence. If no speech is
+    heard the phrase ends after timeout_with_silence seconds.
+
+    Arguments:
+        config (dict): the listener vad configuration
+    """
+    def __init__(self, config=None):
+        config = config or {}
+        self.min_speech_sec = config.get('min_speech_sec', 0.3)
+        self.silence_sec = config.get('silence_sec', 0.5)
+        self.timeout_with_silence = config.get('timeout_with_silence', 3.0)
+
+        self.sample_rate = 16000
+        self.sample_width = 2
+        self.sec_per_buffer = 0.064
+        self.speech_sec = 0.0
+        self.silence_duration = 0.0
+        self.recorded_sec = 0.0
+
+    def reset(self, sample_rate, sample_width, sec_per_buffer):
+        """Prepare for the recording of a new phrase.
+
+        Arguments:
+            sample_rate (int): sample rate of the audio
+            sample_width (int): bytes per sample
+            sec_per_buffer (float): seconds of audio in each chunk
+        """
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.sec_per_buffer = sec_per_buffer
+        self.speech_sec = 0.0
+        self.silence_duration = 0.0
+        self.recorded_sec = 0.0
+
+    def is_speech(self, chunk, energy, threshold):
+        """Determine if a chunk of audio contains speech.
+
+        Arguments:
+            chunk (bytes): raw audio data
+            energy (int): energy of the chunk
+            threshold (float): current energy threshold for speech
+
+        Returns:
+            bool: True if speech was detected
+        """
+        raise NotImplementedError
+
+    def update(self, chunk, energy, threshold):
+        """Process the next chunk of the phrase.
+
+        Arguments:
+            chunk (bytes): raw audio data
+            energy (int): energy of the chunk
+            threshold (float): current energy threshold for speech
+
+        Returns:
+            bool: True when the phrase is complete
+        """
+        self.recorded_sec += self.sec_per_buffer
+        if self.is_speech(chunk, energy, threshold):
+            self.speech_sec += self.sec_per_buffer
+            self.silence_duration = 0.0
+            return False
+
+        self.silence_duration += self.sec_per_buffer
+        if self.silence_duration < self.silence_sec:
+            return False
+        return (self.speech_sec >= self.min_speech_sec or
+                self.recorded_sec > self.timeout_with_silence)
+
+
+class EnergyVAD(VAD):
+    """Treat every chunk louder than the energy threshold as speech."""
+    def is_speech(self, chunk, energy, threshold):
+        return energy > threshold
+
+
+class SpectralVAD(VAD):
+    """Frame level detector using energy and the speech band spectrum.
+
+    The chunk is split into short frames. A frame contains speech if it's
+    louder than the threshold and most of its energy is inside the speech
+    band, which rejects loud low frequency hum and broadband noise. The
+    chunk is speech if at least half of its frames are.
+
+    Without numpy this falls back to the energy threshold only.
+    """
+    def __init__(self, config=None):
+        super().__init__(config)
+        config = config or {}
+        self.frame_sec = config.get('frame_sec', 0.02)
+        self.band = config.get('speech_band', [300, 3400])
+        self.min_band_ratio = config.get('min_band_ratio', 0.5)
+        self._window = None
+        self._band_mask = None
+        if not numpy:
+            LOG.warning('numpy is not installed, spectral VAD will only '
+                        'use the energy threshold')
+
+    def reset(self, sample_rate, sample_width, sec_per_buffer):
+        super().reset(sample_rate, sample_width, sec_per_buffer)
+        if numpy:
+            frame_len = max(1, int(self.frame_sec * sample_rate))
+            self._window = numpy.hanning(frame_len)
+            freqs = numpy.fft.rfftfreq(frame_len, 1.0 / sample_rate)
+            self._band_mask = ((freqs >= self.band[0]) &
+                               (freqs <= self.band[1]))
+
+    def _frames(self, chunk):
+        dtype = {1: 'int8', 2: 'int16', 4: 'int32'}[self.sample_width]
+        samples = numpy.frombuffer(chunk, dtype=dtype).astype(numpy.float64)
+        frame_len = len(self._window)
+        num_frames = len(samples) // frame_len
+        return samples[:num_frames * frame_len].reshape(num_frames, -1)
+
+    def is_speech(self, chunk, energy, threshold):
+        if energy <= threshold:
+            return False
+        if not numpy or self._window is None:
+            return True
+
+        frames = self._frames(chunk)
+        if len(frames) == 0:
+            return True  # Too short for spectral analysis
+        frame_energy = numpy.sqrt(numpy.mean(frames ** 2, axis=1))
+        power = numpy.abs(numpy.fft.rfft(frames * self._window, axis=1)) ** 2
+        total = power.sum(axis=1)
+        band = power[:, self._band_mask].sum(axis=1)
+        ratio = band / numpy.maximum(total, 1e-9)
+        speech = (frame_energy > threshold) & (ratio >= self.min_band_ratio)
+        return 2 * int(speech.sum()) >= len(speech)
+
+
+class LegacyVAD(VAD):
+    """The noise counter previously built into ResponsiveRecognizer.
+
+    Loud chunks increase a noise level and quiet chunks decrease it, the
+    phrase ends once the level has been at its minimum for
+    MIN_SILENCE_AT_END and enough loud chunks were heard.
+    """
+    # The minimum seconds of noise before a
+    # phrase can be considered complete
+    MIN_LOUD_SEC_PER_PHRASE = 0.5
+
+    # The minimum seconds of silence required at the end
+    # before a phrase will be considered complete
+    MIN_SILENCE_AT_END = 0.25
+
+    # The maximum time it will continue to record silence
+    # when not enough noise has been detected
+    RECORDING_TIMEOUT_WITH_SILENCE = 3.0
+
+    max_noise = 25
+    min_noise = 0
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.noise = 0
+        self.num_loud_chunks = 0
+        self.num_chunks = 0
+
+    def reset(self, sample_rate, sample_width, sec_per_buffer):
+        super().reset(sample_rate, sample_width, sec_per_buffer)
+        self.noise = 0
+        self.num_loud_chunks = 0
+        self.num_chunks = 0
+
+    def is_speech(self, chunk, energy, threshold):
+        return energy > threshold
+
+    def update(self, chunk, energy, threshold):
+        sec_per_buffer = self.sec_per_buffer
+        # Smallest number of loud chunks required to return
+        min_loud_chunks = int(self.MIN_LOUD_SEC_PER_PHRASE / sec_per_buffer)
+        # Will return if exceeded this even if there's not enough loud chunks
+        max_chunks_of_silence = int(self.RECORDING_TIMEOUT_WITH_SILENCE /
+                                    sec_per_buffer)
+        self.num_chunks += 1
+
+        if self.is_speech(chunk, energy, threshold):
+            if self.noise < self.max_noise:
+                self.noise += 200 * sec_per_buffer
+            self.num_loud_chunks += 1
+        elif self.noise > self.min_noise:
+            self.noise -= 100 * sec_per_buffer
+
+        was_loud_enough = self.num_loud_chunks > min_loud_chunks
+
+        quiet_enough = self.noise <= self.min_noise
+        if quiet_enough:
+            self.silence_duration += sec_per_buffer
+            if self.silence_duration < self.MIN_SILENCE_AT_END:
+                quiet_enough = False  # gotta be silent for min of 1/4 sec
+        else:
+            self.silence_duration = 0
+        recorded_too_much_silence = self.num_chunks > max_chunks_of_silence
+        return quiet_enough and (was_loud_enough or recorded_too_much_silence)
+
+
+VADS = {
+    'spectral': SpectralVAD,
+    'energy': EnergyVAD,
+    'legacy': LegacyVAD
+}
+
+
+def create_vad(config=None):
+    """Create the voice activity detector defined in the config.
+
+    Arguments:
+        config (dict): the listener vad configuration
+
+    Returns:
+        VAD: the detector, SpectralVAD if no valid module is specified
+    """
+    config = config or {}
+    module = config.get('module', 'spectral')
+    if module not in VADS:
+        LOG.error('Unknown VAD module {}, using spectral'.format(module))
+        module = 'spectral'
+    return VADS[module](config)
@@ -0,0 +1,339 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Message bus client running on an asyncio event loop.
+
+Handlers are called in the event loop instead of a thread pool:
+
+    async def handle_query(message):  # Scheduled as a task
+        ...
+    bus.on('question:query', handle_query)
+
+    def handle_speak(message):  # Called directly, mustn't block
+        ...
+    bus.on('speak', handle_speak)
+
+    # Blocking handlers are run in an executor
+    bus.on('skill.download', download, executor=ThreadPoolExecutor(2))
+
+Waiting for a response only takes a future, so thousands of requests can
+be in flight at the same time:
+
+    responses = await asyncio.gather(*[bus.wait_for_response(m)
+                                       for m in messages])
+
+Messages emitted while disconnected are buffered, up to max_buffer
+messages, and sent when the connection is restored.
+"""
+import asyncio
+from collections import defaultdict, deque
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from tornado.httpclient import HTTPClientError
+from tornado.websocket import WebSocketClosedError, websocket_connect
+
+from mycroft.messagebus.load_config import load_message_bus_config
+from mycroft.messagebus.message import Message
+from mycroft.metrics.tracing import get_tracer
+from mycroft.util.log import LOG
+from .client import CORRELATION_ID, MessageBusClient
+
+
+class _Handler:
+    def __init__(self, func, once=False, executor=None):
+        self.func = func
+        self.once = once
+        self.executor = executor
+
+
+class _ResponseWaiter:
+    def __init__(self, reply_type, count, future):
+        self.reply_type = reply_type
+        self.count = count
+        self.future = future
+        self.responses = []
+
+    def add(self, message):
+        if self.future.done():
+            return
+        self.responses.append(message)
+        if self.count and len(self.responses) >= self.count:
+            self.future.set_result(self.responses)
+
+
+class AsyncMessageBusClient:
+    """Client for the Mycroft message bus using asyncio.
+
+    Arguments:
+        host, port, route, ssl: override the websocket configuration
+        subscriptions (list): message types the bus should send to this
+                              client, None for all messages
+        compact (bool): use the compact binary message format
+        max_buffer (int): max number of messages buffered while
+                          disconnected, the oldest are dropped
+    """
+    RECONNECT_DELAY = 5
+    MAX_RECONNECT_DELAY = 60
+
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 subscriptions=None, compact=False, max_buffer=1000):
+        config_overrides = dict(host=host, port=port, route=route, ssl=ssl)
+        self.config = load_message_bus_config(**config_overrides)
+        self.subscriptions = subscriptions
+        self.compact = compact
+        self.tracer = get_tracer()
+
+        self.handlers = defaultdict(list)
+        self.buffer = deque(maxlen=max_buffer)
+        self.dropped = 0
+        self.connection = None
+        self.retry = self.RECONNECT_DELAY
+        self._waiters = {}  # correlation id -> _ResponseWaiter
+        self._waiters_by_type = defaultdict(set)
+        self._run_task = None
+        self._closed = False
+
+    @property
+    def connected(self):
+        return self.connection is not None
+
+    @property
+    def url(self):
+        url = MessageBusClient.build_url(
+            ssl=self.config.ssl,
+            host=self.config.host,
+            port=self.config.port,
+            route=self.config.route
+        )
+        query = {}
+        if self.subscriptions is not None:
+            query['subscribe'] = ','.join(self.subscriptions)
+        if self.compact:
+            query['format'] = 'compact'
+        return url + ('?' + urlencode(query) if query else '')
+
+    def run_in_background(self):
+        """Start connecting in a task of the current event loop."""
+        self._run_task = asyncio.ensure_future(self.run_forever())
+        return self._run_task
+
+    async def run_forever(self):
+        """Connect and dispatch messages, reconnecting when disconnected."""
+        self._closed = False
+        self.retry = self.RECONNECT_DELAY
+        while not self._closed:
+            try:
+                self.connection = await websocket_connect(self.url)
+            except (OSError, HTTPClientError, WebSocketClosedError) as e:
+                LOG.warning('Could not connect to the message bus ({}), '
+                            'retrying in {} seconds'.format(repr(e),
+                                                            self.retry))
+                await asyncio.sleep(self.retry)
+                self.retry = min(self.retry * 2, self.MAX_RECONNECT_DELAY)
+                continue
+
+            LOG.info('Connected')
+            self.retry = self.RECONNECT_DELAY
+            self._dispatch_event('open')
+            self._flush_buffer()
+            while True:
+                message = await self.connection.read_message()
+                if message is None:
+                    break
+                self.on_message(message)
+
+            self.connection = None
+            self._dispatch_event('close')
+            if not self._closed:
+                LOG.warning('Message bus connection lost, reconnecting')
+                self._dispatch_event('reconnecting')
+
+    def close(self):
+        """Disconnect and stop reconnecting."""
+        self._closed = True
+        if self.connection:
+            self.connection.close()
+        for waiter in self._waiters.values():
+            if not waiter.future.done():
+                waiter.future.set_result(waiter.responses)
+
+    def on_message(self, message):
+        if isinstance(message, bytes):
+            parsed_message = Message.deserialize_compact(message)
+            if self.handlers['message']:
+                self._dispatch_event('message', parsed_message.serialize())
+        else:
+            parsed_message = Message.deserialize(message)
+            self._dispatch_event('message', message)
+        if self.tracer:
+            self.tracer.on_receive(parsed_message)
+        self._resolve_waiters(parsed_message)
+        self._dispatch_event(parsed_message.msg_type, parsed_message)
+
+    def _dispatch_event(self, event_name, *args):
+        handlers = self.handlers.get(event_name)
+        if not handlers:
+            return
+        for handler in list(handlers):
+            if handler.once:
+                self._remove_handler(event_name, handler)
+            try:
+                if handler.executor is not None:
+                    loop = asyncio.get_event_loop()
+                    loop.run_in_executor(handler.executor, handler.func,
+                                         *args)
+                elif asyncio.iscoroutinefunction(handler.func):
+                    asyncio.ensure_future(handler.func(*args))
+                else:
+                    handler.func(*args)
+            except Exception as e:
+                LOG.exception('Handler of {} failed ({})'.format(event_name,
+                                                                 repr(e)))
+
+    def emit(self, message):
+        """Send a message, buffering it while disconnected.
+
+        Arguments:
+            message (Message): message to send
+        """
+        if self.tracer:
+            self.tracer.on_emit(message)
+        if self.connection is not None:
+            try:
+                self._write(message)
+                return
+            except WebSocketClosedError:
+                pass
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+            LOG.warning('Message bus buffer full, dropping {}'.format(
+                self.buffer[0].msg_type))
+        self.buffer.append(message)
+
+    def _write(self, message):
+        if self.compact:
+            self.connection.write_message(message.serialize_compact(),
+                                          binary=True)
+        else:
+            self.connection.write_message(message.serialize())
+
+    def _flush_buffer(self):
+        while self.buffer and self.connection is not None:
+            message = self.buffer.popleft()
+            try:
+                self._write(message)
+            except WebSocketClosedError:
+                self.buffer.appendleft(message)
+                break
+
+    async def wait_for_response(self, message, reply_type=None,
+                                timeout=None):
+        """Send a message and wait for a response.
+
+        Arguments:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.msg_type>.response".
+            timeout: seconds to wait before timeout, defaults to 3
+        Returns:
+            The received message or None if the response timed out
+        """
+        responses = await self.wait_for_responses(message, reply_type, 1,
+                                                  timeout)
+        return responses[0] if responses else None
+
+    async def wait_for_responses(self, message, reply_type=None,
+                                 count=None, timeout=None):
+        """Send a message and collect the responses.
+
+        Responses are matched to the request by a new correlation id set
+        in the context, responses without an id are accepted by every
+        request waiting for the reply type.
+
+        Arguments:
+            message (Message): message to send
+            reply_type (str): the message type of the expected replies.
+                              Defaults to "<message.msg_type>.response".
+            count (int): return as soon as this many responses are
+                         received, None collects responses until timeout
+            timeout: seconds to wait for the responses, defaults to 3
+        Returns:
+            list of received messages, in the order they arrived
+        """
+        correlation_id = str(uuid4())
+        message.context[CORRELATION_ID] = correlation_id
+        reply_type = reply_type or message.msg_type + '.response'
+        waiter = _ResponseWaiter(reply_type, count,
+                                 asyncio.get_event_loop().create_future())
+        self._waiters[correlation_id] = waiter
+        self._waiters_by_type[reply_type].add(waiter)
+        try:
+            self.emit(message)
+            await asyncio.wait_for(asyncio.shield(waiter.future),
+                                   timeout or 3.0)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.pop(correlation_id, None)
+            self._waiters_by_type[reply_type].discard(waiter)
+            if not self._waiters_by_type[reply_type]:
+                del self._waiters_by_type[reply_type]
+        return list(waiter.responses)
+
+    def _resolve_waiters(self, message):
+        reply_id = message.context.get(CORRELATION_ID) \
+            if self._waiters else None
+        if reply_id is not None:
+            waiter = self._waiters.get(reply_id)
+            if waiter and waiter.reply_type == message.msg_type:
+                waiter.add(message)
+        elif message.msg_type in self._waiters_by_type:
+            for waiter in list(self._waiters_by_type[message.msg_type]):
+                waiter.add(message)
+
+    def on(self, event_name, func, executor=None):
+        """Register a handler.
+
+        Coroutine functions are run as tasks, other functions are called
+        in the event loop unless an executor is given.
+
+        Arguments:
+            event_name (str): message type or 'open', 'close', 'message'
+            func (callable): the handler
+            executor (Executor): run func in this executor
+        """
+        self.handlers[event_name].append(_Handler(func, False, executor))
+
+    def once(self, event_name, func, executor=None):
+        """Register a handler called for the next event only."""
+        self.handlers[event_name].append(_Handler(func, True, executor))
+
+    def remove(self, event_name, func):
+        for handler in self.handlers.get(event_name, []):
+            if handler.func == func:
+                self._remove_handler(event_name, handler)
+                return
+
+    def _remove_handler(self, event_name, handler):
+        handlers = self.handlers.get(event_name, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.handlers.pop(event_name, None)
+
+    def remove_all_listeners(self, event_name):
+        if event_name is None:
+            raise ValueError
+        self.handlers.pop(event_name, None)
@@ -13,28 +13,131 @@
 # limitations under the License.
 #
 import json
+import os
 import time
 import traceback
-from threading import Event
+from threading import Event, Lock
+from urllib.parse import urlencode
+from uuid import uuid4
 
 from websocket import (
+    ABNF,
     WebSocketApp,
     WebSocketConnectionClosedException,
     WebSocketException
 )
 
+from mycroft.configuration import Configuration
 from mycroft.messagebus.load_config import load_message_bus_config
+from mycroft.messagebus.local_transport import LocalSocketApp, is_local_host
 from mycroft.messagebus.message import Message
+from mycroft.metrics.tracing import get_tracer
 from mycroft.util import create_echo_function
 from mycroft.util.log import LOG
+from .handler_executor import HandlerExecutor
 from .threaded_event_emitter import ThreadedEventEmitter
 
+# Context key matching replies to the request they answer
+CORRELATION_ID = 'correlation_id'
+
+
+class MessageWaiter:
+    """Collect replies of a message type from the bus.
+
+    The handler is registered when the waiter is created so replies sent
+    right after the request aren't missed. If a correlation id is given,
+    replies carrying a different id are ignored. Responders creating the
+    reply with Message.reply() or Message.response() keep the context, and
+    so the id, of the request. Replies without an id are always accepted.
+
+    Arguments:
+        bus (MessageBusClient): bus to listen on
+        msg_type (str): message type of the replies
+        correlation_id (str): id of the request, None accepts any reply
+        count (int): number of replies to wait for, None collects replies
+                     until the timeout
+    """
+    def __init__(self, bus, msg_type, correlation_id=None, count=1):
+        self.bus = bus
+        self.msg_type = msg_type
+        self.correlation_id = correlation_id
+        self.count = count
+        self.responses = []
+        self._lock = Lock()
+        self._done = Event()
+        bus.on(msg_type, self._handler)
+
+    def _handler(self, message):
+        reply_id = message.context.get(CORRELATION_ID)
+        if (self.correlation_id is not None and reply_id is not None and
+                reply_id != self.correlation_id):
+            return
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.responses.append(message)
+            if self.count and len(self.responses) >= self.count:
+                self._done.set()
+
+    def wait(self, timeout=3.0):
+        """Wait for the replies and stop listening.
+
+        Arguments:
+            timeout (float): seconds to wait for the replies
+
+        Returns:
+            list: the received replies, fewer than count on timeout
+        """
+        try:
+            self._done.wait(timeout)
+        finally:
+            self.remove()
+        with self._lock:
+            self._done.set()
+            return list(self.responses)
+
+    def remove(self):
+        """Stop listening for replies."""
+        try:
+            self.bus.emitter.remove_listener(self.msg_type, self._handler)
+        except (ValueError, KeyError):
+            # Already removed
+            pass
+
 
 class MessageBusClient:
-    def __init__(self, host=None, port=None, route=None, ssl=None):
+    """Client for the Mycroft message bus.
+
+    Arguments:
+        host, port, route, ssl: override the websocket configuration
+        subscriptions (list): message types (or glob patterns like
+                              "mycroft.audio.*") the bus should send to
+                              this client, None for all messages
+        compact (bool): use the compact binary message format, message
+                        data is then only parsed when used by a handler
+        executor (HandlerExecutor): runs the handlers, defaults to one
+                                    using the "handlers" websocket config
+
+    If the bus is on the local host and has a Unix socket ("local_socket"
+    in the websocket config) the client connects to the socket, unless
+    host or port are overridden.
+    """
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 subscriptions=None, compact=False, executor=None):
         config_overrides = dict(host=host, port=port, route=route, ssl=ssl)
         self.config = load_message_bus_config(**config_overrides)
-        self.emitter = ThreadedEventEmitter()
+        self.subscriptions = subscriptions
+        self.compact = compact
+        self.tracer = get_tracer()
+        websocket_config = Configuration.get().get('websocket') or {}
+        if executor is None:
+            executor = HandlerExecutor.from_config(
+                websocket_config.get('handlers'))
+        self.local_socket = None
+        if not (host or port or self.config.ssl) and \
+                is_local_host(self.config.host):
+            self.local_socket = websocket_config.get('local_socket')
+        self.emitter = ThreadedEventEmitter(executor=executor)
         self.client = self.create_client()
         self.retry = 5
         self.connected_event = Event()
@@ -49,12 +152,30 @@ class MessageBusClient:
             route=route)
 
     def create_client(self):
+        if self.local_socket and os.path.exists(self.local_socket):
+            return LocalSocketApp(
+                self.local_socket,
+                self.subscriptions,
+                self.compact,
+                on_open=self.on_open,
+                on_close=self.on_close,
+                on_error=self.on_error,
+                on_message=self.on_message
+            )
+
         url = MessageBusClient.build_url(
             ssl=self.config.ssl,
             host=self.config.host,
             port=self.config.port,
             route=self.config.route
         )
+        query = {}
+        if self.subscriptions is not None:
+            query['subscribe'] = ','.join(self.subscriptions)
+        if self.compact:
+            query['format'] = 'compact'
+        if query:
+            url += '?' + urlencode(query)
         return WebSocketApp(
             url,
             on_open=self.on_open,
@@ -75,6 +196,15 @@ class MessageBusClient:
 
     def on_error(self, error):
         """ On error start trying to reconnect to the websocket. """
+        if isinstance(self.client, LocalSocketApp) and \
+                not self.connected_event.is_set():
+            LOG.warning('Could not connect to {} ({}), using the '
+                        'websocket'.format(self.local_socket, repr(error)))
+            self.local_socket = None
+            self.client = self.create_client()
+            self.run_forever()
+            return
+
         if isinstance(error, WebSocketConnectionClosedException):
             LOG.warning('Could not send message because connection has closed')
         else:
@@ -100,8 +230,15 @@ class MessageBusClient:
             pass
 
     def on_message(self, message):
-        parsed_message = Message.deserialize(message)
-        self.emitter.emit('message', message)
+        if isinstance(message, bytes):
+            parsed_message = Message.deserialize_compact(message)
+            if self.emitter.listeners('message'):
+                self.emitter.emit('message', parsed_message.serialize())
+        else:
+            parsed_message = Message.deserialize(message)
+            self.emitter.emit('message', message)
+        if self.tracer:
+            self.tracer.on_receive(parsed_message)
         self.emitter.emit(parsed_message.msg_type, parsed_message)
 
     def emit(self, message):
@@ -111,8 +248,13 @@ class MessageBusClient:
                                  'before emitting messages')
             self.connected_event.wait()
 
+        if self.tracer and hasattr(message, 'context'):
+            self.tracer.on_emit(message)
         try:
-            if hasattr(message, 'serialize'):
+            if self.compact and hasattr(message, 'serialize_compact'):
+                self.client.send(message.serialize_compact(),
+                                 ABNF.OPCODE_BINARY)
+            elif hasattr(message, 'serialize'):
                 self.client.send(message.serialize())
             else:
                 self.client.send(json.dumps(message.__dict__))
@@ -131,31 +273,51 @@ class MessageBusClient:
         Returns:
             The received message or None if the response timed out
         """
-        response = []
-
-        def handler(message):
-            """Receive response data."""
-            response.append(message)
-
-        # Setup response handler
-        self.once(reply_type or message.msg_type + '.response', handler)
-        # Send request
-        self.emit(message)
-        # Wait for response
-        start_time = time.monotonic()
-        while len(response) == 0:
-            time.sleep(0.2)
-            if time.monotonic() - start_time > (timeout or 3.0):
-                try:
-                    self.remove(reply_type, handler)
-                except (ValueError, KeyError):
-                    # ValueError occurs on pyee 1.0.1 removing handlers
-                    # registered with once.
-                    # KeyError may theoretically occur if the event occurs as
-                    # the handler is removed
-                    pass
-                return None
-        return response[0]
+        responses = self.wait_for_responses(message, reply_type, 1, timeout)
+        return responses[0] if responses else None
+
+    def wait_for_responses(self, message, reply_type=None, count=None,
+                           timeout=None):
+        """Send a message and collect the responses.
+
+        A new correlation id is set in the message context so responses to
+        other requests of the same type are ignored. An id inherited from
+        the message the request was derived from is replaced, as it's
+        shared by every request derived from that message.
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected replies.
+                              Defaults to "<message.msg_type>.response".
+            count (int): return as soon as this many responses are
+                         received, None collects responses until timeout
+            timeout: seconds to wait for the responses, defaults to 3
+        Returns:
+            list of received messages, in the order they arrived
+        """
+        correlation_id = str(uuid4())
+        message.context[CORRELATION_ID] = correlation_id
+        waiter = MessageWaiter(self, reply_type or message.msg_type +
+                               '.response', correlation_id, count)
+        try:
+            self.emit(message)
+        except Exception:
+            waiter.remove()
+            raise
+        return waiter.wait(timeout or 3.0)
+
+    def subscribe(self, message_types):
+        """Change the message types the bus sends to this client.
+
+        Replies awaited with wait_for_response() must be included.
+
+        Args:
+            message_types (list): message types or glob patterns, None to
+                                  receive all messages
+        """
+        self.subscriptions = message_types
+        self.emit(Message('mycroft.bus.subscribe',
+                          {'message_types': message_types}))
 
     def on(self, event_name, func):
         self.emitter.on(event_name, func)
@@ -0,0 +1,334 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Run message bus handlers in lanes of worker threads.
+
+Each lane has its own queue and threads so handlers blocking in one lane
+(waiting for a response, a slow network call...) don't hold up the others:
+
+    configured lanes: handlers of events matching glob patterns
+    <skill id>: handlers registered by a skill, the handler functions
+                created by the skill base classes have a skill_id attribute
+    default: all other handlers, and the handlers of system events like
+             mycroft.stop so a skill with blocked handlers still stops
+
+Lanes are configured in the "handlers" entry of the "websocket" config:
+
+    "handlers": {
+        "threads": 10,        // threads of the default lane
+        "skill_threads": 4,   // threads of each skill lane, 0 to run skill
+                              // handlers in the default lane
+        "system_events": ["mycroft.stop", "mycroft.skill.*"],
+                              // skill handlers run in the default lane
+        "lanes": {            // extra lanes
+            "audio": {"threads": 2, "events": ["mycroft.audio.*"]}
+        },
+        "budget": 30          // seconds, longer running handlers are logged
+    }
+
+Threads are started when needed, up to the size of the lane. A watchdog
+thread logs handlers running longer than the budget and lanes where
+handlers have been waiting that long. stats() returns the queue depth
+and handler durations of each lane and event.
+"""
+import time
+from collections import deque
+from fnmatch import fnmatchcase
+from threading import Condition, Event, Lock, Thread, current_thread
+
+from mycroft.util.log import LOG
+
+DEFAULT_LANE = 'default'
+SYSTEM_EVENTS = ['mycroft.stop', 'mycroft.skill.*']
+
+
+def _handler_name(func):
+    return getattr(func, '__qualname__', None) or repr(func)
+
+
+class _Task:
+    def __init__(self, event, func, args, kwargs):
+        self.event = event
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.queued = time.monotonic()
+        self.started = None
+        self.warned = False
+
+
+class HandlerStats:
+    """Number and duration of handler calls."""
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, duration, failed=False):
+        self.count += 1
+        self.failed += failed
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+    def as_dict(self):
+        return {'count': self.count, 'failed': self.failed,
+                'mean': self.total_time / self.count if self.count else 0.0,
+                'max': self.max_time}
+
+
+class HandlerLane:
+    """Queue of handlers run by up to a number of threads.
+
+    Arguments:
+        name (str): name of the lane, used in logs and stats
+        threads (int): max number of handlers running at the same time
+        on_done (callable): called with the task, its duration and if it
+                            failed after each handler
+    """
+    def __init__(self, name, threads, on_done=None):
+        self.name = name
+        self.threads = max(threads, 1)
+        self.on_done = on_done
+        self.queue = deque()
+        self.running = {}  # thread -> task
+        self.workers = []
+        self.idle = 0
+        self.max_depth = 0
+        self.stats = HandlerStats()
+        self.stall_warned = 0.0
+        self._closed = False
+        self._cond = Condition()
+
+    def submit(self, task):
+        with self._cond:
+            if self._closed:
+                return
+            self.queue.append(task)
+            self.max_depth = max(self.max_depth, len(self.queue))
+            # Idle workers already notified still count as idle until they
+            # take their task, so the queue length is compared
+            if len(self.queue) > self.idle and \
+                    len(self.workers) < self.threads:
+                worker = Thread(target=self._work, daemon=True,
+                                name='{} handlers'.format(self.name))
+                self.workers.append(worker)
+                worker.start()
+            else:
+                self._cond.notify()
+
+    def _work(self):
+        thread = current_thread()
+        while True:
+            with self._cond:
+                self.idle += 1
+                while not self.queue and not self._closed:
+                    self._cond.wait()
+                self.idle -= 1
+                if self._closed:
+                    return
+                task = self.queue.popleft()
+                task.started = time.monotonic()
+                self.running[thread] = task
+
+            failed = False
+            try:
+                task.func(*task.args, **task.kwargs)
+            except Exception as e:
+                failed = True
+                LOG.error('Handler {} of {} failed ({})'.format(
+                    _handler_name(task.func), task.event, repr(e)))
+            duration = time.monotonic() - task.started
+
+            with self._cond:
+                del self.running[thread]
+                self.stats.add(duration, failed)
+            if self.on_done:
+                self.on_done(task, duration, failed)
+
+    def snapshot(self):
+        """Get the queued and running tasks."""
+        with self._cond:
+            return list(self.queue), list(self.running.values())
+
+    def as_dict(self):
+        with self._cond:
+            stats = self.stats.as_dict()
+            stats.update(threads=self.threads, workers=len(self.workers),
+                         queued=len(self.queue), running=len(self.running),
+                         max_depth=self.max_depth)
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self.queue.clear()
+            self._cond.notify_all()
+
+
+class HandlerExecutor:
+    """Runs handlers of bus events in lanes, watching their duration.
+
+    Arguments:
+        threads (int): threads of the default lane
+        skill_threads (int): threads of each skill lane, 0 to run the
+                             handlers of skills in the default lane
+        lanes (dict): lane name -> {"threads": n, "events": [patterns]}
+        budget (float): seconds a handler may run or wait before it's
+                        logged, None disables the watchdog
+        system_events (list): patterns of events handled in the default
+                              lane instead of the skill lanes
+    """
+    MAX_EVENT_STATS = 1024
+    MAX_CACHED_LANES = 1024
+
+    def __init__(self, threads=10, skill_threads=4, lanes=None, budget=30,
+                 system_events=None):
+        self.skill_threads = skill_threads
+        self.system_events = SYSTEM_EVENTS if system_events is None \
+            else system_events
+        self.budget = budget
+        self.event_stats = {}
+        self.lanes = {DEFAULT_LANE: HandlerLane(DEFAULT_LANE, threads,
+                                                self._on_done)}
+        self.patterns = []
+        for name, lane_config in (lanes or {}).items():
+            self.lanes[name] = HandlerLane(name,
+                                           lane_config.get('threads', 1),
+                                           self._on_done)
+            self.patterns += [(pattern, name)
+                              for pattern in lane_config.get('events', [])]
+        self._pattern_lanes = {}  # event -> configured lane name or None
+        self._lock = Lock()
+        self._stop = Event()
+        self._watchdog = None
+
+    @staticmethod
+    def from_config(config):
+        """Create an executor from the "handlers" config."""
+        config = config or {}
+        return HandlerExecutor(config.get('threads', 10),
+                               config.get('skill_threads', 4),
+                               config.get('lanes'),
+                               config.get('budget', 30),
+                               config.get('system_events'))
+
+    def lane_name(self, event, func=None):
+        """Get the name of the lane running a handler of an event."""
+        try:
+            name = self._pattern_lanes[event]
+        except KeyError:
+            name = next((lane for pattern, lane in self.patterns
+                         if fnmatchcase(event, pattern)), None)
+            if name is None and any(fnmatchcase(event, pattern)
+                                    for pattern in self.system_events):
+                name = DEFAULT_LANE
+            # Event names are unbounded (response types...), only the first
+            # ones are cached
+            if len(self._pattern_lanes) < self.MAX_CACHED_LANES:
+                self._pattern_lanes[event] = name
+        if name is None:
+            skill_id = getattr(func, 'skill_id', None)
+            name = str(skill_id) if skill_id and self.skill_threads else \
+                DEFAULT_LANE
+        return name
+
+    def _get_lane(self, event, func):
+        name = self.lane_name(event, func)
+        lane = self.lanes.get(name)
+        if lane is None:
+            with self._lock:
+                lane = self.lanes.get(name)
+                if lane is None:
+                    lane = HandlerLane(name, self.skill_threads,
+                                       self._on_done)
+                    self.lanes[name] = lane
+        return lane
+
+    def submit(self, event, func, args=(), kwargs=None):
+        """Run a handler of an event in its lane."""
+        if self.budget and self._watchdog is None:
+            self._start_watchdog()
+        task = _Task(event, func, args, kwargs or {})
+        self._get_lane(event, func).submit(task)
+
+    def _on_done(self, task, duration, failed):
+        with self._lock:
+            stats = self.event_stats.get(task.event)
+            if stats is None:
+                if len(self.event_stats) >= self.MAX_EVENT_STATS:
+                    return
+                stats = self.event_stats[task.event] = HandlerStats()
+            stats.add(duration, failed)
+        if task.warned:
+            LOG.info('Handler {} of {} finished after {:.1f} s'.format(
+                _handler_name(task.func), task.event, duration))
+
+    def stats(self):
+        """Get the state of the lanes and the handler durations per event.
+
+        Returns:
+            dict: "lanes": lane name -> threads, queued, running,
+                  max_depth and handler count, failed, mean and max
+                  duration, "events": event -> handler count, failed,
+                  mean and max duration
+        """
+        with self._lock:
+            lanes = list(self.lanes.values())
+            events = {event: stats.as_dict()
+                      for event, stats in self.event_stats.items()}
+        return {'lanes': {lane.name: lane.as_dict() for lane in lanes},
+                'events': events}
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is None:
+                self._watchdog = Thread(target=self._watch, daemon=True,
+                                        name='handler watchdog')
+                self._watchdog.start()
+
+    def _watch(self):
+        interval = min(self.budget / 2, 1.0)
+        while not self._stop.wait(interval):
+            self.check()
+
+    def check(self):
+        """Log handlers and lanes exceeding the time budget."""
+        now = time.monotonic()
+        with self._lock:
+            lanes = list(self.lanes.values())
+        for lane in lanes:
+            queued, running = lane.snapshot()
+            for task in running:
+                if not task.warned and now - task.started > self.budget:
+                    task.warned = True
+                    LOG.warning('Handler {} of {} has been running for more '
+                                'than {} s in lane {}'.format(
+                                    _handler_name(task.func), task.event,
+                                    self.budget, lane.name))
+            if queued and now - queued[0].queued > self.budget and \
+                    now - lane.stall_warned > self.budget:
+                lane.stall_warned = now
+                LOG.warning('{} handlers waiting in lane {}, the oldest '
+                            '({}) for {:.1f} s'.format(
+                                len(queued), lane.name, queued[0].event,
+                                now - queued[0].queued))
+
+    def close(self):
+        """Stop the watchdog and the workers, dropping queued handlers."""
+        self._stop.set()
+        with self._lock:
+            lanes = list(self.lanes.values())
+        for lane in lanes:
+            lane.close()
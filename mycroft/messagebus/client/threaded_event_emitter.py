@@ -13,23 +13,28 @@
 # limitations under the License.
 #
 from pyee import EventEmitter
-from multiprocessing.pool import ThreadPool
 from collections import defaultdict
 
+from .handler_executor import HandlerExecutor
+
 
 class ThreadedEventEmitter(EventEmitter):
-    """ Event Emitter using the threadpool to run event functions in
+    """ Event Emitter using a HandlerExecutor to run event functions in
         separate threads.
+
+    Arguments:
+        threads (int): threads of the default lane if no executor is given
+        executor (HandlerExecutor): executor running the event functions
     """
-    def __init__(self, threads=10):
+    def __init__(self, threads=10, executor=None):
         super().__init__()
-        self.pool = ThreadPool(threads)
+        self.executor = executor or HandlerExecutor(threads)
         self.wrappers = defaultdict(list)
 
     def on(self, event, f=None):
         """ Wrap on with a threaded launcher. """
         def wrapped(*args, **kwargs):
-            return self.pool.apply_async(f, args, kwargs)
+            self.executor.submit(event, f, args, kwargs)
 
         w = super().on(event, wrapped)
         # Store mapping from function to wrapped function
@@ -39,7 +44,7 @@ class ThreadedEventEmitter(EventEmitter):
     def once(self, event, f=None):
         """ Wrap once with a threaded launcher. """
         def wrapped(*args, **kwargs):
-            return self.pool.apply_async(f, args, kwargs)
+            self.executor.submit(event, f, args, kwargs)
 
         wrapped = super().once(event, wrapped)
         self.wrappers[event].append((f, wrapped))
@@ -63,3 +68,7 @@ class ThreadedEventEmitter(EventEmitter):
         """
         super().remove_all_listeners(event_name)
         self.wrappers.pop(event_name)
+
+    def close(self):
+        """Stop the threads running the event functions."""
+        self.executor.close()
@@ -0,0 +1,171 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Message bus transport over a Unix domain socket.
+
+Processes on the same device as the bus service can connect to it through
+a Unix socket instead of the websocket, skipping TCP, the HTTP handshake
+and websocket framing and masking. Messages have the same json or compact
+format as on the websocket and are routed the same way.
+
+Each frame is a header followed by the message:
+
+    kind: unsigned byte, 1 for a json message, 2 for a compact message
+    length: unsigned int, big endian, length of the message in bytes
+
+The first frame sent by a client is a json object with the options of the
+connection, the query arguments of the websocket url:
+
+    {"subscribe": ["speak", "mycroft.audio.*"], "format": "compact"}
+
+The socket is configured by "local_socket" in the "websocket" config,
+MessageBusClient uses it when the bus host is the local host.
+"""
+import json
+import socket
+import struct
+from threading import Lock
+
+from websocket import ABNF, WebSocketConnectionClosedException
+
+from mycroft.util.log import LOG
+
+FRAME_HEADER = struct.Struct('!BI')
+JSON_FRAME = 1
+COMPACT_FRAME = 2
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '0.0.0.0', '::1')
+
+RECV_SIZE = 65536
+
+
+def encode_frame(message):
+    """Create a frame of a json (str) or compact (bytes) message."""
+    if isinstance(message, bytes):
+        return FRAME_HEADER.pack(COMPACT_FRAME, len(message)) + message
+    data = message.encode('utf-8')
+    return FRAME_HEADER.pack(JSON_FRAME, len(data)) + data
+
+
+def decode_frame(kind, data):
+    """Get the json (str) or compact (bytes) message of a frame."""
+    if kind == JSON_FRAME:
+        return data.decode('utf-8')
+    return bytes(data)
+
+
+def is_local_host(host):
+    return host in LOCAL_HOSTS or host == socket.gethostname()
+
+
+class LocalSocketApp:
+    """Client connection with the interface of websocket.WebSocketApp.
+
+    Arguments:
+        path (str): path of the bus socket
+        subscriptions (list): message types the bus should send, None for
+                              all messages
+        compact (bool): receive messages in the compact format
+        on_open, on_close, on_error, on_message: callbacks, like the ones
+                                                 of WebSocketApp
+    """
+    def __init__(self, path, subscriptions=None, compact=False,
+                 on_open=None, on_close=None, on_error=None,
+                 on_message=None):
+        self.path = path
+        self.url = 'unix://' + path
+        self.options = {'subscribe': subscriptions,
+                        'format': 'compact' if compact else 'json'}
+        self.on_open = on_open
+        self.on_close = on_close
+        self.on_error = on_error
+        self.on_message = on_message
+        self.sock = None
+        self.keep_running = False
+        self.send_lock = Lock()
+
+    def run_forever(self):
+        """Connect and call on_message with each message until closed."""
+        self.keep_running = True
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.path)
+            self.sock.sendall(encode_frame(json.dumps(self.options)))
+            self._callback(self.on_open)
+            self._read()
+        except Exception as e:
+            if self.keep_running:
+                self._teardown()
+                self._callback(self.on_error, e)
+                return
+        self._teardown()
+        self._callback(self.on_close)
+
+    def _read(self):
+        buf = bytearray()
+        header_size = FRAME_HEADER.size
+        while self.keep_running:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                if self.keep_running:
+                    raise WebSocketConnectionClosedException(
+                        'Connection closed by the bus')
+                return
+            buf += data
+            offset = 0
+            while len(buf) - offset >= header_size:
+                kind, length = FRAME_HEADER.unpack_from(buf, offset)
+                end = offset + header_size + length
+                if len(buf) < end:
+                    break
+                message = decode_frame(kind, buf[offset + header_size:end])
+                offset = end
+                self._callback(self.on_message, message)
+            del buf[:offset]
+
+    def send(self, data, opcode=ABNF.OPCODE_TEXT):
+        """Send a json (str) or compact (bytes) message."""
+        if not self.keep_running or self.sock is None:
+            raise WebSocketConnectionClosedException('Connection is closed')
+        if opcode == ABNF.OPCODE_TEXT and isinstance(data, bytes):
+            data = data.decode('utf-8')
+        try:
+            with self.send_lock:
+                self.sock.sendall(encode_frame(data))
+        except OSError as e:
+            raise WebSocketConnectionClosedException(repr(e))
+
+    def close(self):
+        self.keep_running = False
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _teardown(self):
+        self.keep_running = False
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    @staticmethod
+    def _callback(callback, *args):
+        if callback:
+            try:
+                callback(*args)
+            except Exception as e:
+                LOG.error('Error from callback {}: {}'.format(callback,
+                                                              repr(e)))
@@ -14,9 +14,58 @@
 #
 import json
 import re
+import struct
+from threading import Lock
 
 from mycroft.util.parse import normalize
 
+# Compact wire format, sent as binary websocket frames:
+#     version (1 byte), length of the type (2 bytes, big endian),
+#     message type (utf-8), '{"data": ..., "context": ...}' (utf-8 json)
+# The type can be read without parsing the payload and the frame converts
+# to the json format without parsing it.
+COMPACT_VERSION = 1
+_COMPACT_HEADER = struct.Struct('!BH')
+
+
+def compact_type(frame):
+    """Read the type of a compact frame without parsing the payload.
+
+    Args:
+        frame (bytes): message in the compact format
+
+    Returns:
+        tuple: the message type and the offset of the payload in the frame
+    """
+    version, length = _COMPACT_HEADER.unpack_from(frame)
+    if version != COMPACT_VERSION:
+        raise ValueError('Unsupported compact message version '
+                         '{}'.format(version))
+    offset = _COMPACT_HEADER.size + length
+    return frame[_COMPACT_HEADER.size:offset].decode('utf-8'), offset
+
+
+def compact_to_json(frame):
+    """Convert a compact frame to a json message string.
+
+    Args:
+        frame (bytes): message in the compact format
+
+    Returns:
+        str: the message as returned by Message.serialize()
+    """
+    msg_type, offset = compact_type(frame)
+    # Insert the type at the start of the payload object
+    rest = frame[offset + 1:].decode('utf-8')
+    separator = ', ' if rest.strip() != '}' else ''
+    return '{"type": ' + json.dumps(msg_type) + separator + rest
+
+
+def _encode_compact(msg_type, payload):
+    msg_type = msg_type.encode('utf-8')
+    return (_COMPACT_HEADER.pack(COMPACT_VERSION, len(msg_type)) +
+            msg_type + payload.encode('utf-8'))
+
 
 class Message:
     """Holds and manipulates data sent over the websocket
@@ -74,6 +123,32 @@ class Message:
                        obj.get('data') or {},
                        obj.get('context') or {})
 
+    def serialize_compact(self):
+        """Serialize the message to the compact binary format.
+
+        Returns:
+            bytes: the message as a compact frame
+        """
+        return _encode_compact(self.msg_type,
+                               json.dumps({'data': self.data,
+                                           'context': self.context}))
+
+    @staticmethod
+    def deserialize_compact(frame):
+        """Construct a message from a compact frame.
+
+        Only the message type is read, the data and context are parsed
+        when first used.
+
+        Args:
+            frame (bytes): message in the compact format
+
+        Returns:
+            Message: the message
+        """
+        msg_type, offset = compact_type(frame)
+        return LazyMessage(msg_type, frame, offset)
+
     def reply(self, msg_type, data=None, context=None):
         """Construct a reply message for a given message
 
@@ -163,3 +238,65 @@ class Message:
                 # Substitute only whole words matching the token
                 utt = re.sub(r'\b' + token.get("key", "") + r"\b", "", utt)
         return normalize(utt)
+
+
+class LazyMessage(Message):
+    """Message read from a compact frame.
+
+    The payload is parsed on first access of the data or context. Until
+    then the message is serialized by reusing the frame.
+    """
+    def __init__(self, msg_type, frame, offset):
+        self._frame = frame
+        self._offset = offset
+        self._lock = Lock()  # Handlers may run in parallel threads
+        self._data = None
+        self._context = None
+        self._frame_type = msg_type
+        self.msg_type = msg_type
+
+    def _parse(self):
+        with self._lock:
+            if self._frame is None:
+                return
+            payload = json.loads(self._frame[self._offset:].decode('utf-8'))
+            self._data = payload.get('data') or {}
+            self._context = payload.get('context') or {}
+            self._frame = None
+
+    @property
+    def data(self):
+        if self._frame is not None:
+            self._parse()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if self._frame is not None:
+            self._parse()
+        self._data = value
+
+    @property
+    def context(self):
+        if self._frame is not None:
+            self._parse()
+        return self._context
+
+    @context.setter
+    def context(self, value):
+        if self._frame is not None:
+            self._parse()
+        self._context = value
+
+    def _unchanged(self):
+        return self._frame is not None and self.msg_type == self._frame_type
+
+    def serialize(self):
+        if self._unchanged():
+            return compact_to_json(self._frame)
+        return super().serialize()
+
+    def serialize_compact(self):
+        if self._unchanged():
+            return self._frame
+        return super().serialize_compact()
@@ -12,7 +12,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from websocket import create_connection
+"""Send messages to the bus without running a MessageBusClient.
+
+The bus url is resolved once per process and the connection is kept open
+between calls, so sending many messages doesn't pay for loading the
+configuration and a websocket handshake each time:
+
+    send('speak', {'utterance': 'hello'})
+    send_many([Message('recognizer_loop:utterance',
+                       {'utterances': [u]}) for u in utterances])
+
+The connection subscribes to no messages, the bus doesn't send it the
+messages of other clients. Messages the bus sends anyway ("connected") are
+read and dropped before sending, a close frame or the end of the stream
+means the bus closed the connection and it's reopened.
+"""
+import atexit
+import select
+from threading import Lock
+
+from websocket import (ABNF, WebSocketException, WebSocketTimeoutException,
+                       create_connection)
 
 from mycroft.configuration import Configuration
 from mycroft.configuration.locations import (DEFAULT_CONFIG, SYSTEM_CONFIG,
@@ -21,31 +41,148 @@ from mycroft.messagebus.client import MessageBusClient
 from mycroft.messagebus.message import Message
 
 
-def send(message_to_send, data_to_send=None):
-    """Send a single message over the websocket.
-
-    Args:
-        message_to_send (str): Message to send
-        data_to_send (dict): data structure to go along with the
-            message, defaults to empty dict.
-    """
-    data_to_send = data_to_send or {}
-
-    # Calculate the standard Mycroft messagebus websocket address
+def get_bus_url():
+    """Get the standard Mycroft messagebus websocket address."""
     config = Configuration.get([DEFAULT_CONFIG,
                                 SYSTEM_CONFIG,
                                 USER_CONFIG],
                                cache=False)
     config = config.get("websocket")
-    url = MessageBusClient.build_url(
+    return MessageBusClient.build_url(
         config.get("host"),
         config.get("port"),
         config.get("route"),
         config.get("ssl")
     )
 
-    # Send the provided message/data
-    ws = create_connection(url)
-    packet = Message(message_to_send, data_to_send).serialize()
-    ws.send(packet)
-    ws.close()
+
+class BusSender:
+    """Persistent send-only connection to the bus.
+
+    Arguments:
+        url (str): websocket url of the bus, defaults to the configured url
+    """
+    # Seconds to wait for the rest of a frame the bus started sending
+    READ_TIMEOUT = 0.1
+
+    def __init__(self, url=None):
+        self._url = url
+        self.connection = None
+        self.lock = Lock()
+
+    @property
+    def url(self):
+        if self._url is None:
+            self._url = get_bus_url()
+        return self._url
+
+    def _connect(self):
+        # An empty subscription, the sender doesn't read any messages
+        self.connection = create_connection(self.url + '?subscribe=')
+
+    def _is_closed_by_bus(self):
+        """Check if the bus closed the idle connection.
+
+        A send over a connection closed by the bus (restarted or stopped)
+        can succeed and the message is lost. The frames the bus sent are
+        read without waiting for more, the messages are dropped and a close
+        frame or the end of the stream means the connection is closed.
+        """
+        sock = getattr(self.connection, 'sock', None)
+        if sock is None:
+            return True
+        timeout = self.connection.gettimeout()
+        try:
+            while select.select([sock], [], [], 0)[0]:
+                self.connection.settimeout(self.READ_TIMEOUT)
+                opcode, _ = self.connection.recv_data_frame(True)
+                if opcode == ABNF.OPCODE_CLOSE:
+                    return True
+        except WebSocketTimeoutException:
+            return False
+        except (WebSocketException, OSError, ValueError):
+            return True
+        finally:
+            self.connection.settimeout(timeout)
+        return False
+
+    def send_many(self, messages):
+        """Send messages over a single connection.
+
+        The connection is opened if needed, if it was closed by the bus
+        it's reopened once and the unsent messages are sent again.
+
+        Arguments:
+            messages (iterable): Message objects
+        """
+        packets = [m.serialize() for m in messages]
+        with self.lock:
+            if self.connection is not None and self._is_closed_by_bus():
+                self._close()
+            sent = 0
+            for attempt in range(2):
+                try:
+                    if self.connection is None:
+                        self._connect()
+                    while sent < len(packets):
+                        self.connection.send(packets[sent])
+                        sent += 1
+                    return
+                except (WebSocketException, OSError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def send(self, message):
+        """Send a single Message."""
+        self.send_many([message])
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (WebSocketException, OSError):
+                pass
+            self.connection = None
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+_sender = None
+_sender_lock = Lock()
+
+
+def get_sender():
+    """Get the sender shared by the send functions of this process."""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                _sender = BusSender()
+                atexit.register(_sender.close)
+    return _sender
+
+
+def send(message_to_send, data_to_send=None):
+    """Send a single message over the websocket.
+
+    Args:
+        message_to_send (str): Message to send
+        data_to_send (dict): data structure to go along with the
+            message, defaults to empty dict.
+    """
+    data_to_send = data_to_send or {}
+    get_sender().send(Message(message_to_send, data_to_send))
+
+
+def send_many(messages):
+    """Send many messages over the websocket in one call.
+
+    Args:
+        messages (iterable): Message objects or (message type, data)
+                             tuples
+    """
+    get_sender().send_many(m if isinstance(m, Message) else Message(*m)
+                           for m in messages)
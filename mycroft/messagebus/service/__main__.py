@@ -18,13 +18,16 @@ The message bus facilitates inter-process communication between mycroft-core
 processes. It implements a websocket server so can also be used by external
 systems to integrate with the Mycroft system.
 """
+import os
 import sys
 
 from tornado import autoreload, web, ioloop
 
+from mycroft.configuration import Configuration
 from mycroft.lock import Lock  # creates/supports PID locking file
 from mycroft.messagebus.load_config import load_message_bus_config
 from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+from mycroft.messagebus.service.local_server import LocalBusServer
 from mycroft.util import (
     reset_sigint_handler,
     create_daemon,
@@ -47,9 +50,23 @@ def main():
 
     autoreload.add_reload_hook(reload_hook)
     config = load_message_bus_config()
-    routes = [(config.route, MessageBusEventHandler)]
+    websocket_config = Configuration.get().get('websocket', {})
+    queue_config = dict(
+        max_queue=websocket_config.get('max_queue', 1000),
+        queue_policy=websocket_config.get('queue_policy', 'drop_oldest'),
+        coalesce=websocket_config.get('coalesce', [])
+    )
+    routes = [(config.route, MessageBusEventHandler, queue_config)]
     application = web.Application(routes, debug=True)
     application.listen(config.port, config.host)
+    local_socket = websocket_config.get('local_socket')
+    if local_socket:
+        try:
+            os.makedirs(os.path.dirname(local_socket), exist_ok=True)
+            LocalBusServer(queue_config).listen_unix(local_socket)
+        except (OSError, ValueError) as e:
+            LOG.error('Could not listen on {} ({}), local clients will use '
+                      'the websocket'.format(local_socket, repr(e)))
     create_daemon(ioloop.IOLoop.instance().start)
     LOG.info('Message bus service started!')
     wait_for_exit_signal()
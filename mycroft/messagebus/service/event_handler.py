@@ -12,24 +12,111 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-"""Define the web socket event handler for the message bus."""
+"""Define the web socket event handler for the message bus.
+
+By default every message is sent to every connection. A connection can
+limit the messages it receives to a set of message types, either when
+connecting using the "subscribe" query argument
+
+    ws://localhost:8181/core?subscribe=speak,mycroft.audio.*
+
+or at any time by sending a "mycroft.bus.subscribe" message with the
+list of types in "message_types" (None to receive all messages again).
+Types are exact message types or glob patterns like "mycroft.audio.*".
+
+Connections use json text frames unless they connect with the
+"format=compact" query argument, they then send and receive messages in
+the compact binary format (see message.py). The server only reads the type
+of compact messages and converts between the formats once per message.
+
+Messages are sent through a bounded queue per connection (see
+outbound_queue.py) so a slow client doesn't hold up the others. The
+queue metrics of all connections are sent in reply to a
+"mycroft.bus.stats" message.
+"""
 import json
+import re
 import sys
 import traceback
+from fnmatch import translate
 
 from tornado.websocket import WebSocketHandler
 from pyee import EventEmitter
 
 from mycroft.messagebus.message import Message
+from mycroft.metrics.tracing import get_tracer
 from mycroft.util.log import LOG
+from .outbound_queue import OutboundQueue
 
 client_connections = []
 
+SUBSCRIBE_MESSAGE = 'mycroft.bus.subscribe'
+STATS_MESSAGE = 'mycroft.bus.stats'
+
+
+class MessageSubscription:
+    """Message types a connection is subscribed to.
+
+    Arguments:
+        message_types (list): exact message types or glob patterns
+    """
+    MAX_CACHED_TYPES = 1024
 
-class MessageBusEventHandler(WebSocketHandler):
-    def __init__(self, application, request, **kwargs):
-        super().__init__(application, request, **kwargs)
+    def __init__(self, message_types):
+        self.message_types = list(message_types)
+        self._exact = set()
+        patterns = []
+        for msg_type in self.message_types:
+            if any(c in msg_type for c in '*?['):
+                patterns.append(translate(msg_type))
+            else:
+                self._exact.add(msg_type)
+        self._regex = re.compile('|'.join(patterns)) if patterns else None
+        # The set of message types is small, remember the result for each
+        self._matches = {}
+
+    @staticmethod
+    def parse(value):
+        """Create a subscription from a comma separated list of types."""
+        return MessageSubscription(t.strip() for t in value.split(',')
+                                   if t.strip())
+
+    def matches(self, msg_type):
+        """Check if a message type is part of the subscription."""
+        try:
+            return self._matches[msg_type]
+        except KeyError:
+            match = (msg_type in self._exact or
+                     bool(self._regex and self._regex.match(msg_type)))
+            if len(self._matches) < self.MAX_CACHED_TYPES:
+                self._matches[msg_type] = match
+            return match
+
+
+class BusConnection:
+    """Connection of a client to the bus, independent of the transport.
+
+    Transports call open_connection() when the client has connected,
+    on_message() with each json (str) or compact (bytes) message received
+    and on_close() when the connection is closed. They implement
+    write_frame(), busy() and close().
+    """
+    def init_connection(self, max_queue=1000, queue_policy='drop_oldest',
+                        coalesce=None):
+        """Set the outbound queue configuration.
+
+        Arguments:
+            max_queue (int): max number of messages waiting to be sent
+            queue_policy (str): drop_oldest, drop_newest or disconnect
+            coalesce (list): message types where only the newest unsent
+                             message is delivered
+        """
         self.emitter = EventEmitter()
+        self.subscription = None  # None receives all messages
+        self.wire_format = 'json'
+        self.outbound = None
+        self.queue_config = dict(max_size=max_queue, policy=queue_policy,
+                                 coalesce=coalesce)
 
     def on(self, event_name, handler):
         self.emitter.on(event_name, handler)
@@ -37,27 +124,118 @@ class MessageBusEventHandler(WebSocketHandler):
     def on_message(self, message):
         LOG.debug(message)
         try:
-            deserialized_message = Message.deserialize(message)
+            if isinstance(message, bytes):
+                deserialized_message = Message.deserialize_compact(message)
+            else:
+                deserialized_message = Message.deserialize(message)
         except Exception:
             return
 
+        msg_type = deserialized_message.msg_type
+        if msg_type == SUBSCRIBE_MESSAGE:
+            self.subscribe(deserialized_message.data.get('message_types'))
+            return
+        elif msg_type == STATS_MESSAGE:
+            response = deserialized_message.response(
+                {'connections': [c.outbound.stats()
+                                 for c in client_connections]})
+            self.send(response.msg_type, response.serialize())
+            return
+
         try:
-            self.emitter.emit(deserialized_message.msg_type,
-                              deserialized_message)
+            if self.emitter.listeners(msg_type):
+                self.emitter.emit(msg_type, deserialized_message)
         except Exception as e:
             LOG.exception(e)
             traceback.print_exc(file=sys.stdout)
             pass
 
-        for client in client_connections:
-            client.write_message(message)
+        # Encode the message at most once per wire format
+        frames = {'compact' if isinstance(message, bytes) else 'json':
+                  message}
+        # Copy since a connection may be closed while sending
+        for client in list(client_connections):
+            if client.subscription is None or \
+                    client.subscription.matches(msg_type):
+                frame = frames.get(client.wire_format)
+                if frame is None:
+                    if client.wire_format == 'compact':
+                        frame = deserialized_message.serialize_compact()
+                    else:
+                        frame = deserialized_message.serialize()
+                    frames[client.wire_format] = frame
+                client.send(msg_type, frame)
 
-    def open(self):
-        self.write_message(Message("connected").serialize())
+        tracer = get_tracer()
+        if tracer:
+            tracer.on_route(deserialized_message)
+
+    def send(self, msg_type, message):
+        """Queue a serialized message for this connection.
+
+        Arguments:
+            msg_type (str): type of the message
+            message (str/bytes): serialized message
+        """
+        if not self.outbound.put(msg_type, message):
+            self.close()
+            self.on_close()
+
+    def subscribe(self, message_types):
+        """Limit the messages sent to this connection.
+
+        Arguments:
+            message_types (list): exact types or glob patterns, None to
+                                  receive all messages
+        """
+        if message_types is None:
+            self.subscription = None
+            LOG.debug('Connection subscribed to all messages')
+        else:
+            self.subscription = MessageSubscription(message_types)
+            LOG.debug('Connection subscribed to {}'.format(message_types))
+
+    def open_connection(self, name):
+        """Start sending messages to the connection.
+
+        Arguments:
+            name (str): name of the connection in the stats
+        """
+        self.outbound = OutboundQueue(self.write_frame, self.busy,
+                                      name=name, **self.queue_config)
+        self.write_frame(Message("connected").serialize())
         client_connections.append(self)
 
     def on_close(self):
-        client_connections.remove(self)
+        if self in client_connections:
+            client_connections.remove(self)
+        if self.outbound:
+            self.outbound.close()
+
+
+class MessageBusEventHandler(BusConnection, WebSocketHandler):
+    def initialize(self, max_queue=1000, queue_policy='drop_oldest',
+                   coalesce=None):
+        self.init_connection(max_queue, queue_policy, coalesce)
+
+    def open(self):
+        subscriptions = self.get_query_arguments('subscribe')
+        if subscriptions:
+            self.subscription = MessageSubscription.parse(
+                ','.join(subscriptions))
+        if self.get_query_argument('format', 'json') == 'compact':
+            self.wire_format = 'compact'
+        self.open_connection(self.request.remote_ip)
+
+    def write_frame(self, frame):
+        """Write a json (str) or compact (bytes) message."""
+        return self.write_message(frame, binary=isinstance(frame, bytes))
+
+    def busy(self):
+        """Check if data written to the connection is still unsent."""
+        connection = self.ws_connection
+        return (connection is not None and connection.stream is not None and
+                connection.stream.writing())
 
     def emit(self, channel_message):
         if (hasattr(channel_message, 'serialize') and
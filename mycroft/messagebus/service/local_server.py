@@ -0,0 +1,104 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Serve the message bus on a Unix domain socket.
+
+Connections on the socket are routed together with the websocket
+connections, see mycroft/messagebus/local_transport.py for the protocol.
+"""
+import json
+
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_unix_socket
+from tornado.tcpserver import TCPServer
+
+from mycroft.messagebus.local_transport import FRAME_HEADER, decode_frame, \
+    encode_frame
+from mycroft.util.log import LOG
+from .event_handler import BusConnection, MessageSubscription
+
+# Messages larger than this close the connection
+MAX_FRAME_SIZE = 10 * 1024 * 1024
+
+
+class LocalBusConnection(BusConnection):
+    """Connection of a client on the bus socket.
+
+    Arguments:
+        stream (IOStream): stream of the connection
+        queue_config (dict): configuration of the outbound queue
+    """
+    def __init__(self, stream, queue_config=None):
+        self.stream = stream
+        self.init_connection(**(queue_config or {}))
+
+    async def run(self):
+        """Read the options and messages of the client until it closes."""
+        try:
+            options = json.loads(await self._read_frame())
+            if options.get('subscribe') is not None:
+                self.subscription = MessageSubscription(options['subscribe'])
+            if options.get('format') == 'compact':
+                self.wire_format = 'compact'
+            self.open_connection('local')
+            while True:
+                self.on_message(await self._read_frame())
+        except StreamClosedError:
+            pass
+        except (ValueError, AttributeError) as e:
+            LOG.warning('Invalid frame from bus socket client '
+                        '({})'.format(repr(e)))
+            self.close()
+        self.on_close()
+
+    async def _read_frame(self):
+        kind, length = FRAME_HEADER.unpack(
+            await self.stream.read_bytes(FRAME_HEADER.size))
+        if length > MAX_FRAME_SIZE:
+            raise ValueError('Frame of {} bytes'.format(length))
+        return decode_frame(kind, await self.stream.read_bytes(length))
+
+    def write_frame(self, frame):
+        """Write a json (str) or compact (bytes) message."""
+        return self.stream.write(encode_frame(frame))
+
+    def busy(self):
+        """Check if data written to the connection is still unsent."""
+        return self.stream.writing()
+
+    def close(self):
+        self.stream.close()
+
+
+class LocalBusServer(TCPServer):
+    """Accepts bus connections on a Unix socket.
+
+    Arguments:
+        queue_config (dict): outbound queue configuration of the
+                             connections, see MessageBusEventHandler
+    """
+    def __init__(self, queue_config=None):
+        super().__init__()
+        self.queue_config = queue_config or {}
+
+    def listen_unix(self, path):
+        """Listen on the socket, replacing a socket left by a crashed bus.
+
+        Arguments:
+            path (str): path of the socket
+        """
+        self.add_socket(bind_unix_socket(path))
+
+    async def handle_stream(self, stream, address):
+        await LocalBusConnection(stream, self.queue_config).run()
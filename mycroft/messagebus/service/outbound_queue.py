@@ -0,0 +1,180 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Bounded queue of messages waiting to be sent to a bus connection.
+
+A message is written to the connection directly unless the connection
+still has unsent data, in which case it waits in the queue. The queue is
+written to the connection as soon as the previous writes have completed,
+or when the next message is sent and the connection is no longer busy.
+A client not reading its messages therefore only grows its own queue, up
+to a limit where the configured policy applies:
+
+    drop_oldest: the oldest queued message is dropped
+    drop_newest: the new message is dropped
+    disconnect: the connection is closed
+
+For message types configured to be coalesced only the newest unsent
+message is kept, replacing the older one in its place in the queue.
+"""
+from collections import deque
+
+from mycroft.util.log import LOG
+
+POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+
+class OutboundQueue:
+    """Queue of messages for a connection.
+
+    Arguments:
+        write (callable): writes a message to the connection, returning a
+                          future resolved when the message is sent
+        busy (callable): returns True while the connection has unsent data
+        max_size (int): max number of queued messages
+        policy (str): what to do when the queue is full, see POLICIES
+        coalesce (list): message types where only the newest is sent
+        name (str): name of the connection for logging
+    """
+    def __init__(self, write, busy=None, max_size=1000,
+                 policy='drop_oldest', coalesce=None, name='connection'):
+        if policy not in POLICIES:
+            LOG.error('Unknown queue policy {}, using drop_oldest'
+                      .format(policy))
+            policy = 'drop_oldest'
+        self.write = write
+        self.busy = busy or (lambda: False)
+        self.max_size = max_size
+        self.policy = policy
+        self.coalesce = set(coalesce or [])
+        self.name = name
+        self.closed = False
+
+        self._queue = deque()
+        self._pending = {}  # Queued entries of coalesced types
+        self._last_write = None
+        self._waiting_for = None
+        self._overflowing = False
+
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, msg_type, message):
+        """Send a message or queue it if the connection is busy.
+
+        Arguments:
+            msg_type (str): type of the message
+            message (str): serialized message
+
+        Returns:
+            bool: False if the connection should be closed
+        """
+        if self.closed:
+            return False
+        if self._queue and not self.busy():
+            self._flush()
+        if not self._queue and not self.busy():
+            self._write(message)
+            return not self.closed
+
+        entry = self._pending.get(msg_type)
+        if entry is not None:
+            entry[1] = message
+            self.coalesced += 1
+            return True
+
+        if len(self._queue) >= self.max_size:
+            if self.policy == 'disconnect':
+                LOG.warning('Outbound queue of {} is full, disconnecting'
+                            .format(self.name))
+                self.close()
+                return False
+            self._drop()
+            if self.policy == 'drop_newest':
+                return True
+            self._pop()
+
+        entry = [msg_type, message]
+        self._queue.append(entry)
+        if msg_type in self.coalesce:
+            self._pending[msg_type] = entry
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wait_for_write()
+        return True
+
+    def _drop(self):
+        self.dropped += 1
+        if not self._overflowing:
+            self._overflowing = True
+            LOG.warning('Outbound queue of {} is full, dropping messages '
+                        '({})'.format(self.name, self.policy))
+
+    def _pop(self):
+        entry = self._queue.popleft()
+        if self._pending.get(entry[0]) is entry:
+            del self._pending[entry[0]]
+        return entry[1]
+
+    def _write(self, message):
+        try:
+            self._last_write = self.write(message)
+        except Exception as e:
+            LOG.debug('Writing to {} failed ({})'.format(self.name, repr(e)))
+            self.close()
+            return False
+        self.sent += 1
+        return True
+
+    def _flush(self):
+        """Write all queued messages."""
+        while self._queue:
+            if not self._write(self._pop()):
+                return
+        self._overflowing = False
+
+    def _wait_for_write(self):
+        """Flush the queue when the last write has completed."""
+        future = self._last_write
+        if future is not None and future is not self._waiting_for:
+            self._waiting_for = future
+            future.add_done_callback(self._on_written)
+
+    def _on_written(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self.close()
+        elif not self.closed:
+            self._flush()
+
+    def close(self):
+        """Drop all queued messages and stop sending."""
+        self.closed = True
+        self._queue.clear()
+        self._pending.clear()
+
+    def stats(self):
+        """Get the queue metrics.
+
+        Returns:
+            dict: current and max queue depth, number of messages sent,
+                  dropped and coalesced
+        """
+        return {'name': self.name, 'depth': len(self._queue),
+                'max_depth': self.max_depth, 'sent': self.sent,
+                'dropped': self.dropped, 'coalesced': self.coalesced}
@@ -0,0 +1,377 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Record, replay and generate message bus traffic.
+
+Record the traffic of a running device:
+
+    python -m mycroft.messagebus.traffic record traffic.bus
+
+Replay the recorded utterances against a build at twice the recorded
+speed (--speed 0 sends as fast as possible):
+
+    python -m mycroft.messagebus.traffic replay traffic.bus --speed 2
+
+Send a storm of synthetic utterances:
+
+    python -m mycroft.messagebus.traffic storm --count 1000 --rate 50 \\
+        --utterance "what time is it" --utterance "tell me a joke"
+
+Replayed messages get a "replay_id" in their context. Message.reply()
+keeps the context so replies of the skills can be matched to the replayed
+message. The throughput, latency until the first reply and the number of
+messages without a reply within the timeout are reported.
+
+Traffic files start with FILE_MAGIC followed by a record per message:
+
+    offset: double, seconds since the start of the recording
+    length: unsigned int, length of the message
+    message: the message in the compact format (see message.py)
+"""
+import argparse
+import struct
+import sys
+import time
+from fnmatch import fnmatchcase
+from threading import Condition, Event
+from uuid import uuid4
+
+from mycroft.metrics.tracing import percentile
+from .message import Message
+
+FILE_MAGIC = b'MYCROFT-BUS-TRAFFIC 1\n'
+RECORD_HEADER = struct.Struct('!dI')
+
+REPLAY_ID = 'replay_id'
+# Messages replayed by default, the input of an interaction
+REPLAY_TYPES = ['recognizer_loop:utterance']
+# Messages ending the handling of an utterance
+REPLY_TYPES = ['mycroft.skill.handler.complete', 'complete_intent_failure']
+
+
+def matches_any(msg_type, patterns):
+    return any(fnmatchcase(msg_type, pattern) for pattern in patterns)
+
+
+class TrafficWriter:
+    """Write messages to a traffic file.
+
+    Arguments:
+        path (str): file to write
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(FILE_MAGIC)
+        self.start = time.monotonic()
+        self.count = 0
+
+    def write(self, message, offset=None):
+        """Append a message.
+
+        Arguments:
+            message (Message): message to write
+            offset (float): seconds since the start, defaults to now
+        """
+        if offset is None:
+            offset = time.monotonic() - self.start
+        frame = message.serialize_compact()
+        self.file.write(RECORD_HEADER.pack(offset, len(frame)) + frame)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_traffic(path):
+    """Read the messages of a traffic file.
+
+    Yields:
+        tuple: (offset in seconds, Message)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError('{} is not a bus traffic file'.format(path))
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return  # End of file, or cut off while recording
+            offset, length = RECORD_HEADER.unpack(header)
+            frame = f.read(length)
+            if len(frame) < length:
+                return
+            yield offset, Message.deserialize_compact(frame)
+
+
+class Recorder:
+    """Record the messages on the bus to a traffic file.
+
+    The bus should run its handlers in a single thread so messages are
+    recorded in order.
+
+    Arguments:
+        bus (MessageBusClient): connection to the bus
+        path (str): file to write
+        types (list): message types or glob patterns to record, None for
+                      all
+    """
+    def __init__(self, bus, path, types=None):
+        self.bus = bus
+        self.types = types
+        self.writer = TrafficWriter(path)
+        bus.on('message', self._on_message)
+
+    def _on_message(self, serialized):
+        message = Message.deserialize(serialized)
+        if self.types is None or matches_any(message.msg_type, self.types):
+            self.writer.write(message)
+
+    def close(self):
+        self.bus.remove('message', self._on_message)
+        self.writer.close()
+
+
+class Replayer:
+    """Send messages to the bus and measure the time until replies.
+
+    Arguments:
+        bus (MessageBusClient): connection to the bus
+        reply_types (list): message types counting as a reply
+        timeout (float): seconds to wait for a reply
+    """
+    def __init__(self, bus, reply_types=None, timeout=10.0):
+        self.bus = bus
+        self.reply_types = reply_types or REPLY_TYPES
+        self.timeout = timeout
+        self.pending = {}  # replay id -> send time
+        self.latencies = []
+        self.sent = 0
+        self.cond = Condition()
+        for msg_type in self.reply_types:
+            bus.on(msg_type, self._on_reply)
+
+    def _on_reply(self, message):
+        now = time.monotonic()
+        replay_id = message.context.get(REPLAY_ID)
+        with self.cond:
+            sent = self.pending.pop(replay_id, None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+                self.cond.notify_all()
+
+    def send(self, message):
+        """Send a message, tracking its first reply."""
+        replay_id = str(uuid4())
+        message.context[REPLAY_ID] = replay_id
+        with self.cond:
+            self.pending[replay_id] = time.monotonic()
+            self.sent += 1
+        self.bus.emit(message)
+
+    def run(self, traffic, speed=1.0, stop=None):
+        """Send messages at their offsets and wait for the replies.
+
+        Arguments:
+            traffic (iterable): (offset in seconds, Message) tuples
+            speed (float): speed relative to the offsets, 0 to send as
+                           fast as possible
+            stop (Event): set to stop sending
+
+        Returns:
+            dict: report of the run, see report()
+        """
+        start = time.monotonic()
+        first_offset = None
+        for offset, message in traffic:
+            if stop and stop.is_set():
+                break
+            if first_offset is None:
+                first_offset = offset
+            if speed:
+                delay = (offset - first_offset) / speed - \
+                    (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            self.send(message)
+        send_time = time.monotonic() - start
+
+        with self.cond:
+            self.cond.wait_for(lambda: not self.pending, self.timeout)
+        return self.report(send_time)
+
+    def report(self, send_time):
+        """Summarize the replies.
+
+        Arguments:
+            send_time (float): seconds spent sending
+
+        Returns:
+            dict: sent messages, sent per second, replies, dropped
+                  (messages without a reply) and the p50, p95, p99 and
+                  max latency in ms
+        """
+        with self.cond:
+            latencies = sorted(t * 1000 for t in self.latencies)
+            report = {'sent': self.sent,
+                      'throughput': self.sent / send_time if send_time
+                      else float(self.sent),
+                      'replies': len(latencies),
+                      'dropped': len(self.pending)}
+        for p in (50, 95, 99):
+            report['p{}'.format(p)] = percentile(latencies, p)
+        report['max'] = latencies[-1] if latencies else None
+        return report
+
+    def close(self):
+        for msg_type in self.reply_types:
+            self.bus.remove(msg_type, self._on_reply)
+
+
+def replay_traffic(path, types=None):
+    """Get the messages of a traffic file to replay.
+
+    Arguments:
+        path (str): traffic file
+        types (list): message types or glob patterns to replay
+
+    Yields:
+        tuple: (offset in seconds, Message)
+    """
+    types = types or REPLAY_TYPES
+    for offset, message in read_traffic(path):
+        if matches_any(message.msg_type, types):
+            context = dict(message.context)
+            context.pop(REPLAY_ID, None)
+            context.pop('trace', None)
+            yield offset, Message(message.msg_type, message.data, context)
+
+
+def utterance_storm(utterances, count, rate=0, lang='en-us'):
+    """Generate utterance messages.
+
+    Arguments:
+        utterances (list): utterances to send, in turn
+        count (int): number of messages
+        rate (float): messages per second, 0 for all at once
+        lang (str): language of the utterances
+
+    Yields:
+        tuple: (offset in seconds, Message)
+    """
+    context = {'client_name': 'mycroft_traffic', 'source': 'traffic',
+               'destination': ['skills']}
+    for i in range(count):
+        yield (i / rate if rate else 0,
+               Message('recognizer_loop:utterance',
+                       {'utterances': [utterances[i % len(utterances)]],
+                        'lang': lang}, dict(context)))
+
+
+def print_report(report):
+    print('Sent {sent} messages ({throughput:.1f}/s), {replies} replies, '
+          '{dropped} without a reply'.format(**report))
+    if report['replies']:
+        print('Latency until reply: p50 {p50:.1f} ms, p95 {p95:.1f} ms, '
+              'p99 {p99:.1f} ms, max {max:.1f} ms'.format(**report))
+
+
+def create_bus():
+    from mycroft.messagebus.client import MessageBusClient
+    from mycroft.messagebus.client.handler_executor import HandlerExecutor
+    from mycroft.util import create_daemon
+
+    # A single handler thread to record messages in order
+    bus = MessageBusClient(executor=HandlerExecutor(threads=1,
+                                                    skill_threads=0))
+    create_daemon(bus.run_forever)
+    if not bus.connected_event.wait(10):
+        print('Could not connect to the message bus')
+        sys.exit(1)
+    return bus
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record, replay and generate message bus traffic.')
+    commands = parser.add_subparsers(dest='command')
+    record = commands.add_parser('record', help='Record the bus traffic')
+    record.add_argument('file')
+    record.add_argument('--types', nargs='+',
+                        help='Message types (or patterns) to record '
+                             '(Default: all)')
+    record.add_argument('--duration', type=float,
+                        help='Seconds to record (Default: until Ctrl+C)')
+
+    def add_reply_args(command):
+        command.add_argument('--reply-types', nargs='+', default=REPLY_TYPES,
+                             help='Message types counting as a reply '
+                                  '(Default: {})'.format(' '.join(
+                                      REPLY_TYPES)))
+        command.add_argument('--timeout', type=float, default=10.0,
+                             help='Seconds to wait for replies '
+                                  '(Default: 10)')
+
+    replay = commands.add_parser('replay', help='Replay recorded traffic')
+    replay.add_argument('file')
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help='Speed relative to the recording, 0 to send '
+                             'as fast as possible (Default: 1)')
+    replay.add_argument('--types', nargs='+', default=REPLAY_TYPES,
+                        help='Message types (or patterns) to replay '
+                             '(Default: {})'.format(' '.join(REPLAY_TYPES)))
+    add_reply_args(replay)
+
+    storm = commands.add_parser('storm', help='Send synthetic utterances')
+    storm.add_argument('--utterance', action='append',
+                       help='Utterance to send, may be repeated '
+                            '(Default: "what time is it")')
+    storm.add_argument('--count', type=int, default=100)
+    storm.add_argument('--rate', type=float, default=0,
+                       help='Utterances per second, 0 to send as fast as '
+                            'possible (Default: 0)')
+    storm.add_argument('--lang', default='en-us')
+    add_reply_args(storm)
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return
+
+    bus = create_bus()
+    stop = Event()
+    try:
+        if args.command == 'record':
+            recorder = Recorder(bus, args.file, args.types)
+            try:
+                stop.wait(args.duration)
+            finally:
+                recorder.close()
+                print('Recorded {} messages'.format(recorder.writer.count))
+        else:
+            if args.command == 'replay':
+                traffic = replay_traffic(args.file, args.types)
+                speed = args.speed
+            else:
+                traffic = utterance_storm(
+                    args.utterance or ['what time is it'], args.count,
+                    args.rate, args.lang)
+                speed = 1.0
+            replayer = Replayer(bus, args.reply_types, args.timeout)
+            print_report(replayer.run(traffic, speed, stop))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.close()
+
+
+if __name__ == '__main__':
+    main()
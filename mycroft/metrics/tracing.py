@@ -0,0 +1,298 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Local tracing of messages through the bus.
+
+A trace is started for a message by start_trace(), adding a "trace" entry
+to the message context. Message.reply() and Message.response() keep the
+context so all messages caused by the first one are part of the trace.
+
+When tracing is enabled the bus client and service record spans for
+traced messages:
+
+    bus: from emitting the message until a process receives it
+    route: from emitting the message until the bus service has sent it
+    process: from receiving a message until the same process emits the
+             next message of the trace, e.g. intent matching or the
+             handler of a skill
+
+Spans are kept in memory and optionally appended to a file shared by all
+processes. Tracing is configured in the "tracing" section of the config:
+
+    "tracing": {
+        "enabled": false,
+        "file": "/tmp/mycroft/traces.jsonl",  // null to only keep in memory
+        "ring_size": 1000                      // spans kept in memory
+    }
+
+A latency breakdown of the recorded spans is printed by
+    python -m mycroft.metrics.tracing
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from uuid import uuid4
+
+from mycroft.configuration import Configuration
+from mycroft.util.log import LOG
+
+# Upper bounds of the latency histogram buckets in ms
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+           float('inf'))
+
+
+def _process_name():
+    """Name the process after the mycroft service being run."""
+    path = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    if os.path.basename(path) == '__main__.py':
+        path = os.path.dirname(path)
+    return os.path.splitext(os.path.basename(path))[0] or str(os.getpid())
+
+
+class Span:
+    """A timed stage of a trace.
+
+    Arguments:
+        trace (str): id of the trace
+        kind (str): bus, route or process
+        name (str): message type, or "<received> -> <emitted>" for process
+                    spans
+        start (float): start time (epoch)
+        end (float): end time (epoch)
+        process (str): process recording the span
+    """
+    def __init__(self, trace, kind, name, start, end, process):
+        self.trace = trace
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+        self.process = process
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def serialize(self):
+        return json.dumps(self.__dict__)
+
+    @staticmethod
+    def deserialize(value):
+        return Span(**json.loads(value))
+
+
+class Tracer:
+    """Records spans of traced messages in a ring and optionally a file.
+
+    Arguments:
+        path (str): file to append the spans to, None to only keep them in
+                    memory
+        ring_size (int): number of spans kept in memory
+        process (str): name of the process, defaults to the service name
+    """
+    MAX_OPEN_TRACES = 100
+
+    def __init__(self, path=None, ring_size=1000, process=None):
+        self.path = path
+        self.process = process or _process_name()
+        self.spans = deque(maxlen=ring_size)
+        self._received = OrderedDict()  # trace -> (msg_type, receive time)
+        self._lock = Lock()
+        self._file = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._file = open(path, 'a', buffering=1)
+            except OSError as e:
+                LOG.error('Could not open trace file {} ({})'
+                          .format(path, repr(e)))
+
+    def on_emit(self, message):
+        """Record sending a message, call just before it is sent."""
+        trace = message.context.get('trace')
+        if not trace:
+            return
+        now = time.time()
+        with self._lock:
+            received = self._received.pop(trace['id'], None)
+        if received:
+            msg_type, received_at = received
+            self.record(Span(trace['id'], 'process',
+                             '{} -> {}'.format(msg_type, message.msg_type),
+                             received_at, now, self.process))
+        message.context['trace'] = dict(trace, emitted=now)
+
+    def on_receive(self, message):
+        """Record receiving a message from the bus."""
+        trace = message.context.get('trace')
+        if not trace or 'emitted' not in trace:
+            return
+        now = time.time()
+        self.record(Span(trace['id'], 'bus', message.msg_type,
+                         trace['emitted'], now, self.process))
+        with self._lock:
+            self._received[trace['id']] = (message.msg_type, now)
+            self._received.move_to_end(trace['id'])
+            if len(self._received) > self.MAX_OPEN_TRACES:
+                self._received.popitem(last=False)
+
+    def on_route(self, message):
+        """Record the bus service having sent a message to all clients."""
+        trace = message.context.get('trace')
+        if trace and 'emitted' in trace:
+            self.record(Span(trace['id'], 'route', message.msg_type,
+                             trace['emitted'], time.time(), self.process))
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self._file:
+                self._file.write(span.serialize() + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+_tracer = None
+_tracer_lock = Lock()
+
+
+def get_tracer():
+    """Get the tracer of this process.
+
+    Returns:
+        Tracer: the tracer or None if tracing is disabled
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                config = Configuration.get().get('tracing') or {}
+                if config.get('enabled'):
+                    _tracer = Tracer(config.get('file'),
+                                     config.get('ring_size', 1000))
+                else:
+                    _tracer = False
+    return _tracer or None
+
+
+def start_trace(message, trace_id=None):
+    """Start a trace of a message and the messages it causes.
+
+    Does nothing if tracing is disabled.
+
+    Arguments:
+        message (Message): first message of the trace
+        trace_id (str): id of the trace, defaults to a random id
+
+    Returns:
+        Message: the message
+    """
+    if get_tracer():
+        message.context['trace'] = {'id': trace_id or str(uuid4())}
+    return message
+
+
+def percentile(values, percent):
+    """Get a percentile of sorted values."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def histograms(spans):
+    """Create latency histograms per stage.
+
+    Arguments:
+        spans (iterable): spans to include
+
+    Returns:
+        dict: (kind, name) -> count, p50, p95 and max in ms and the number
+              of spans in each bucket of BUCKETS
+    """
+    durations = {}
+    for span in spans:
+        durations.setdefault((span.kind, span.name), []).append(
+            span.duration * 1000)
+    result = {}
+    for stage, values in durations.items():
+        values.sort()
+        buckets = [0] * len(BUCKETS)
+        for value in values:
+            buckets[next(i for i, upper in enumerate(BUCKETS)
+                         if value <= upper)] += 1
+        result[stage] = {'count': len(values),
+                         'p50': percentile(values, 50),
+                         'p95': percentile(values, 95),
+                         'max': values[-1],
+                         'buckets': buckets}
+    return result
+
+
+def read_spans(path):
+    """Read the spans from a trace file."""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            try:
+                spans.append(Span.deserialize(line))
+            except (ValueError, TypeError):
+                pass  # Line being written
+    return spans
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Print the latency of each stage of the traced '
+                    'interactions.')
+    parser.add_argument('file', nargs='?',
+                        help='trace file (default from the configuration)')
+    parser.add_argument('--trace', help='Print the spans of one trace')
+    args = parser.parse_args()
+
+    path = args.file or (Configuration.get().get('tracing') or {}).get('file')
+    if not path or not os.path.isfile(path):
+        print('No trace file found')
+        return
+    spans = read_spans(path)
+
+    if args.trace:
+        spans = sorted((s for s in spans if s.trace == args.trace),
+                       key=lambda s: s.end)
+        start = min(s.start for s in spans) if spans else 0
+        for span in spans:
+            print('{:>8.1f} {:>8.1f} ms  {:8}{:10}{}'.format(
+                (span.start - start) * 1000, span.duration * 1000,
+                span.kind, span.process, span.name))
+        return
+
+    print('{:8}{:>7}{:>9}{:>9}{:>9}  {}'.format(
+        'kind', 'count', 'p50 ms', 'p95 ms', 'max ms', 'stage'))
+    stages = histograms(spans)
+    for (kind, name), stats in sorted(stages.items(),
+                                      key=lambda s: -s[1]['p50']):
+        print('{:8}{:>7}{:>9.1f}{:>9.1f}{:>9.1f}  {}'.format(
+            kind, stats['count'], stats['p50'], stats['p95'], stats['max'],
+            name))
+
+
+if __name__ == '__main__':
+    main()
@@ -26,7 +26,7 @@ from msm.exceptions import MsmException
 
 from mycroft import dialog
 from mycroft.api import is_paired, BackendDown, DeviceApi
-from mycroft.audio import wait_while_speaking
+from mycroft.audio import speaking_state, wait_while_speaking
 from mycroft.enclosure.api import EnclosureAPI
 from mycroft.configuration import Configuration
 from mycroft.messagebus.client import MessageBusClient
@@ -44,6 +44,7 @@ from .core import FallbackSkill
 from .event_scheduler import EventScheduler
 from .intent_service import IntentService
 from .padatious_service import PadatiousService
+from .scatter_gather import ScatterGatherService
 from .skill_manager import SkillManager
 
 RASPBERRY_PI_PLATFORMS = ('mycroft_mark_1', 'picroft', 'mycroft_mark_2pi')
@@ -168,6 +169,7 @@ class DevicePrimer(object):
 
     def _speak_dialog(self, dialog_id, wait=False):
         data = {'utterance': dialog.get(dialog_id)}
+        speaking_state.speak_requested()
         self.bus.emit(Message("speak", data))
         if wait:
             wait_while_speaking()
@@ -185,6 +187,8 @@ def main():
     bus = _start_message_bus_client()
     _register_intent_services(bus)
     event_scheduler = EventScheduler(bus)
+    scatter_gather = ScatterGatherService(
+        bus, config['skills'].get('common_query'))
     skill_manager = _initialize_skill_manager(bus)
 
     _wait_for_internet_connection()
@@ -197,7 +201,7 @@ def main():
     skill_manager.start()
 
     wait_for_exit_signal()
-    shutdown(skill_manager, event_scheduler)
+    shutdown(skill_manager, event_scheduler, scatter_gather)
 
 
 def _start_message_bus_client():
@@ -213,6 +217,7 @@ def _start_message_bus_client():
     # Wait for connection
     bus_connected.wait()
     LOG.info('Connected to messagebus')
+    speaking_state.bind(bus)
 
     return bus
 
@@ -261,10 +266,14 @@ def _wait_for_internet_connection():
         time.sleep(1)
 
 
-def shutdown(skill_manager, event_scheduler):
+def shutdown(skill_manager, event_scheduler, scatter_gather=None):
     LOG.info('Shutting down skill service')
     if event_scheduler is not None:
         event_scheduler.shutdown()
+    if scatter_gather is not None:
+        scatter_gather.shutdown()
+    if PadatiousService.instance is not None:
+        PadatiousService.instance.shutdown()
     # Terminate all running threads that update skills
     if skill_manager is not None:
         skill_manager.stop()
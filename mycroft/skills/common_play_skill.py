@@ -64,6 +64,9 @@ class CommonPlaySkill(MycroftSkill, ABC):
             self.audioservice = AudioService(self.bus)
             self.add_event('play:query', self.__handle_play_query)
             self.add_event('play:start', self.__handle_play_start)
+            # Let the scatter-gather service know to wait for this skill
+            self.bus.emit(Message('play:query.register',
+                                  {'skill_id': self.skill_id}))
 
     def __handle_play_query(self, message):
         search_phrase = message.data["phrase"]
@@ -14,6 +14,7 @@
 
 from enum import IntEnum
 from abc import ABC, abstractmethod
+from mycroft.messagebus.message import Message
 from .mycroft_skill import MycroftSkill
 
 
@@ -61,6 +62,9 @@ class CommonQuerySkill(MycroftSkill, ABC):
             super().bind(bus)
             self.add_event('question:query', self.__handle_question_query)
             self.add_event('question:action', self.__handle_query_action)
+            # Let the scatter-gather service know to wait for this skill
+            self.bus.emit(Message('question:query.register',
+                                  {'skill_id': self.skill_id}))
 
     def __handle_question_query(self, message):
         search_phrase = message.data["phrase"]
@@ -314,6 +314,7 @@ class EventSchedulerInterface:
                           '{}'.format(repr(e)))
 
         wrapped = create_basic_wrapper(handler, on_error)
+        wrapped.skill_id = self.sched_id
         self.events.add(unique_name, wrapped, once=not repeat_interval)
         event_data = {'time': time.mktime(when.timetuple()),
                       'event': unique_name,
@@ -0,0 +1,125 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Cache of the intent matches of the utterances.
+
+Repeated commands like "stop" or "volume up" are matched against the same
+intents every time. The matches of the Adapt and Padatious stages are kept
+until anything they depend on changes: registered vocabulary and intents,
+trained Padatious models or the Adapt context. Every change increments the
+version of the cache, which is part of the keys, and drops the entries.
+"""
+from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock
+
+
+class IntentResultCache:
+    """Least recently used cache of intent matches.
+
+    Values are copied in and out as the intent service and the fallbacks
+    modify the matches they handle.
+
+    Arguments:
+        max_size (int): number of entries to keep, 0 disables the cache
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.version = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, stage, utterance, lang):
+        """Key of the match of an utterance with the current version.
+
+        Arguments:
+            stage (str): "adapt" or "padatious"
+            utterance: utterance or tuple of utterances matched together
+            lang (str): language of the utterance
+
+        Returns:
+            tuple: key for get() and put()
+        """
+        return self.version, stage, utterance, lang
+
+    def get(self, key, compute):
+        """Get a match, computing it if it's not cached.
+
+        Arguments:
+            key (tuple): key from key()
+            compute (callable): function returning the match
+
+        Returns:
+            the cached or computed match
+        """
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """Look up a match.
+
+        Returns:
+            tuple: (found, match)
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return True, deepcopy(self.entries[key])
+            self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        """Store a match.
+
+        A match computed before an invalidation is dropped, its key has
+        the previous version.
+        """
+        if self.max_size <= 0:
+            return
+        value = deepcopy(value)
+        with self.lock:
+            if key[0] != self.version:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop the cached matches after a change of the intents."""
+        with self.lock:
+            self.version += 1
+            self.invalidations += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
@@ -12,7 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import hashlib
+import json
 import time
+from threading import Condition, Lock, Thread
+from uuid import uuid4
+
 from adapt.context import ContextManagerFrame
 from adapt.engine import IntentDeterminationEngine
 from adapt.intent import IntentBuilder
@@ -24,7 +29,8 @@ from mycroft.util.log import LOG
 from mycroft.util.parse import normalize
 from mycroft.metrics import report_timing, Stopwatch
 from mycroft.skills.padatious_service import PadatiousService
-from .intent_service_interface import open_intent_envelope
+from .intent_result_cache import IntentResultCache
+from .intent_service_interface import intent_from_dict, open_intent_envelope
 
 
 class AdaptIntent(IntentBuilder):
@@ -150,10 +156,97 @@ class ContextManager:
         return result
 
 
+class ConverseRequest:
+    """Converse round trip with the active skills.
+
+    A skill's converse() may act on the utterance, by speaking or stopping
+    playback, so the skills are asked one at a time in priority order and
+    a skill is only asked once all skills before it have declined. The
+    waiting thread wakes up as soon as the response arrives.
+
+    Arguments:
+        skill_ids (list): ids of the skills in priority order
+    """
+    def __init__(self, skill_ids):
+        self.id = str(uuid4())
+        self.skill_ids = skill_ids
+        self.results = {}
+        self.latencies = {}
+        self.sent_at = {}
+        self.condition = Condition()
+
+    def sent(self, skill_id):
+        """Mark the request to a skill as sent."""
+        with self.condition:
+            self.sent_at[skill_id] = time.monotonic()
+
+    def set_result(self, skill_id, result):
+        """Store the converse result of a skill.
+
+        Arguments:
+            skill_id (str): skill that responded
+            result (bool): True if the skill handled the utterance
+        """
+        with self.condition:
+            if skill_id in self.sent_at and skill_id not in self.results:
+                self.results[skill_id] = result
+                self.latencies[skill_id] = (time.monotonic() -
+                                            self.sent_at[skill_id])
+                self.condition.notify_all()
+
+    def wait_for_result(self, skill_id, timeout):
+        """Wait for the response of a skill.
+
+        A skill not responding before the timeout is considered to have
+        declined.
+
+        Arguments:
+            skill_id (str): skill the request was sent to
+            timeout (float): max time to wait for the response
+
+        Returns:
+            bool: True if the skill handled the utterance
+        """
+        with self.condition:
+            end_time = self.sent_at[skill_id] + timeout
+            while skill_id not in self.results:
+                time_left = end_time - time.monotonic()
+                if time_left <= 0:
+                    return False
+                self.condition.wait(time_left)
+            return self.results[skill_id]
+
+
+def send_converse_metrics(request, ident=None):
+    """Send the converse latency of each skill in a background thread."""
+    def do_send():
+        for skill_id, latency in request.latencies.items():
+            stopwatch = Stopwatch()
+            stopwatch.timestamp = time.time() - latency
+            stopwatch.time = latency
+            report_timing(ident, 'converse', stopwatch,
+                          {'skill_id': skill_id,
+                           'result': request.results[skill_id]})
+
+    t = Thread(target=do_send)
+    t.daemon = True
+    t.start()
+
+
+def vocab_hash(vocab, regex):
+    """Content hash of the vocabulary and regexes of a skill."""
+    data = json.dumps([vocab, regex], sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
 class IntentService:
     def __init__(self, bus):
         self.config = Configuration.get().get('context', {})
         self.engine = IntentDeterminationEngine()
+        # Vocabulary of each skill registered in bulk:
+        # skill id -> {'hash', 'vocab', 'regex'}
+        self.skill_vocab = {}
+        self.vocab_lock = Lock()
 
         # Dictionary for translating a skill id to a name
         self.skill_names = {}
@@ -163,8 +256,13 @@ class IntentService:
         self.context_timeout = self.config.get('timeout', 2)
         self.context_greedy = self.config.get('greedy', False)
         self.context_manager = ContextManager(self.context_timeout)
+        # Matches shared by the Adapt and Padatious stages
+        self.result_cache = IntentResultCache(
+            Configuration.get().get('skills', {}).get(
+                'intent_result_cache_size', 256))
         self.bus = bus
         self.bus.on('register_vocab', self.handle_register_vocab)
+        self.bus.on('register_vocab.bulk', self.handle_register_vocab_bulk)
         self.bus.on('register_intent', self.handle_register_intent)
         self.bus.on('recognizer_loop:utterance', self.handle_utterance)
         self.bus.on('detach_intent', self.handle_detach_intent)
@@ -173,6 +271,7 @@ class IntentService:
         self.bus.on('add_context', self.handle_add_context)
         self.bus.on('remove_context', self.handle_remove_context)
         self.bus.on('clear_context', self.handle_clear_context)
+        self.bus.on('intent.service.cache.stats', self.handle_cache_stats)
         # Converse method
         self.bus.on('skill.converse.response', self.handle_converse_response)
         self.bus.on('skill.converse.error', self.handle_converse_error)
@@ -184,9 +283,11 @@ class IntentService:
         self.bus.on('active_skill_request', add_active_skill_handler)
         self.active_skills = []  # [skill_id , timestamp]
         self.converse_timeout = 5  # minutes to prune active_skills
-        self.waiting_for_converse = False
-        self.converse_result = False
-        self.converse_skill_id = ""
+        self.converse_response_timeout = 5  # seconds to wait for skills
+        self.converse_requests = {}  # Requests waiting for responses
+        self.converse_lock = Lock()
+        # Latest converse latency of each skill
+        self.converse_latencies = {}
 
     def update_skill_name_dict(self, message):
         """
@@ -210,37 +311,83 @@ class IntentService:
         """Let skills know there was a problem with speech recognition"""
         lang = message.data.get('lang', "en-us")
         set_active_lang(lang)
+        # Every active skill is notified, the responses are not awaited
+        converse_id = str(uuid4())
         for skill in self.active_skills:
-            self.do_converse(None, skill[0], lang)
+            self.bus.emit(Message("skill.converse.request", {
+                "skill_id": skill[0], "utterances": None, "lang": lang},
+                {'converse_id': converse_id}))
 
     def do_converse(self, utterances, skill_id, lang):
-        self.waiting_for_converse = True
-        self.converse_result = False
-        self.converse_skill_id = skill_id
-        self.bus.emit(Message("skill.converse.request", {
-            "skill_id": skill_id, "utterances": utterances, "lang": lang}))
-        start_time = time.time()
-        t = 0
-        while self.waiting_for_converse and t < 5:
-            t = time.time() - start_time
-            time.sleep(0.1)
-        self.waiting_for_converse = False
-        self.converse_skill_id = ""
-        return self.converse_result
+        return self.converse([skill_id], utterances, lang) is not None
+
+    def converse(self, skill_ids, utterances, lang, message=None):
+        """Ask skills to handle the utterances in their converse methods.
+
+        The skills are asked in order until one of them accepts the
+        utterances, the remaining skills are not asked.
+
+        Arguments:
+            skill_ids (list): skills in priority order
+            utterances (list): utterances to converse with
+            lang (str): language of the utterances
+            message (Message): message that triggered the converse
+
+        Returns:
+            str: id of the skill handling the utterance, None if no skill
+                 handled it
+        """
+        if not skill_ids:
+            return None
+        request = ConverseRequest(skill_ids)
+        with self.converse_lock:
+            self.converse_requests[request.id] = request
+        handler = None
+        try:
+            for skill_id in skill_ids:
+                request.sent(skill_id)
+                self.bus.emit(Message("skill.converse.request", {
+                    "skill_id": skill_id, "utterances": utterances,
+                    "lang": lang}, {'converse_id': request.id}))
+                if request.wait_for_result(skill_id,
+                                           self.converse_response_timeout):
+                    handler = skill_id
+                    break
+        finally:
+            with self.converse_lock:
+                self.converse_requests.pop(request.id, None)
+
+        with request.condition:
+            latencies = dict(request.latencies)
+        self.converse_latencies.update(latencies)
+        for skill_id, latency in latencies.items():
+            LOG.debug('Converse with {} took {:.3f}s'.format(skill_id,
+                                                             latency))
+        ident = message.context.get('ident') if message else None
+        send_converse_metrics(request, ident)
+        return handler
+
+    def _converse_result(self, message, result):
+        """Deliver a converse response to the request waiting for it."""
+        skill_id = message.data["skill_id"]
+        converse_id = message.context.get('converse_id')
+        with self.converse_lock:
+            if converse_id:
+                requests = [self.converse_requests.get(converse_id)]
+            else:
+                requests = list(self.converse_requests.values())
+        for request in requests:
+            if request:
+                request.set_result(skill_id, result)
 
     def handle_converse_error(self, message):
         skill_id = message.data["skill_id"]
         if message.data["error"] == "skill id does not exist":
             self.remove_active_skill(skill_id)
-        if skill_id == self.converse_skill_id:
-            self.converse_result = False
-            self.waiting_for_converse = False
+        self._converse_result(message, False)
 
     def handle_converse_response(self, message):
-        skill_id = message.data["skill_id"]
-        if skill_id == self.converse_skill_id:
-            self.converse_result = message.data.get("result", False)
-            self.waiting_for_converse = False
+        self._converse_result(message, message.data.get("result", False))
 
     def remove_active_skill(self, skill_id):
         for skill in self.active_skills:
@@ -270,8 +417,10 @@ class IntentService:
             context_entity = tag['entities'][0]
             if self.context_greedy:
                 self.context_manager.inject_context(context_entity)
+                self.result_cache.invalidate()
             elif context_entity['data'][0][1] in self.context_keywords:
                 self.context_manager.inject_context(context_entity)
+                self.result_cache.invalidate()
 
     def send_metrics(self, intent, context, stopwatch):
         """
@@ -333,14 +482,15 @@ class IntentService:
             padatious_intent = None
             with stopwatch:
                 # Give active skills an opportunity to handle the utterance
-                converse = self._converse(combined, lang)
+                converse = self._converse(combined, lang, message)
 
                 if not converse:
                     # No conversation, use intent system to handle utterance
-                    intent = self._adapt_intent_match(utterances,
-                                                      norm_utterances, lang)
-                    for utt in combined:
-                        _intent = PadatiousService.instance.calc_intent(utt)
+                    intent = self._cached_adapt_intent_match(
+                        utterances, norm_utterances, lang)
+                    padatious_intents = \
+                        PadatiousService.instance.calc_intent_batch(combined)
+                    for _intent in padatious_intents:
                         if _intent:
                             best = padatious_intent.conf if padatious_intent\
                                         else 0.0
@@ -385,12 +535,13 @@ class IntentService:
         except Exception as e:
             LOG.exception(e)
 
-    def _converse(self, utterances, lang):
+    def _converse(self, utterances, lang, message=None):
         """ Give active skills a chance at the utterance
 
         Args:
             utterances (list):  list of utterances
             lang (string):      4 letter ISO language code
+            message (Message):  message containing the utterances
 
         Returns:
             bool: True if converse handled it, False if  no skill processes it
@@ -402,14 +553,27 @@ class IntentService:
                                   1] <= self.converse_timeout * 60]
 
         # check if any skill wants to handle utterance
-        for skill in self.active_skills:
-            if self.do_converse(utterances, skill[0], lang):
-                # update timestamp, or there will be a timeout where
-                # intent stops conversing whether its being used or not
-                self.add_active_skill(skill[0])
-                return True
+        skill_ids = [skill[0] for skill in self.active_skills]
+        skill_id = self.converse(skill_ids, utterances, lang, message)
+        if skill_id:
+            # update timestamp, or there will be a timeout where
+            # intent stops conversing whether its being used or not
+            self.add_active_skill(skill_id)
+            return True
         return False
 
+    def _cached_adapt_intent_match(self, raw_utt, norm_utt, lang):
+        """_adapt_intent_match() using the result cache.
+
+        Matches aren't cached while there's context, the context frames
+        expire over time.
+        """
+        if self.context_manager.frame_stack:
+            return self._adapt_intent_match(raw_utt, norm_utt, lang)
+        key = self.result_cache.key('adapt', tuple(raw_utt), lang)
+        return self.result_cache.get(
+            key, lambda: self._adapt_intent_match(raw_utt, norm_utt, lang))
+
     def _adapt_intent_match(self, raw_utt, norm_utt, lang):
         """ Run the Adapt engine to search for an matching intent
 
@@ -463,16 +627,91 @@ class IntentService:
         else:
             self.engine.register_entity(
                 start_concept, end_concept, alias_of=alias_of)
+        self.result_cache.invalidate()
+
+    def handle_register_vocab_bulk(self, message):
+        """Register the vocabulary, regexes and intents of a skill.
+
+        If a reloaded skill sends the same vocabulary again only its intents
+        are registered. If the vocabulary changed the previous keywords and
+        regexes of the skill are removed.
+        """
+        skill_id = message.data.get('skill_id')
+        vocab = message.data.get('vocab', [])
+        regex = message.data.get('regex', [])
+        with self.vocab_lock:
+            if skill_id is None:
+                self._add_vocab(vocab, regex)
+            else:
+                content_hash = vocab_hash(vocab, regex)
+                previous = self.skill_vocab.get(skill_id)
+                if previous is None or previous['hash'] != content_hash:
+                    if previous:
+                        self._remove_vocab(previous['vocab'],
+                                           previous['regex'])
+                    self._add_vocab(vocab, regex)
+                    self.skill_vocab[skill_id] = {'hash': content_hash,
+                                                  'vocab': vocab,
+                                                  'regex': regex}
+
+        for intent in message.data.get('intents', []):
+            self.engine.register_intent_parser(intent_from_dict(intent))
+        self.result_cache.invalidate()
+
+    def _add_vocab(self, vocab, regex):
+        """Insert keywords into the Adapt trie.
+
+        This is what IntentDeterminationEngine.register_entity() does, but
+        each keyword type is only inserted once as a concept.
+        """
+        insert = self.engine.trie.insert
+        concepts = set()
+        for entry in vocab:
+            start, end = entry['start'], entry['end']
+            alias_of = entry.get('alias_of')
+            if alias_of:
+                insert(start.lower(), data=(alias_of, end))
+            else:
+                insert(start.lower(), data=(start, end))
+                concepts.add(end)
+        for concept in concepts:
+            insert(concept.lower(), data=(concept, 'Concept'))
+        for regex_str in regex:
+            self.engine.register_regex_entity(regex_str)
+
+    def _remove_vocab(self, vocab, regex):
+        """Remove keywords added by _add_vocab() from the Adapt trie."""
+        def remove(key, data):
+            try:
+                self.engine.trie.remove(key, data)
+            except KeyError:
+                pass  # Not in the trie (anymore)
+
+        concepts = set()
+        for entry in vocab:
+            start, end = entry['start'], entry['end']
+            remove(start.lower(), (entry.get('alias_of') or start, end))
+            concepts.add(end)
+        for concept in concepts:
+            remove(concept.lower(), (concept, 'Concept'))
+        # The tagger holds a reference to the list, keep it
+        removed = set(regex)
+        self.engine._regex_strings -= removed
+        self.engine.regular_expressions_entities[:] = [
+            r for r in self.engine.regular_expressions_entities
+            if r.pattern not in removed]
 
     def handle_register_intent(self, message):
         intent = open_intent_envelope(message)
         self.engine.register_intent_parser(intent)
+        self.result_cache.invalidate()
 
     def handle_detach_intent(self, message):
         intent_name = message.data.get('intent_name')
         new_parsers = [
             p for p in self.engine.intent_parsers if p.name != intent_name]
         self.engine.intent_parsers = new_parsers
+        self.result_cache.invalidate()
 
     def handle_detach_skill(self, message):
         skill_id = message.data.get('skill_id')
@@ -480,6 +719,7 @@ class IntentService:
             p for p in self.engine.intent_parsers if
             not p.name.startswith(skill_id)]
         self.engine.intent_parsers = new_parsers
+        self.result_cache.invalidate()
 
     def handle_add_context(self, message):
         """ Add context
@@ -501,6 +741,7 @@ class IntentService:
         entity['key'] = word
         entity['origin'] = origin
         self.context_manager.inject_context(entity)
+        self.result_cache.invalidate()
 
     def handle_remove_context(self, message):
         """ Remove specific context
@@ -511,7 +752,12 @@ class IntentService:
         context = message.data.get('context')
         if context:
             self.context_manager.remove_context(context)
+            self.result_cache.invalidate()
 
     def handle_clear_context(self, message):
         """ Clears all keywords from context """
         self.context_manager.clear_context()
+        self.result_cache.invalidate()
+
+    def handle_cache_stats(self, message):
+        self.bus.emit(message.response(self.result_cache.stats()))
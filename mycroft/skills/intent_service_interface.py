@@ -15,6 +15,7 @@
 """The intent service interface offers a unified wrapper class for the
 Intent Service. Including both adapt and padatious.
 """
+from contextlib import contextmanager
 from os.path import exists
 
 from adapt.intent import Intent
@@ -32,10 +33,41 @@ class IntentServiceInterface:
     def __init__(self, bus=None):
         self.bus = bus
         self.registered_intents = []
+        self._bulk = None  # Registrations collected by batch()
 
     def set_bus(self, bus):
         self.bus = bus
 
+    @contextmanager
+    def batch(self, skill_id=None):
+        """Collect the Adapt registrations into a single message.
+
+        Keywords, regexes and intents registered within the with block are
+        sent as one register_vocab.bulk message when the block ends,
+        instead of a message per keyword, alias, regex and intent.
+
+        Arguments:
+            skill_id (str): skill registering, allows the intent service
+                            to skip vocabulary it already has
+
+        Example:
+            with self.intent_service.batch(self.skill_id):
+                self.load_data_files()
+                self._register_decorated()
+        """
+        if self._bulk is not None:  # Nested, the outer batch sends
+            yield
+            return
+        self._bulk = {'vocab': [], 'regex': [], 'intents': []}
+        if skill_id is not None:
+            self._bulk['skill_id'] = skill_id
+        try:
+            yield
+        finally:
+            bulk, self._bulk = self._bulk, None
+            if bulk['vocab'] or bulk['regex'] or bulk['intents']:
+                self.bus.emit(Message('register_vocab.bulk', bulk))
+
     def register_adapt_keyword(self, vocab_type, entity, aliases=None):
         """Send a message to the intent service to add an Adapt keyword.
 
@@ -44,12 +76,14 @@ class IntentServiceInterface:
             aliases (list): List of alternative kewords
         """
         aliases = aliases or []
-        self.bus.emit(Message("register_vocab",
-                              {'start': entity, 'end': vocab_type}))
-        for alias in aliases:
-            self.bus.emit(Message("register_vocab", {
-                'start': alias, 'end': vocab_type, 'alias_of': entity
-            }))
+        entries = [{'start': entity, 'end': vocab_type}]
+        entries += [{'start': alias, 'end': vocab_type, 'alias_of': entity}
+                    for alias in aliases]
+        if self._bulk is not None:
+            self._bulk['vocab'] += entries
+        else:
+            for entry in entries:
+                self.bus.emit(Message("register_vocab", entry))
 
     def register_adapt_regex(self, regex):
         """Register a regex with the intent service.
@@ -58,7 +92,10 @@ class IntentServiceInterface:
             regex (str): Regex to be registered, (Adapt extracts keyword
                          reference from named match group.
         """
-        self.bus.emit(Message("register_vocab", {'regex': regex}))
+        if self._bulk is not None:
+            self._bulk['regex'].append(regex)
+        else:
+            self.bus.emit(Message("register_vocab", {'regex': regex}))
 
     def register_adapt_intent(self, name, intent_parser):
         """Register an Adapt intent parser object.
@@ -66,7 +103,10 @@ class IntentServiceInterface:
         Serializes the intent_parser and sends it over the messagebus to
         registered.
         """
-        self.bus.emit(Message("register_intent", intent_parser.__dict__))
+        if self._bulk is not None:
+            self._bulk['intents'].append(dict(intent_parser.__dict__))
+        else:
+            self.bus.emit(Message("register_intent", intent_parser.__dict__))
         self.registered_intents.append((name, intent_parser))
 
     def detach_intent(self, intent_name):
@@ -161,7 +201,11 @@ class IntentServiceInterface:
 
 def open_intent_envelope(message):
     """Convert dictionary received over messagebus to Intent."""
-    intent_dict = message.data
+    return intent_from_dict(message.data)
+
+
+def intent_from_dict(intent_dict):
+    """Convert a serialized intent parser to Intent."""
     return Intent(intent_dict.get('name'),
                   intent_dict.get('requires'),
                   intent_dict.get('at_least_one'),
@@ -0,0 +1,174 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Content hashed snapshot of the parsed vocabulary and regexes of skills.
+
+At each start the skills read their .voc and .rx files, expanding the
+options of every line and checking every regex. The result only depends on
+the content of the files, so it's stored in a snapshot keyed by a hash of
+the files and reused until the files change.
+
+The snapshot is a json file set by "intent_snapshot" in the skills config
+and is written by the SkillManager once the skills are loaded.
+
+Padatious keeps its own cache of trained intents, see "intent_cache" in
+the padatious config.
+"""
+import hashlib
+import json
+import os
+from os.path import dirname, expanduser, isfile, join, relpath
+from threading import Lock
+
+from mycroft.configuration import Configuration
+from mycroft.util.log import LOG
+from .skill_data import load_regex, load_vocabulary
+
+SNAPSHOT_VERSION = 1
+
+
+def resource_hash(basedir, extension):
+    """Hash of the names and content of the resource files in a directory.
+
+    Arguments:
+        basedir (str): directory to hash, including subdirectories
+        extension (str): extension of the files to include
+
+    Returns:
+        str: hex digest
+    """
+    paths = []
+    for path, _, files in os.walk(basedir):
+        paths += [join(path, f) for f in files if f.endswith(extension)]
+    content_hash = hashlib.sha1()
+    for path in sorted(paths):
+        content_hash.update(relpath(path, basedir).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            content_hash.update(f.read() + b'\0')
+    return content_hash.hexdigest()
+
+
+class IntentSnapshot:
+    """Parsed resources of the skills stored in a file.
+
+    Arguments:
+        path (str): json file of the snapshot
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # key -> {'hash': str, 'data': parsed resources}
+        self.used = set()
+        self.changed = False
+        self.lock = Lock()
+        self._load()
+
+    def _load(self):
+        if not isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') == SNAPSHOT_VERSION:
+                self.entries = snapshot['entries']
+        except Exception as e:
+            LOG.warning('Could not load the intent snapshot '
+                        '({})'.format(repr(e)))
+
+    def get(self, key, content_hash, parse):
+        """Get parsed resources, parsing them if they changed.
+
+        Arguments:
+            key (str): identifier of the resources
+            content_hash (str): hash of the resource files
+            parse (callable): function parsing the resources
+
+        Returns:
+            the parsed resources, from the snapshot if the hash matches
+        """
+        with self.lock:
+            self.used.add(key)
+            entry = self.entries.get(key)
+            if entry and entry['hash'] == content_hash:
+                return entry['data']
+        data = parse()
+        with self.lock:
+            self.entries[key] = {'hash': content_hash, 'data': data}
+            self.changed = True
+        return data
+
+    def save(self):
+        """Write the snapshot if it changed, replacing the previous one.
+
+        Resources not requested since the start, like the ones of removed
+        skills, are left out.
+        """
+        with self.lock:
+            unused = set(self.entries) - self.used
+            if not self.changed and not unused:
+                return
+            entries = {key: entry for key, entry in self.entries.items()
+                       if key in self.used}
+            self.entries = entries
+            self.changed = False
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': SNAPSHOT_VERSION, 'entries': entries},
+                          f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            LOG.warning('Could not save the intent snapshot '
+                        '({})'.format(repr(e)))
+
+
+_snapshot = None
+_snapshot_lock = Lock()
+
+
+def get_snapshot():
+    """Get the snapshot shared by the skills of this process.
+
+    Returns:
+        IntentSnapshot or None if disabled in the configuration
+    """
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                path = Configuration.get().get('skills', {}).get(
+                    'intent_snapshot')
+                _snapshot = IntentSnapshot(expanduser(path)) if path \
+                    else False
+    return _snapshot or None
+
+
+def load_vocabulary_snapshot(basedir, skill_id):
+    """load_vocabulary() using the snapshot."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return load_vocabulary(basedir, skill_id)
+    return snapshot.get('vocab:{}:{}'.format(skill_id, basedir),
+                        resource_hash(basedir, '.voc'),
+                        lambda: load_vocabulary(basedir, skill_id))
+
+
+def load_regex_snapshot(basedir, skill_id):
+    """load_regex() using the snapshot."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return load_regex(basedir, skill_id)
+    return snapshot.get('regex:{}:{}'.format(skill_id, basedir),
+                        resource_hash(basedir, '.rx'),
+                        lambda: load_regex(basedir, skill_id))
@@ -78,6 +78,9 @@ def create_wrapper(handler, skill_id, on_start, on_end, on_error):
                 report_timing(context['ident'], 'skill_handler', stopwatch,
                               {'handler': handler.__name__,
                                'skill_id': skill_id})
+
+    # Lets the bus client run the handler in the skill's lane
+    wrapper.skill_id = skill_id
     return wrapper
 
 
@@ -134,6 +137,7 @@ class EventContainer:
             # allowing them to re-schedule themselves.
             self.remove(name)
             handler(message)
+        once_wrapper.skill_id = getattr(handler, 'skill_id', None)
 
         if handler:
             if once:
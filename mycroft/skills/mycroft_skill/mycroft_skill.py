@@ -28,7 +28,7 @@ from adapt.intent import Intent, IntentBuilder
 
 from mycroft import dialog
 from mycroft.api import DeviceApi
-from mycroft.audio import wait_while_speaking
+from mycroft.audio import speaking_state, wait_while_speaking
 from mycroft.enclosure.api import EnclosureAPI
 from mycroft.enclosure.gui import SkillGUI
 from mycroft.configuration import Configuration
@@ -48,10 +48,9 @@ from mycroft.util.parse import match_one, extract_number
 from .event_container import EventContainer, create_wrapper, get_handler_name
 from ..event_scheduler import EventSchedulerInterface
 from ..intent_service_interface import IntentServiceInterface
+from ..intent_snapshot import load_regex_snapshot, load_vocabulary_snapshot
 from ..settings import get_local_settings, save_settings, Settings
 from ..skill_data import (
-    load_vocabulary,
-    load_regex,
     to_alnum,
     munge_regex,
     munge_intent_parser,
@@ -1061,6 +1060,7 @@ class MycroftSkill:
                 'expect_response': expect_response}
         message = dig_for_message()
         m = message.reply("speak", data) if message else Message("speak", data)
+        speaking_state.speak_requested()
         self.bus.emit(m)
 
         if wait:
@@ -1134,9 +1134,9 @@ class MycroftSkill:
         vocab_dir = join(root_directory, 'vocab', self.lang)
         locale_dir = join(root_directory, 'locale', self.lang)
         if exists(vocab_dir):
-            keywords = load_vocabulary(vocab_dir, self.skill_id)
+            keywords = load_vocabulary_snapshot(vocab_dir, self.skill_id)
         elif exists(locale_dir):
-            keywords = load_vocabulary(locale_dir, self.skill_id)
+            keywords = load_vocabulary_snapshot(locale_dir, self.skill_id)
         else:
             LOG.debug('No vocab loaded')
 
@@ -1159,9 +1159,9 @@ class MycroftSkill:
         regex_dir = join(root_directory, 'regex', self.lang)
         locale_dir = join(root_directory, 'locale', self.lang)
         if exists(regex_dir):
-            regexes = load_regex(regex_dir, self.skill_id)
+            regexes = load_regex_snapshot(regex_dir, self.skill_id)
         elif exists(locale_dir):
-            regexes = load_regex(locale_dir, self.skill_id)
+            regexes = load_regex_snapshot(locale_dir, self.skill_id)
 
         for regex in regexes:
             self.intent_service.register_adapt_regex(regex)
@@ -12,18 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from functools import lru_cache
+"""Padatious intent matching for the skills.
+
+The registered intent and entity files are trained into a new
+IntentContainer in the background while the previous one keeps answering
+queries, and the new container replaces it once trained. Padatious only
+retrains the intents and entities whose lines changed since they were
+cached in "intent_cache", others are loaded from the cache.
+
+With "workers" set in the padatious config, training and matching run in
+worker processes, see padatious_worker.
+"""
+import hashlib
 from subprocess import call
-from threading import Event
-from time import time as get_time, sleep
+from threading import Event, Lock, Timer
+from time import monotonic
 
 from os.path import expanduser, isfile
-from pkg_resources import get_distribution
 
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
+from mycroft.metrics import report_timing, Stopwatch
 from mycroft.skills.core import FallbackSkill
+from mycroft.util.lang import get_active_lang
 from mycroft.util.log import LOG
+from mycroft.skills.padatious_worker import (
+    best_matches,
+    load_container,
+    PadatiousPool
+)
+
+
+def file_hash(file_name):
+    """Hash of the content of an intent or entity file."""
+    with open(file_name, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
 
 
 class PadatiousService(FallbackSkill):
@@ -39,7 +62,8 @@ class PadatiousService(FallbackSkill):
 
         self.padatious_config = Configuration.get()['padatious']
         self.service = service
-        intent_cache = expanduser(self.padatious_config['intent_cache'])
+        self.intent_cache = expanduser(self.padatious_config['intent_cache'])
+        self.pool = None
 
         try:
             from padatious import IntentContainer
@@ -52,11 +76,41 @@ class PadatiousService(FallbackSkill):
                 pass
             return
 
-        self.container = IntentContainer(intent_cache)
+        self.container_class = IntentContainer
+        # Trained container answering the queries, replaced after training
+        self.container = None
+        workers = self.padatious_config.get('workers', 0)
+        if workers:
+            self.pool = PadatiousPool(self.intent_cache, workers)
+
+        # Registered files, name -> file name
+        self.registered_intents = {}
+        self.registered_entities = {}
+        # Hash of the registered files and of the files in the container
+        self.versions = {}
+        self.trained_versions = None
+        self.trained_intents = set()
+
+        self.lock = Lock()
+        self.train_lock = Lock()
+        self.train_timer = None
+        self.train_delay = self.padatious_config['train_delay']
+
+        self.stats = {
+            'trainings': 0,
+            'retrained': 0,        # Files changed since the previous training
+            'last_training': 0.0,  # Seconds
+            'total_training': 0.0,
+            'blackouts': 0,        # Windows without a model to answer with
+            'blackout': 0.0,       # Seconds without a model
+            'unanswered': 0        # Queries during the blackouts
+        }
+        self.blackout_start = monotonic()
 
         self._bus = bus
         self.bus.on('padatious:register_intent', self.register_intent)
         self.bus.on('padatious:register_entity', self.register_entity)
+        self.bus.on('padatious:stats', self.handle_stats)
         self.bus.on('detach_intent', self.handle_detach_intent)
         self.bus.on('detach_skill', self.handle_detach_skill)
         self.bus.on('mycroft.skills.initialized', self.train)
@@ -72,21 +126,33 @@ class PadatiousService(FallbackSkill):
         self.finished_training_event = Event()
         self.finished_initial_train = False
 
-        self.train_delay = self.padatious_config['train_delay']
-        self.train_time = get_time() + self.train_delay
-
-        self.registered_intents = []
+    def _build_container(self, intents, entities, single_thread):
+        if self.pool:
+            self.pool.train(intents, entities, single_thread)
+            return self.pool
+        return load_container(self.container_class, self.intent_cache,
+                              intents, entities, single_thread)
 
     def train(self, message=None):
+        """Train the registered files and switch to the new container.
+
+        Nothing is trained if no file changed since the previous training.
+        Queries are answered by the previous container in the meantime.
+        """
         if message is None:
             single_thread = False
         else:
             single_thread = message.data.get('single_thread', False)
-        self.finished_training_event.clear()
 
-        LOG.info('Training... (single_thread={})'.format(single_thread))
-        self.container.train(single_thread=single_thread)
-        LOG.info('Training complete.')
+        with self.train_lock:
+            with self.lock:
+                intents = dict(self.registered_intents)
+                entities = dict(self.registered_entities)
+                versions = dict(self.versions)
+            if versions == self.trained_versions:
+                LOG.debug('Padatious files unchanged, skipping training')
+            else:
+                self._train(intents, entities, versions, single_thread)
 
         self.finished_training_event.set()
         if not self.finished_initial_train:
@@ -94,16 +160,54 @@ class PadatiousService(FallbackSkill):
             self.bus.emit(Message('mycroft.ready'))
             self.finished_initial_train = True
 
-    def wait_and_train(self):
+    def _train(self, intents, entities, versions, single_thread):
+        previous = self.trained_versions or {}
+        changed = set(versions.items()) ^ set(previous.items())
+        retrained = len({key for key, _ in changed})
+
+        LOG.info('Training {} changed Padatious files... '
+                 '(single_thread={})'.format(retrained, single_thread))
+        stopwatch = Stopwatch()
+        with stopwatch:
+            try:
+                container = self._build_container(intents, entities,
+                                                  single_thread)
+            except Exception:
+                LOG.exception('Padatious training failed')
+                return
+        LOG.info('Training complete in {:.2f}s.'.format(stopwatch.time))
+
+        with self.lock:
+            self.container = container
+            self.trained_versions = versions
+            self.trained_intents = set(intents)
+            self.service.result_cache.invalidate()
+            self.stats['trainings'] += 1
+            self.stats['retrained'] = retrained
+            self.stats['last_training'] = stopwatch.time
+            self.stats['total_training'] += stopwatch.time
+            if self.blackout_start is not None:
+                self.stats['blackouts'] += 1
+                self.stats['blackout'] += monotonic() - self.blackout_start
+                self.blackout_start = None
+        report_timing(None, 'padatious_training', stopwatch,
+                      {'intents': len(intents), 'entities': len(entities),
+                       'retrained': retrained})
+
+    def schedule_training(self):
+        """Train once no file was registered or detached for train_delay.
+
+        Before the initial training the skills are still loading and the
+        training is started by mycroft.skills.initialized.
+        """
         if not self.finished_initial_train:
             return
-        sleep(self.train_delay)
-        if self.train_time < 0.0:
-            return
-
-        if self.train_time <= get_time() + 0.01:
-            self.train_time = -1.0
-            self.train()
+        with self.lock:
+            if self.train_timer:
+                self.train_timer.cancel()
+            self.train_timer = Timer(self.train_delay, self.train)
+            self.train_timer.daemon = True
+            self.train_timer.start()
 
     def __detach_intent(self, intent_name):
         """ Remove an intent if it has been registered.
@@ -111,20 +215,26 @@ class PadatiousService(FallbackSkill):
         Arguments:
             intent_name (str): intent identifier
         """
-        if intent_name in self.registered_intents:
-            self.registered_intents.remove(intent_name)
-            self.container.remove_intent(intent_name)
+        with self.lock:
+            if intent_name not in self.registered_intents:
+                return
+            del self.registered_intents[intent_name]
+            del self.versions[('intent', intent_name)]
+            self.service.result_cache.invalidate()
+        self.schedule_training()
 
     def handle_detach_intent(self, message):
         self.__detach_intent(message.data.get('intent_name'))
 
     def handle_detach_skill(self, message):
         skill_id = message.data['skill_id']
-        remove_list = [i for i in self.registered_intents if skill_id in i]
+        with self.lock:
+            remove_list = [i for i in self.registered_intents
+                           if skill_id in i]
         for i in remove_list:
             self.__detach_intent(i)
 
-    def _register_object(self, message, object_name, register_func):
+    def _register_object(self, message, object_name, registered):
         file_name = message.data['file_name']
         name = message.data['name']
 
@@ -134,20 +244,33 @@ class PadatiousService(FallbackSkill):
             LOG.warning('Could not find file ' + file_name)
             return
 
-        register_func(name, file_name)
-        self.train_time = get_time() + self.train_delay
-        self.wait_and_train()
+        version = file_hash(file_name)
+        with self.lock:
+            registered[name] = file_name
+            self.versions[(object_name, name)] = version
+        self.schedule_training()
 
     def register_intent(self, message):
-        self.registered_intents.append(message.data['name'])
-        self._register_object(message, 'intent', self.container.load_intent)
+        self._register_object(message, 'intent', self.registered_intents)
 
     def register_entity(self, message):
-        self._register_object(message, 'entity', self.container.load_entity)
+        self._register_object(message, 'entity', self.registered_entities)
+
+    def handle_stats(self, message):
+        with self.lock:
+            stats = dict(self.stats)
+            if self.blackout_start is not None:
+                stats['blackout'] += monotonic() - self.blackout_start
+        if self.pool:
+            stats['respawned'] = self.pool.respawned
+        self.bus.emit(message.response(stats))
 
     def handle_fallback(self, message, threshold=0.8):
-        if not self.finished_training_event.is_set():
+        if not self.finished_training_event.is_set() or \
+                self.container is None:
             LOG.debug('Waiting for Padatious training to finish...')
+            with self.lock:
+                self.stats['unanswered'] += 1
             return False
 
         utt = message.data.get('utterance', '')
@@ -172,8 +295,61 @@ class PadatiousService(FallbackSkill):
     def handle_fallback_last_chance(self, message):
         return self.handle_fallback(message, 0.5)
 
-    # NOTE: This cache will keep a reference to this calss (PadatiousService),
-    # but we can live with that since it is used as a singleton.
-    @lru_cache(maxsize=2)   # 2 catches both raw and normalized utts in cache
     def calc_intent(self, utt):
-        return self.container.calc_intent(utt)
+        return self.calc_intent_batch([utt])[0]
+
+    def calc_intent_batch(self, utterances):
+        """Best intent of each utterance, matched in one call.
+
+        Matches are kept in the result cache of the intent service, the
+        None results of a failed matching or a missing container are not.
+
+        Arguments:
+            utterances (list): utterances to match
+
+        Returns:
+            list: MatchData or None for each utterance
+        """
+        cache = self.service.result_cache
+        lang = get_active_lang()
+        keys = [cache.key('padatious', utt, lang) for utt in utterances]
+        cached = [cache.lookup(key) for key in keys]
+        computed, success = self._calc_intents(
+            [utt for utt, (found, _) in zip(utterances, cached)
+             if not found])
+        computed = iter(computed)
+
+        matches = []
+        for key, (found, match) in zip(keys, cached):
+            if not found:
+                match = next(computed)
+                if success:
+                    cache.put(key, match)
+            matches.append(match)
+        return matches
+
+    def _calc_intents(self, utterances):
+        """Best intent of each utterance.
+
+        Returns:
+            tuple: (MatchData or None for each utterance, False if there
+                    was no container to match with or the matching failed)
+        """
+        container = self.container
+        if container is None or not utterances:
+            return [None] * len(utterances), not utterances
+        # Intents detached since the training are left out until the next
+        # container replaces this one
+        with self.lock:
+            excluded = self.trained_intents - set(self.registered_intents)
+        if container is not self.pool:
+            return best_matches(container, utterances, excluded), True
+        try:
+            return self.pool.best_matches(utterances, excluded), True
+        except Exception:
+            LOG.exception('Padatious matching failed')
+            return [None] * len(utterances), False
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.stop()
@@ -0,0 +1,362 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Padatious training and matching in worker processes.
+
+Training and matching are CPU bound and would hold the GIL of the skills
+process, delaying the skill handlers. The PadatiousPool trains in a
+separate process writing the trained intents and entities to the Padatious
+cache. Worker processes then load the trained container from the cache
+and match batches of utterances sent over a pipe, the utterances of a
+batch being split between the workers.
+
+After a training each worker is replaced in turn by a standby process
+loading the new container, the other workers and the replaced worker keep
+answering until the standby is ready. Workers found dead are replaced by
+a new worker loading the current container.
+
+The module only imports Padatious in the worker processes, which are
+started with "spawn" to stay clear of the threads of the skills process.
+"""
+import itertools
+import multiprocessing
+from contextlib import ExitStack
+from threading import Lock
+
+from mycroft.util.log import LOG
+
+
+class WorkerError(Exception):
+    """A Padatious worker process failed to handle a request."""
+
+
+def best_match(matches):
+    """Pick the best match like IntentContainer.calc_intent().
+
+    Arguments:
+        matches (list): MatchData of the intents
+
+    Returns:
+        MatchData or None if there are no matches
+    """
+    if not matches:
+        return None
+    best_conf = max(match.conf for match in matches)
+    return min((match for match in matches if match.conf == best_conf),
+               key=lambda match: sum(map(len, match.matches.values())))
+
+
+def best_matches(container, utterances, excluded=()):
+    """Best match of each utterance.
+
+    Arguments:
+        container (IntentContainer): trained container
+        utterances (list): utterances to match
+        excluded (set): names of intents to leave out
+
+    Returns:
+        list: MatchData or None for each utterance
+    """
+    return [best_match([match for match in container.calc_intents(utt)
+                        if match.name not in excluded])
+            for utt in utterances]
+
+
+def load_container(container_class, cache_dir, intents, entities,
+                   single_thread=True):
+    """Create a container of the intent and entity files and train it.
+
+    Only the files that changed since they were cached are trained.
+
+    Arguments:
+        container_class: IntentContainer or None to import it
+        cache_dir (str): Padatious cache
+        intents (dict): intent name -> file name
+        entities (dict): entity name -> file name
+        single_thread (bool): train in this process
+
+    Returns:
+        IntentContainer
+    """
+    if container_class is None:
+        from padatious import IntentContainer as container_class
+    container = container_class(cache_dir)
+    for name, file_name in entities.items():
+        container.load_entity(name, file_name)
+    for name, file_name in intents.items():
+        container.load_intent(name, file_name)
+    container.train(single_thread=single_thread)
+    return container
+
+
+def _train(container_class, cache_dir, intents, entities, single_thread):
+    load_container(container_class, cache_dir, intents, entities,
+                   single_thread)
+
+
+def _serve(conn, container_class, cache_dir):
+    """Handle the requests of the pool until it's stopped."""
+    container = None
+    while True:
+        try:
+            command, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if command == 'stop':
+            break
+        try:
+            if command == 'load':
+                container = load_container(container_class, cache_dir,
+                                           *args)
+                result = None
+            elif container is None:
+                result = [None] * len(args[0])
+            else:
+                result = best_matches(container, *args)
+            conn.send((True, result))
+        except Exception as e:
+            conn.send((False, repr(e)))
+
+
+class PadatiousWorker:
+    """Worker process holding a trained container.
+
+    Arguments:
+        context: multiprocessing context
+        container_class: IntentContainer or None to import it
+        cache_dir (str): Padatious cache
+    """
+    def __init__(self, context, container_class, cache_dir):
+        self.lock = Lock()
+        self.stopped = False
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve,
+                                       args=(child_conn, container_class,
+                                             cache_dir),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def load(self, intents, entities):
+        """Load the trained container in the worker.
+
+        Raises:
+            WorkerError: if the worker failed to load the container
+        """
+        try:
+            self.send('load', intents, entities)
+        except (OSError, ValueError) as e:
+            raise WorkerError('Worker process is gone ({})'.format(repr(e)))
+        success, result = self.receive()
+        if not success:
+            raise WorkerError(result)
+
+    def send(self, command, *args):
+        self.conn.send((command, args))
+
+    def receive(self):
+        """Get the response of the worker.
+
+        Returns:
+            tuple: (success, result or error)
+        """
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            return False, 'Worker process is gone ({})'.format(repr(e))
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            try:
+                self.send('stop')
+            except (OSError, ValueError):
+                pass
+            self.process.join(1)
+            self.conn.close()
+
+
+class PadatiousPool:
+    """Padatious training process and matching worker processes.
+
+    Arguments:
+        cache_dir (str): Padatious cache
+        workers (int): number of worker processes
+        container_class: IntentContainer or None to import it
+    """
+    def __init__(self, cache_dir, workers, container_class=None):
+        self.context = multiprocessing.get_context('spawn')
+        self.cache_dir = cache_dir
+        self.container_class = container_class
+        self.workers = [self._start_worker() for _ in range(workers)]
+        self.next_worker = itertools.count()
+        # Files of the container loaded in the workers, loaded again by
+        # the workers replacing dead workers
+        self.loaded = None
+        self.respawned = 0
+        self.stopped = False
+        self.lock = Lock()
+        self.respawn_lock = Lock()
+
+    def _start_worker(self):
+        return PadatiousWorker(self.context, self.container_class,
+                               self.cache_dir)
+
+    def _replace(self, index, worker):
+        """Put a worker in place of the worker at an index and stop it.
+
+        The stopped worker answers the requests already sent to it first.
+
+        Raises:
+            WorkerError: if the pool is stopped, the worker is stopped too
+        """
+        with self.lock:
+            if self.stopped:
+                previous = worker
+            else:
+                previous = self.workers[index]
+                self.workers[index] = worker
+        previous.stop()
+        if previous is worker:
+            raise WorkerError('The Padatious pool is stopped')
+
+    def train(self, intents, entities, single_thread=False):
+        """Train the files and load them in the workers.
+
+        Training runs in a new process. Each worker is then replaced in
+        turn by a new worker loading the trained container from the cache,
+        the workers answer with the previous container until then.
+
+        Arguments:
+            intents (dict): intent name -> file name
+            entities (dict): entity name -> file name
+            single_thread (bool): don't train in parallel processes
+        """
+        trainer = self.context.Process(target=_train,
+                                       args=(self.container_class,
+                                             self.cache_dir, intents,
+                                             entities, single_thread))
+        trainer.start()
+        trainer.join()
+        if trainer.exitcode != 0:
+            raise WorkerError('Training failed with exit code '
+                              '{}'.format(trainer.exitcode))
+        for index in range(len(self.workers)):
+            standby = self._start_worker()
+            try:
+                standby.load(intents, entities)
+            except WorkerError:
+                standby.stop()
+                raise
+            self.loaded = intents, entities
+            self._replace(index, standby)
+
+    def best_matches(self, utterances, excluded=()):
+        """Best match of each utterance, see best_matches().
+
+        The utterances are split between the workers.
+        """
+        count = min(len(self.workers), len(utterances))
+        if count == 0:
+            return []
+        start = next(self.next_worker)
+        chosen = [(start + i) % len(self.workers) for i in range(count)]
+        requests = [('calc', utterances[i::count], excluded)
+                    for i in range(count)]
+        results = self._request(chosen, requests)
+
+        matches = [None] * len(utterances)
+        for i, result in enumerate(results):
+            matches[i::count] = result
+        return matches
+
+    def _respawn_dead(self, indexes):
+        """Replace the dead workers at the indexes by new workers.
+
+        The new workers load the current container before answering.
+        """
+        for index in indexes:
+            worker = self.workers[index]
+            if worker.process.is_alive() or self.stopped:
+                continue
+            with self.respawn_lock:
+                if self.workers[index] is not worker:
+                    continue  # Replaced in the meantime
+                LOG.warning('Padatious worker {} exited with code {}, '
+                            'starting a new worker'.format(
+                                index, worker.process.exitcode))
+                new_worker = self._start_worker()
+                try:
+                    if self.loaded:
+                        new_worker.load(*self.loaded)
+                except WorkerError:
+                    new_worker.stop()
+                    raise
+                self._replace(index, new_worker)
+                self.respawned += 1
+
+    def _request(self, indexes, requests):
+        """Send requests to workers and wait for all the results.
+
+        Dead workers are replaced before sending.
+
+        Arguments:
+            indexes (list): index of the worker of each request
+            requests (list): (command, *args) of each request
+
+        Returns:
+            list: result of each request
+        """
+        self._respawn_dead(indexes)
+        responses = None
+        while responses is None:
+            with self.lock:
+                if self.stopped:
+                    raise WorkerError('The Padatious pool is stopped')
+                workers = [self.workers[index] for index in indexes]
+            with ExitStack() as stack:
+                # Locking in a fixed order avoids deadlocks between batches
+                for index in sorted(indexes):
+                    stack.enter_context(workers[indexes.index(index)].lock)
+                # A worker replaced in the meantime is stopped, the request
+                # goes to its replacement
+                if any(worker.stopped for worker in workers):
+                    continue
+                responses = self._send(workers, requests)
+        for success, result in responses:
+            if not success:
+                raise WorkerError(result)
+        return [result for _, result in responses]
+
+    @staticmethod
+    def _send(workers, requests):
+        """Send requests to locked workers and read the responses."""
+        responses = []
+        for worker, request in zip(workers, requests):
+            try:
+                worker.send(*request)
+                responses.append(None)
+            except (OSError, ValueError) as e:
+                responses.append((False, 'Worker process is gone '
+                                         '({})'.format(repr(e))))
+        # Every response is read to keep the pipes in sync
+        return [response or worker.receive()
+                for worker, response in zip(workers, responses)]
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            workers = list(self.workers)
+        for worker in workers:
+            worker.stop()
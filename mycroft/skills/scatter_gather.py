@@ -0,0 +1,265 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Scatter-gather of the common play and common query searches.
+
+CommonPlaySkills and CommonQuerySkills answer play:query and
+question:query messages with a "searching" response followed by a result
+or a "searching": False response. Aggregating skills used to collect the
+responses for a fixed time since they couldn't know how many skills would
+answer.
+
+The skills register themselves with "<query>.register" when they are
+bound to the bus and are removed again by "detach_skill". An aggregator
+sends "<query>.gather" with the phrase:
+
+    {"phrase": "the beatles", "timeout": 5, "threshold": 1.0}
+
+The service sends the query to the skills and answers with
+"<query>.gather.response" as soon as every registered skill has answered,
+a result reaches the confidence threshold or the timeout is reached:
+
+    {"phrase": "the beatles",
+     "results": [...],  # data of the results, best first
+     "response_times": {"skill-id": 0.12},  # seconds until the result
+     "missing": []}  # skills that didn't answer in time
+
+Registered skills not acknowledging the query within "ack_timeout" aren't
+waited for. Skills that didn't register are still waited for once they
+have acknowledged the query.
+"""
+import time
+from threading import Lock, Timer
+from uuid import uuid4
+
+from mycroft.messagebus.message import Message
+from mycroft.util.log import LOG
+
+QUERY_TYPES = ('play:query', 'question:query')
+GATHER_ID = 'gather_id'
+
+
+class GatherRequest:
+    """Responses of the skills to a single query.
+
+    Arguments:
+        phrase (str): phrase searched for
+        responders (set): ids of the skills registered for the query
+        threshold (float): confidence of a result ending the search
+    """
+    def __init__(self, phrase, responders, threshold):
+        self.id = str(uuid4())
+        self.phrase = phrase
+        self.responders = set(responders)
+        self.threshold = threshold
+        self.acknowledged = set()
+        self.results = {}
+        self.declined = set()
+        self.response_times = {}
+        self.sent_at = time.monotonic()
+
+    def add_response(self, data):
+        """Store a response of a skill.
+
+        Arguments:
+            data (dict): data of the <query>.response message
+        """
+        skill_id = data.get('skill_id')
+        if not skill_id or skill_id in self.response_times:
+            return
+        if data.get('searching'):
+            self.acknowledged.add(skill_id)
+            self.responders.add(skill_id)
+            return
+        self.acknowledged.add(skill_id)
+        self.response_times[skill_id] = time.monotonic() - self.sent_at
+        if 'conf' in data:
+            self.results[skill_id] = data
+        else:
+            self.declined.add(skill_id)
+
+    def drop_unacknowledged(self):
+        """Stop waiting for the skills that didn't acknowledge the query."""
+        self.responders &= self.acknowledged
+
+    @property
+    def missing(self):
+        """Skills still expected to answer."""
+        return self.responders - set(self.response_times)
+
+    @property
+    def complete(self):
+        """Check if waiting for more responses is pointless."""
+        if any(r['conf'] >= self.threshold for r in self.results.values()):
+            return True
+        return not self.missing
+
+    def result(self):
+        """Summary of the responses, see the module documentation."""
+        results = sorted(self.results.values(), key=lambda r: r['conf'],
+                         reverse=True)
+        return {'phrase': self.phrase,
+                'results': results,
+                'response_times': dict(self.response_times),
+                'missing': sorted(self.missing)}
+
+
+class ResponseTimes:
+    """Response times of the skills answering a query type."""
+    def __init__(self):
+        self.times = {}  # skill id -> [count, total, max, last]
+
+    def add(self, skill_id, seconds):
+        entry = self.times.setdefault(skill_id, [0, 0.0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] = seconds
+
+    def as_dict(self):
+        """Get count, mean, max and last response time per skill."""
+        return {skill_id: {'count': count, 'mean': total / count,
+                           'max': max_time, 'last': last}
+                for skill_id, (count, total, max_time, last)
+                in self.times.items()}
+
+
+class ScatterGatherService:
+    """Gather the responses of the skills to play and question queries.
+
+    Arguments:
+        bus (MessageBusClient): connection to the bus
+        config (dict): "common_query" section of the skills config
+    """
+    def __init__(self, bus, config=None):
+        config = config or {}
+        self.bus = bus
+        self.ack_timeout = config.get('ack_timeout', 1.0)
+        self.timeout = config.get('timeout', 5.0)
+        self.threshold = config.get('threshold', 1.0)
+        self.lock = Lock()
+        self.responders = {query: set() for query in QUERY_TYPES}
+        self.requests = {}
+        self.response_times = {query: ResponseTimes()
+                               for query in QUERY_TYPES}
+        for query in QUERY_TYPES:
+            bus.on(query + '.register', self.handle_register)
+            bus.on(query + '.gather', self.handle_gather)
+            bus.on(query + '.response', self.handle_response)
+            bus.on(query + '.stats', self.handle_stats)
+        bus.on('detach_skill', self.handle_detach_skill)
+
+    @staticmethod
+    def query_type(message):
+        return message.msg_type.rsplit('.', 1)[0]
+
+    def handle_register(self, message):
+        skill_id = message.data.get('skill_id')
+        if skill_id:
+            with self.lock:
+                self.responders[self.query_type(message)].add(skill_id)
+
+    def handle_detach_skill(self, message):
+        # The skill id is sent with a trailing ":"
+        skill_id = message.data.get('skill_id', '').rstrip(':')
+        with self.lock:
+            for responders in self.responders.values():
+                responders.discard(skill_id)
+
+    def handle_gather(self, message):
+        query = self.query_type(message)
+        timeout = message.data.get('timeout', self.timeout)
+        with self.lock:
+            request = GatherRequest(message.data.get('phrase'),
+                                    self.responders[query],
+                                    message.data.get('threshold',
+                                                     self.threshold))
+            self.requests[request.id] = (query, request, message)
+        data = dict(message.data)
+        data.pop('timeout', None)
+        data.pop('threshold', None)
+        self.bus.emit(message.publish(query, data, {GATHER_ID: request.id}))
+        for delay, final in ((self.ack_timeout, False), (timeout, True)):
+            timer = Timer(delay, self._on_timeout, [request.id, final])
+            timer.daemon = True
+            timer.start()
+
+    def handle_response(self, message):
+        request_id = message.context.get(GATHER_ID)
+        with self.lock:
+            if request_id not in self.requests:
+                return
+            _, request, _ = self.requests[request_id]
+            request.add_response(message.data)
+        self._check(request_id)
+
+    def _on_timeout(self, request_id, final):
+        with self.lock:
+            if request_id not in self.requests:
+                return
+            _, request, _ = self.requests[request_id]
+            request.drop_unacknowledged()
+        self._check(request_id, final)
+
+    def _check(self, request_id, final=False):
+        """Send the result of a request if it's complete."""
+        with self.lock:
+            query, request, message = self.requests.get(request_id,
+                                                        (None, None, None))
+            if request is None or not (final or request.complete):
+                return
+            del self.requests[request_id]
+            for skill_id, seconds in request.response_times.items():
+                self.response_times[query].add(skill_id, seconds)
+        if request.missing:
+            LOG.debug('No {} response from {}'.format(
+                query, ', '.join(sorted(request.missing))))
+        self.bus.emit(message.response(request.result()))
+
+    def handle_stats(self, message):
+        with self.lock:
+            stats = self.response_times[self.query_type(message)].as_dict()
+        self.bus.emit(message.response({'response_times': stats}))
+
+    def shutdown(self):
+        for query in QUERY_TYPES:
+            self.bus.remove(query + '.register', self.handle_register)
+            self.bus.remove(query + '.gather', self.handle_gather)
+            self.bus.remove(query + '.response', self.handle_response)
+            self.bus.remove(query + '.stats', self.handle_stats)
+        self.bus.remove('detach_skill', self.handle_detach_skill)
+
+
+def gather(bus, query, phrase, timeout=5.0, threshold=None, data=None):
+    """Send a query to the skills and wait for the gathered results.
+
+    Arguments:
+        bus (MessageBusClient): connection to the bus
+        query (str): "play:query" or "question:query"
+        phrase (str): phrase to search for
+        timeout (float): max seconds to wait for the skills
+        threshold (float): confidence of a result ending the search, None
+                           for the configured default
+        data (dict): additional data of the query
+
+    Returns:
+        dict: gathered results, see the module documentation, None if the
+              service didn't answer
+    """
+    data = dict(data or {}, phrase=phrase, timeout=timeout)
+    if threshold is not None:
+        data['threshold'] = threshold
+    response = bus.wait_for_response(Message(query + '.gather', data),
+                                     timeout=timeout + 1)
+    return response.data if response else None
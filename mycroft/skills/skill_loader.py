@@ -226,10 +226,12 @@ class SkillLoader:
             self.instance.skill_id = self.skill_id
             self.instance.bind(self.bus)
             try:
-                self.instance.load_data_files()
-                # Set up intent handlers
-                # TODO: can this be a public method?
-                self.instance._register_decorated()
+                # Send the vocabulary and intents in a single message
+                with self.instance.intent_service.batch(self.skill_id):
+                    self.instance.load_data_files()
+                    # Set up intent handlers
+                    # TODO: can this be a public method?
+                    self.instance._register_decorated()
                 self.instance.register_resting_screen()
                 self.instance.initialize()
             except Exception as e:
@@ -22,6 +22,7 @@ from mycroft.enclosure.api import EnclosureAPI
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
 from mycroft.util.log import LOG
+from .intent_snapshot import get_snapshot as get_intent_snapshot
 from .msm_wrapper import create_msm as msm_creator, build_msm_config
 from .settings import SkillSettingsDownloader
 from .skill_loader import SkillLoader
@@ -167,6 +168,7 @@ class SkillManager(Thread):
         LOG.info('Loading installed skills...')
         self._load_new_skills()
         LOG.info("Skills all loaded!")
+        self._save_intent_snapshot()
         self.bus.emit(Message('mycroft.skills.initialized'))
         self._loaded_status = True
 
@@ -186,6 +188,14 @@ class SkillManager(Thread):
         if reload_occured:
             # If a reload occured a skill gid may have changed.
             self.skill_updater.post_manifest(reload_skills_manifest=True)
+            self._save_intent_snapshot()
+
+    @staticmethod
+    def _save_intent_snapshot():
+        """Store the parsed vocabulary of the loaded skills."""
+        snapshot = get_intent_snapshot()
+        if snapshot is not None:
+            snapshot.save()
 
     def _load_new_skills(self):
         """Handle load of skills installed since startup."""
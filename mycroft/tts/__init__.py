@@ -13,12 +13,11 @@
 # limitations under the License.
 #
 from copy import deepcopy
-import hashlib
 import os
 import random
 import re
 from abc import ABCMeta, abstractmethod
-from threading import Thread
+from threading import Lock, Thread
 from time import time, sleep
 
 import os.path
@@ -34,6 +33,9 @@ from mycroft.util import (
 )
 from mycroft.util.log import LOG
 from queue import Queue, Empty
+from . import cache_handler
+from .cache import TTSCache, hash_sentence
+from .pipeline import SynthesisJob, SynthesisPipeline
 
 
 _TTS_ENV = deepcopy(os.environ)
@@ -51,6 +53,23 @@ def send_playback_metric(stopwatch, ident):
     t.start()
 
 
+def send_first_audio_metric(job):
+    """Send time from speech request to start of audio in a background
+    thread.
+    """
+    stopwatch = Stopwatch()
+    stopwatch.timestamp = job.requested_at
+    stopwatch.stop()
+    LOG.debug('Time to first audio: {:.3f}s'.format(stopwatch.time))
+
+    def do_send(stopwatch, ident):
+        report_timing(ident, 'speech_first_audio', stopwatch)
+
+    t = Thread(target=do_send, args=(stopwatch, job.ident))
+    t.daemon = True
+    t.start()
+
+
 class PlaybackThread(Thread):
     """Thread class for playing back tts audio and sending
     viseme data to enclosure.
@@ -59,6 +78,8 @@ class PlaybackThread(Thread):
     def __init__(self, queue):
         super(PlaybackThread, self).__init__()
         self.queue = queue
+        # Job taken off the queue, waiting for synthesis or playing
+        self.current_job = None
         self._terminated = False
         self._processing_queue = False
         # Check if the tts shall have a ducking role set
@@ -71,21 +92,27 @@ class PlaybackThread(Thread):
         self.tts = tts
 
     def clear_queue(self):
-        """Remove all pending playbacks."""
+        """Remove all pending playbacks and cancel their synthesis."""
         while not self.queue.empty():
-            self.queue.get()
+            job = self.queue.get()
+            job.cancel()
+        job = self.current_job
+        if job:
+            job.cancel()
         try:
             self.p.terminate()
         except Exception:
             pass
 
     def run(self):
-        """Thread main loop. Get audio and extra data from queue and play.
-
-        The queue messages is a tuple containing
-        snd_type: 'mp3' or 'wav' telling the loop what format the data is in
-        data: path to temporary audio data
-        videmes: list of visemes to display while playing
+        """Thread main loop. Get synthesis jobs from queue and play.
+
+        The queue contains SynthesisJob objects in the order they shall be
+        spoken. The loop waits for the synthesis of each job to finish, the
+        job then contains
+        audio_ext: 'mp3' or 'wav' telling the loop what format the data is in
+        wav_file: path to temporary audio data
+        visemes: list of visemes to display while playing
         listen: if listening should be triggered at the end of the sentence.
 
         Playback of audio is started and the visemes are sent over the bus
@@ -96,26 +123,27 @@ class PlaybackThread(Thread):
         listening.
         """
         while not self._terminated:
+            listen = False
             try:
-                (snd_type, data,
-                 visemes, ident, listen) = self.queue.get(timeout=2)
+                job = self.queue.get(timeout=2)
+                self.current_job = job
+                listen = job.listen
                 self.blink(0.5)
+                first_audio = not self._processing_queue
                 if not self._processing_queue:
                     self._processing_queue = True
                     self.tts.begin_audio()
 
-                stopwatch = Stopwatch()
-                with stopwatch:
-                    if snd_type == 'wav':
-                        self.p = play_wav(data, environment=self.pulse_env)
-                    elif snd_type == 'mp3':
-                        self.p = play_mp3(data, environment=self.pulse_env)
-
-                    if visemes:
-                        self.show_visemes(visemes)
-                    self.p.communicate()
-                    self.p.wait()
-                send_playback_metric(stopwatch, ident)
+                job.wait()
+                # Let the synthesis of the next job start
+                job.release_slot()
+                if job.error:
+                    self.tts.handle_synthesis_error(job)
+                elif not job.cancelled:
+                    if first_audio:
+                        send_first_audio_metric(job)
+                    self.play(job)
+                self.current_job = None
 
                 if self.queue.empty():
                     self.tts.end_audio(listen)
@@ -125,10 +153,30 @@ class PlaybackThread(Thread):
                 pass
             except Exception as e:
                 LOG.exception(e)
+                self.current_job = None
                 if self._processing_queue:
                     self.tts.end_audio(listen)
                     self._processing_queue = False
 
+    def play(self, job):
+        """Play the audio of a synthesized job and show its visemes.
+
+        Arguments:
+            job (SynthesisJob): the synthesized job
+        """
+        stopwatch = Stopwatch()
+        with stopwatch:
+            if job.audio_ext == 'wav':
+                self.p = play_wav(job.wav_file, environment=self.pulse_env)
+            elif job.audio_ext == 'mp3':
+                self.p = play_mp3(job.wav_file, environment=self.pulse_env)
+
+            if job.visemes:
+                self.show_visemes(job.visemes)
+            self.p.communicate()
+            self.p.wait()
+        send_playback_metric(stopwatch, job.ident)
+
     def show_visemes(self, pairs):
         """Send viseme data to enclosure
 
@@ -169,6 +217,10 @@ class TTS(metaclass=ABCMeta):
         phonetic_spelling (bool): Whether to spell certain words phonetically
         ssml_tags (list): Supported ssml properties. Ex. ['speak', 'prosody']
     """
+    # Engines which can run get_tts() from several threads at once set this,
+    # others synthesize one chunk at a time
+    concurrent_synthesis = False
+
     def __init__(self, lang, config, validator, audio_ext='wav',
                  phonetic_spelling=True, ssml_tags=None):
         super(TTS, self).__init__()
@@ -183,13 +235,29 @@ class TTS(metaclass=ABCMeta):
         self.voice = config.get("voice")
         self.filename = '/tmp/tts.wav'
         self.enclosure = None
+        self._speaking = False
         random.seed()
         self.queue = Queue()
         self.playback = PlaybackThread(self.queue)
+        tts_config = Configuration.get().get('tts', {})
+        # Number of chunks synthesized ahead of playback, 0 synthesizes
+        # each chunk in execute()
+        lookahead = tts_config.get('lookahead', 2)
+        self.pipeline = SynthesisPipeline(self._synthesize_job,
+                                          lookahead)
+        self._synthesis_lock = Lock()
+        # Identical chunks synthesized concurrently share a lock
+        self._key_locks = [Lock() for _ in range(16)]
+        # Called with (sentence, ident, error) when synthesis fails
+        self.synthesis_error_handler = None
         self.playback.start()
-        self.clear_cache()
         self.spellings = self.load_spellings()
         self.tts_name = type(self).__name__
+        self.cache = TTSCache.from_config(
+            mycroft.util.get_cache_directory("tts/" + self.tts_name),
+            self.tts_name, self.voice, self.lang, tts_config.get('cache', {}))
+        if config.get('preloaded_cache'):
+            cache_handler.copy_cache(config['preloaded_cache'], self.cache)
 
     def load_spellings(self):
         """Load phonetic spellings of words as dictionary"""
@@ -227,11 +295,22 @@ class TTS(metaclass=ABCMeta):
         if listen:
             self.bus.emit(Message('mycroft.mic.listen'))
         # Clean the cache as needed
-        cache_dir = mycroft.util.get_cache_directory("tts/" + self.tts_name)
-        mycroft.util.curate_cache(cache_dir, min_free_percent=100)
+        self.cache.curate()
 
         # This check will clear the "signal"
         check_for_signal("isSpeaking")
+        self._publish_speaking(False)
+
+    def _publish_speaking(self, speaking):
+        """Notify listeners when speech starts or ends.
+
+        Arguments:
+            speaking (bool): True if speech has started
+        """
+        if speaking != self._speaking:
+            self._speaking = speaking
+            self.bus.emit(Message('mycroft.audio.speaking',
+                                  {'speaking': speaking}))
 
     def init(self, bus):
         """Performs intial setup of TTS object.
@@ -308,11 +387,31 @@ class TTS(metaclass=ABCMeta):
         """
         return [sentence]
 
+    def prepare_sentence(self, sentence):
+        """Split a sentence into the chunks sent to the TTS engine.
+
+        Unsupported ssml is removed and phonetic spellings are applied.
+
+        Arguments:
+            sentence (str): sentence to be spoken
+
+        Returns:
+            list: list of sentence parts
+        """
+        sentence = self.validate_ssml(sentence)
+        if self.phonetic_spelling:
+            for word in re.findall(r"[\w']+", sentence):
+                if word.lower() in self.spellings:
+                    sentence = sentence.replace(word,
+                                                self.spellings[word.lower()])
+        return self._preprocess_sentence(sentence)
+
     def execute(self, sentence, ident=None, listen=False):
         """Convert sentence to speech, preprocessing out unsupported ssml
 
             The method caches results if possible using the hash of the
-            sentence.
+            sentence. The chunks of the sentence are synthesized by the
+            synthesis pipeline while previous chunks are being played.
 
             Arguments:
                 sentence:   Sentence to be spoken
@@ -320,37 +419,88 @@ class TTS(metaclass=ABCMeta):
                 listen:     True if listen should be triggered at the end
                             of the utterance.
         """
-        sentence = self.validate_ssml(sentence)
-
         create_signal("isSpeaking")
-        if self.phonetic_spelling:
-            for word in re.findall(r"[\w']+", sentence):
-                if word.lower() in self.spellings:
-                    sentence = sentence.replace(word,
-                                                self.spellings[word.lower()])
-
-        chunks = self._preprocess_sentence(sentence)
+        self._publish_speaking(True)
+        chunks = self.prepare_sentence(sentence)
         # Apply the listen flag to the last chunk, set the rest to False
         chunks = [(chunks[i], listen if i == len(chunks) - 1 else False)
                   for i in range(len(chunks))]
 
         for sentence, l in chunks:
-            key = str(hashlib.md5(
-                sentence.encode('utf-8', 'ignore')).hexdigest())
-            wav_file = os.path.join(
-                mycroft.util.get_cache_directory("tts/" + self.tts_name),
-                key + '.' + self.audio_ext)
-
-            if os.path.exists(wav_file):
-                LOG.debug("TTS cache hit")
-                phonemes = self.load_phonemes(key)
-            else:
-                wav_file, phonemes = self.get_tts(sentence, wav_file)
-                if phonemes:
-                    self.save_phonemes(key, phonemes)
+            job = SynthesisJob(sentence, ident, l)
+            self.pipeline.submit(job)
+            self.queue.put(job)
+
+    def _synthesize_job(self, job):
+        """Synthesize the audio of a job, using the cache if possible.
 
-            vis = self.viseme(phonemes) if phonemes else None
-            self.queue.put((self.audio_ext, wav_file, vis, ident, l))
+        Arguments:
+            job (SynthesisJob): job to synthesize
+        """
+        key = self.cache_key(job.sentence)
+        entry = self.cache.get(key)
+        if not entry:
+            with self.synthesis_lock(key):
+                # An identical chunk may have been synthesized meanwhile
+                entry = self.cache.get(key)
+                if not entry:
+                    wav_file, phonemes = self.get_tts(
+                        job.sentence,
+                        self.cache.audio_file(key, self.audio_ext))
+                    try:
+                        self.cache.put(key, wav_file, phonemes)
+                    except OSError:
+                        LOG.exception("Failed to add {} to "
+                                      "cache".format(wav_file))
+        if entry:
+            LOG.debug("TTS cache hit")
+            wav_file, phonemes = entry.audio_file, entry.phonemes
+
+        vis = self.viseme(phonemes) if phonemes else None
+        job.set_result(self.audio_ext, wav_file, vis)
+
+    def cache_variant(self):
+        """Synthesis settings the audio depends on besides the voice.
+
+        Engines synthesizing with another voice than the configured one,
+        or with options changing the audio, return them here so the audio
+        is cached separately.
+
+        Returns:
+            str: settings in use, None if the defaults are used
+        """
+        return None
+
+    def cache_key(self, sentence):
+        """Get the cache key of the audio of a sentence.
+
+        Arguments:
+            sentence (str): the sentence
+
+        Returns:
+            str: key of the audio synthesized with the current settings
+        """
+        return hash_sentence(sentence, self.cache_variant())
+
+    def synthesis_lock(self, key):
+        """Lock to hold while calling get_tts() for a chunk.
+
+        Arguments:
+            key (str): cache key of the chunk
+        """
+        if self.concurrent_synthesis:
+            return self._key_locks[int(key[:8], 16) % len(self._key_locks)]
+        return self._synthesis_lock
+
+    def handle_synthesis_error(self, job):
+        """Pass a failed synthesis job on to the synthesis_error_handler.
+
+        Arguments:
+            job (SynthesisJob): the failed job
+        """
+        LOG.error('TTS synthesis failed ({})'.format(repr(job.error)))
+        if self.synthesis_error_handler:
+            self.synthesis_error_handler(job.sentence, job.ident, job.error)
 
     def viseme(self, phonemes):
         """Create visemes from phonemes. Needs to be implemented for all
@@ -363,18 +513,7 @@ class TTS(metaclass=ABCMeta):
 
     def clear_cache(self):
         """Remove all cached files."""
-        if not os.path.exists(mycroft.util.get_cache_directory('tts')):
-            return
-        for d in os.listdir(mycroft.util.get_cache_directory("tts")):
-            dir_path = os.path.join(mycroft.util.get_cache_directory("tts"), d)
-            if os.path.isdir(dir_path):
-                for f in os.listdir(dir_path):
-                    file_path = os.path.join(dir_path, f)
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-            # If no sub-folders are present, check if it is a file & clear it
-            elif os.path.isfile(dir_path):
-                os.unlink(dir_path)
+        self.cache.clear()
 
     def save_phonemes(self, key, phonemes):
         """Cache phonemes
@@ -383,36 +522,20 @@ class TTS(metaclass=ABCMeta):
             key:        Hash key for the sentence
             phonemes:   phoneme string to save
         """
-        cache_dir = mycroft.util.get_cache_directory("tts/" + self.tts_name)
-        pho_file = os.path.join(cache_dir, key + ".pho")
-        try:
-            with open(pho_file, "w") as cachefile:
-                cachefile.write(phonemes)
-        except Exception:
-            LOG.exception("Failed to write {} to cache".format(pho_file))
-            pass
+        self.cache.set_phonemes(key, phonemes)
 
     def load_phonemes(self, key):
-        """Load phonemes from cache file.
+        """Load phonemes from cache.
 
         Arguments:
             Key:    Key identifying phoneme cache
         """
-        pho_file = os.path.join(
-            mycroft.util.get_cache_directory("tts/" + self.tts_name),
-            key + ".pho")
-        if os.path.exists(pho_file):
-            try:
-                with open(pho_file, "r") as cachefile:
-                    phonemes = cachefile.read().strip()
-                return phonemes
-            except Exception:
-                LOG.debug("Failed to read .PHO from cache")
-        return None
+        return self.cache.get_phonemes(key)
 
     def __del__(self):
         self.playback.stop()
         self.playback.join()
+        self.pipeline.shutdown()
 
 
 class TTSValidator(metaclass=ABCMeta):
@@ -0,0 +1,362 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Size bounded cache of synthesized audio.
+
+The audio files are stored in the TTS cache directory and indexed in an
+SQLite database in the same directory. Entries are keyed by engine, voice,
+language and the hash of the sentence and also hold the phonemes of the
+audio. When the cache grows beyond its size or entry limits the least
+recently (lru) or least frequently (lfu) used entries are evicted.
+
+The limits are set in the "cache" section of the tts configuration:
+
+    "cache": {
+        "max_mb": 100,          // Total size of the audio files
+        "max_entries": 5000,    // Number of cached sentences
+        "policy": "lru"         // "lru" or "lfu"
+    }
+"""
+import hashlib
+import json
+import shutil
+import sqlite3
+import time
+from threading import Lock
+
+import os
+import os.path
+import psutil
+
+from mycroft.util.log import LOG
+
+
+def hash_sentence(sentence, variant=None):
+    """Get the cache key of a sentence.
+
+    Arguments:
+        sentence (str): the sentence
+        variant (str): synthesis settings the audio depends on besides the
+                       engine, voice and language, None for the defaults
+
+    Returns:
+        str: md5 hex digest of the sentence
+    """
+    if variant:
+        sentence = sentence + '\n' + variant
+    return hashlib.md5(sentence.encode('utf-8', 'ignore')).hexdigest()
+
+
+class CacheEntry:
+    """Audio file and phonemes of a cached sentence."""
+    def __init__(self, audio_file, phonemes=None):
+        self.audio_file = audio_file
+        self.phonemes = phonemes
+
+
+class TTSCache:
+    """Audio cache for a TTS engine indexed in an SQLite database.
+
+    Lookups only touch the index, the audio files aren't checked on disk.
+    Entries with missing audio files are dropped when the cache is opened.
+
+    Arguments:
+        directory (str): directory for the audio files and the index
+        engine (str): name of the TTS engine
+        voice (str): voice of the engine
+        lang (str): language of the engine
+        max_bytes (int): max total size of the cached audio, None for no
+                         limit
+        max_entries (int): max number of cached sentences, None for no
+                           limit
+        policy (str): eviction policy, 'lru' or 'lfu'
+    """
+    INDEX_FILE = 'index.db'
+    POLICIES = {
+        'lru': 'last_used ASC',
+        'lfu': 'hits ASC, last_used ASC'
+    }
+
+    def __init__(self, directory, engine, voice=None, lang=None,
+                 max_bytes=None, max_entries=None, policy='lru'):
+        self.directory = directory
+        self.engine = engine
+        self.voice = voice or ''
+        self.lang = lang or ''
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        if policy not in self.POLICIES:
+            LOG.error('Unknown cache policy {}, using lru'.format(policy))
+            policy = 'lru'
+        self.policy = policy
+
+        # Counters for this session
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        self._db = sqlite3.connect(os.path.join(directory, self.INDEX_FILE),
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'engine TEXT, voice TEXT, lang TEXT, '
+                         'text_hash TEXT, audio_file TEXT, '
+                         'size INTEGER, phonemes TEXT, '
+                         'hits INTEGER DEFAULT 0, last_used REAL, '
+                         'PRIMARY KEY (engine, voice, lang, text_hash))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_last_used '
+                         'ON entries (last_used)')
+        self._db.commit()
+        self._drop_missing()
+
+    @classmethod
+    def from_config(cls, directory, engine, voice, lang, config):
+        """Create a cache using the limits of the tts cache config.
+
+        Arguments:
+            directory (str): directory for the audio files and the index
+            engine (str): name of the TTS engine
+            voice (str): voice of the engine
+            lang (str): language of the engine
+            config (dict): the "cache" section of the tts config
+        """
+        max_mb = config.get('max_mb', 100)
+        return cls(directory, engine, voice, lang,
+                   max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+                   max_entries=config.get('max_entries') or None,
+                   policy=config.get('policy', 'lru'))
+
+    @property
+    def _namespace(self):
+        return (self.engine, self.voice, self.lang)
+
+    def _drop_missing(self):
+        """Remove index entries whose audio file has been deleted."""
+        with self._lock:
+            rows = self._db.execute('SELECT rowid, audio_file '
+                                    'FROM entries').fetchall()
+            missing = [(rowid,) for rowid, audio_file in rows
+                       if not os.path.isfile(audio_file)]
+            if missing:
+                LOG.debug('Dropping {} TTS cache entries without audio'
+                          .format(len(missing)))
+                self._db.executemany('DELETE FROM entries WHERE rowid=?',
+                                     missing)
+                self._db.commit()
+
+    def audio_file(self, key, audio_ext):
+        """Get the path where audio for a sentence should be stored.
+
+        Arguments:
+            key (str): hash of the sentence
+            audio_ext (str): file extension of the audio
+
+        Returns:
+            str: path in the cache directory
+        """
+        name = hashlib.md5('/'.join((self.engine, self.voice, self.lang,
+                                     key)).encode()).hexdigest()
+        return os.path.join(self.directory, name + '.' + audio_ext)
+
+    def get(self, key):
+        """Look up a sentence, marking it as used.
+
+        Arguments:
+            key (str): hash of the sentence
+
+        Returns:
+            CacheEntry: the cached entry, None if the sentence isn't cached
+        """
+        with self._lock:
+            row = self._db.execute('SELECT audio_file, phonemes '
+                                   'FROM entries WHERE engine=? AND '
+                                   'voice=? AND lang=? AND text_hash=?',
+                                   self._namespace + (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE entries SET hits=hits+1, last_used=? '
+                             'WHERE engine=? AND voice=? AND lang=? AND '
+                             'text_hash=?',
+                             (time.time(),) + self._namespace + (key,))
+            self._db.commit()
+        audio_file, phonemes = row
+        return CacheEntry(audio_file, self._load(phonemes))
+
+    def __contains__(self, key):
+        """Check if a sentence is cached without marking it as used."""
+        with self._lock:
+            row = self._db.execute('SELECT 1 FROM entries WHERE engine=? '
+                                   'AND voice=? AND lang=? AND '
+                                   'text_hash=?',
+                                   self._namespace + (key,)).fetchone()
+        return row is not None
+
+    def put(self, key, audio_file, phonemes=None):
+        """Add synthesized audio to the cache.
+
+        Arguments:
+            key (str): hash of the sentence
+            audio_file (str): path to the audio, should be in the cache
+                              directory (see audio_file())
+            phonemes: phonemes of the audio
+        """
+        size = os.path.getsize(audio_file)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO entries (engine, voice, '
+                             'lang, text_hash, audio_file, size, phonemes, '
+                             'hits, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, '
+                             '0, ?)',
+                             self._namespace + (key, audio_file, size,
+                                                self._dump(phonemes),
+                                                time.time()))
+            self._db.commit()
+            self._evict(self.max_bytes, self.max_entries, keep=audio_file)
+
+    def add_file(self, key, source, phonemes=None):
+        """Copy an existing audio file into the cache.
+
+        Arguments:
+            key (str): hash of the sentence
+            source (str): path to the audio file
+            phonemes: phonemes of the audio
+        """
+        audio_ext = os.path.splitext(source)[1].lstrip('.') or 'wav'
+        audio_file = self.audio_file(key, audio_ext)
+        shutil.copyfile(source, audio_file)
+        self.put(key, audio_file, phonemes)
+
+    def set_phonemes(self, key, phonemes):
+        """Update the phonemes of a cached sentence."""
+        with self._lock:
+            phonemes = self._dump(phonemes)
+            self._db.execute('UPDATE entries SET phonemes=? WHERE engine=? '
+                             'AND voice=? AND lang=? AND text_hash=?',
+                             (phonemes,) + self._namespace + (key,))
+            self._db.commit()
+
+    def get_phonemes(self, key):
+        """Get the phonemes of a cached sentence.
+
+        Returns:
+            phonemes or None if not cached
+        """
+        with self._lock:
+            row = self._db.execute('SELECT phonemes FROM entries WHERE '
+                                   'engine=? AND voice=? AND lang=? AND '
+                                   'text_hash=?',
+                                   self._namespace + (key,)).fetchone()
+        return self._load(row[0]) if row else None
+
+    @staticmethod
+    def _dump(phonemes):
+        return json.dumps(phonemes) if phonemes is not None else None
+
+    @staticmethod
+    def _load(phonemes):
+        try:
+            return json.loads(phonemes) if phonemes is not None else None
+        except ValueError:
+            LOG.error('Failed to read phonemes from cache')
+            return None
+
+    def _totals(self):
+        return self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) '
+                                'FROM entries').fetchone()
+
+    def _evict(self, max_bytes=None, max_entries=None, keep=None):
+        """Remove entries until the cache is within the limits.
+
+        Must be called with the lock held.
+
+        Arguments:
+            max_bytes (int): max total size, None for no limit
+            max_entries (int): max number of entries, None for no limit
+            keep (str): audio file that shouldn't be evicted
+        """
+        def within_limits():
+            return ((max_bytes is None or total <= max_bytes) and
+                    (max_entries is None or count <= max_entries))
+
+        count, total = self._totals()
+        if within_limits():
+            return
+
+        victims = []
+        rows = self._db.execute('SELECT rowid, audio_file, size FROM entries '
+                                'ORDER BY ' + self.POLICIES[self.policy])
+        for rowid, audio_file, size in rows:
+            if within_limits():
+                break
+            if audio_file != keep:
+                victims.append((rowid, audio_file))
+                total -= size
+                count -= 1
+
+        for _, audio_file in victims:
+            try:
+                os.remove(audio_file)
+            except OSError:
+                pass
+        self._db.executemany('DELETE FROM entries WHERE rowid=?',
+                             [(rowid,) for rowid, _ in victims])
+        self._db.commit()
+        LOG.debug('Evicted {} entries from the TTS cache'
+                  .format(len(victims)))
+
+    def curate(self, min_free_disk=50):
+        """Evict entries if the disk is running out of space.
+
+        Arguments:
+            min_free_disk (float): minimum free disk space in MB
+        """
+        free = psutil.disk_usage(self.directory).free
+        bytes_needed = int(min_free_disk * 1024 * 1024) - free
+        if bytes_needed > 0:
+            LOG.info('Low diskspace detected, cleaning TTS cache')
+            with self._lock:
+                _, total = self._totals()
+                self._evict(max_bytes=max(0, total - bytes_needed))
+
+    def clear(self):
+        """Remove all cached audio of the engine."""
+        with self._lock:
+            rows = self._db.execute('SELECT audio_file FROM entries '
+                                    'WHERE engine=?', (self.engine,))
+            for audio_file, in rows.fetchall():
+                try:
+                    os.remove(audio_file)
+                except OSError:
+                    pass
+            self._db.execute('DELETE FROM entries WHERE engine=?',
+                             (self.engine,))
+            self._db.commit()
+
+    def stats(self):
+        """Get cache statistics.
+
+        Returns:
+            dict: number of entries, total bytes and the session's hits
+                  and misses
+        """
+        with self._lock:
+            count, total = self._totals()
+        return {'entries': count, 'bytes': total,
+                'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
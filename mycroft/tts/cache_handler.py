@@ -14,166 +14,331 @@
 
 """
 Cache handler - reads all the .dialog files (The default
-mycroft responses) and does a tts inference.
-It then saves the .wav files to mark1 device
+mycroft responses and the responses of the installed skills) and
+pre-warms the TTS cache with them.
 
-"""
+Sentences are synthesized by the configured TTS using a pool of workers.
+Sentences already in the cache index are skipped and dialog files that
+have been completely processed are recorded in a state file, so an
+interrupted run is resumed where it stopped.
+
+If the TTS has a "preloaded_cache" directory configured the synthesized
+audio is also stored there, it's imported into the cache when the TTS
+starts so the cache survives reboots.
 
-import base64
+Run as:
+    python -m mycroft.tts.cache_handler [--skills] [--workers N]
+"""
+import argparse
 import glob
+import json
 import os
 import re
 import shutil
-import hashlib
-import json
-import mycroft.util as util
-from urllib import parse
-from requests_futures.sessions import FuturesSession
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from mycroft.configuration import Configuration
+from mycroft.util.format import expand_options
 from mycroft.util.log import LOG
 
 
 REGEX_SPL_CHARS = re.compile(r'[@#$%^*()<>/\|}{~:]')
-MIMIC2_URL = 'https://mimic-api.mycroft.ai/synthesize?text='
-
-# For now we only get the cache for mimic2-kusal
-TTS = 'Mimic2'
+STATE_FILE = 'prewarm.json'
+AUDIO_EXTENSIONS = ('.wav', '.mp3')
 
 # Check for more default dialogs
 res_path = os.path.abspath(os.path.join(os.path.abspath(__file__), '..',
-                                        '..', 'res', 'text', 'en-us'))
-wifi_setup_path = '/usr/local/mycroft/mycroft-wifi-setup/dialog/en-us'
-cache_dialog_path = [res_path, wifi_setup_path]
+                                        '..', 'res', 'text'))
+wifi_setup_path = '/usr/local/mycroft/mycroft-wifi-setup/dialog'
 
 
-def generate_cache_text(cache_audio_dir, cache_text_file):
-    """
-    This prepares a text file with all the sentences
-    from *.dialog files present in
-    mycroft/res/text/en-us and mycroft-wifi setup skill
-    Args:
-        cache_audio_dir (path): path to store .wav files
-        cache_text_file (file): file containing the sentences
+def get_dialog_dirs(lang, skills=True):
+    """Get the directories containing dialog files.
+
+    Mycroft's own dialogs come first since they're spoken during boot.
+
+    Arguments:
+        lang (str): language of the dialogs
+        skills (bool): include the dialogs of the installed skills
+
+    Returns:
+        list: existing dialog directories
     """
-    try:
-        if not os.path.isfile(cache_text_file):
-            os.makedirs(cache_audio_dir)
-            f = open(cache_text_file, 'w')
-            for each_path in cache_dialog_path:
-                if os.path.exists(each_path):
-                    write_cache_text(each_path, f)
-            f.close()
-            LOG.debug("Completed generating cache")
-        else:
-            LOG.debug("Cache file 'cache_text.txt' already exists")
-    except Exception:
-        LOG.error("Could not open text file to write cache")
+    dirs = [os.path.join(res_path, lang), os.path.join(wifi_setup_path, lang)]
+    if skills:
+        config = Configuration.get()
+        skills_config = config.get('skills', {})
+        skills_dirs = [
+            os.path.join(config.get('data_dir', '/opt/mycroft'),
+                         skills_config.get('msm', {}).get('directory',
+                                                          'skills')),
+            skills_config.get('directory', '~/.mycroft/skills')
+        ]
+        for skills_dir in skills_dirs:
+            skills_dir = os.path.expanduser(skills_dir)
+            for skill_dir in sorted(glob.glob(os.path.join(skills_dir, '*'))):
+                dirs += [os.path.join(skill_dir, 'dialog', lang),
+                         os.path.join(skill_dir, 'locale', lang)]
+    return [d for d in dirs if os.path.isdir(d)]
 
 
-def write_cache_text(cache_path, f):
-    for file in glob.glob(cache_path + "/*.dialog"):
-        try:
-            with open(file, 'r') as fp:
-                all_dialogs = fp.readlines()
-                for each_dialog in all_dialogs:
-                    # split the sentences
-                    each_dialog = re.split(
-                        r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\;|\?)\s',
-                        each_dialog.strip())
-                    for each in each_dialog:
-                        if (REGEX_SPL_CHARS.search(each) is None):
-                            # Do not consider sentences with special
-                            # characters other than any punctuation
-                            # ex : <<< LOADING <<<
-                            # should not be considered
-                            f.write(each.strip() + '\n')
-        except Exception:
-            # LOG.debug("Dialog Skipped")
-            pass
-
-
-def download_audio(cache_audio_dir, cache_text_file):
+def split_sentences(text):
+    """Split text into sentences the way the audio service does."""
+    # Keep abbreviations like A. Lincoln in one sentence
+    text = re.sub(r'\b([A-za-z][\.])(\s+)', r'\g<1>', text)
+    return re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\;|\?)\s', text)
+
+
+def read_dialog_sentences(dialog_file):
+    """Read the sentences which can be rendered from a dialog file.
+
+    Lines with template variables can't be rendered without context and
+    are skipped, alternatives like "(hi|hello) there" are expanded.
+
+    Arguments:
+        dialog_file (str): path to the dialog file
+
+    Returns:
+        list: sentences of the dialog
     """
-    This method takes the sentences from the text file generated
-    using generate_cache_text() and performs TTS inference on
-    mimic2-api. The wav files and phonemes are stored in
-    'cache_audio_dir'
-    Args:
-        cache_audio_dir (path): path to store .wav files
-        cache_text_file (file): file containing the sentences
+    sentences = []
+    with open(dialog_file, 'r', encoding='utf8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '{' in line:
+                continue
+            for option in expand_options(line):
+                for sentence in split_sentences(option):
+                    sentence = sentence.strip()
+                    # Do not consider sentences with special
+                    # characters other than any punctuation
+                    # ex : <<< LOADING <<<
+                    # should not be considered
+                    if sentence and REGEX_SPL_CHARS.search(sentence) is None:
+                        sentences.append(sentence)
+    return sentences
+
+
+class PrewarmState:
+    """Dialog files which have been pre-warmed, stored as a json file.
+
+    The cache may have been cleared since, prewarm() only skips a file if
+    its sentences are still cached.
+
+    Arguments:
+        path (str): path to the state file
     """
-    if os.path.isfile(cache_text_file) and \
-            os.path.exists(cache_audio_dir):
-        if not os.listdir(cache_audio_dir):
-            session = FuturesSession()
-            with open(cache_text_file, 'r') as fp:
-                all_dialogs = fp.readlines()
-                for each_dialog in all_dialogs:
-                    each_dialog = each_dialog.strip()
-                    key = str(hashlib.md5(
-                        each_dialog.encode('utf-8', 'ignore')).hexdigest())
-                    wav_file = os.path.join(cache_audio_dir, key + '.wav')
-                    each_dialog = parse.quote(each_dialog)
-
-                    mimic2_url = MIMIC2_URL + each_dialog + '&visimes=True'
-                    try:
-                        req = session.get(mimic2_url)
-                        results = req.result().json()
-                        audio = base64.b64decode(results['audio_base64'])
-                        vis = results['visimes']
-                        if audio:
-                            with open(wav_file, 'wb') as audiofile:
-                                audiofile.write(audio)
-                        if vis:
-                            pho_file = os.path.join(cache_audio_dir,
-                                                    key + ".pho")
-                            with open(pho_file, "w") as cachefile:
-                                cachefile.write(json.dumps(vis))  # Mimic2
-                                # cachefile.write(str(vis))  # Mimic
-                    except Exception as e:
-                        # Skip this dialog and continue
-                        LOG.error("Unable to get pre-loaded cache "
-                                  "due to ({})".format(repr(e)))
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        try:
+            with open(path) as f:
+                self.done = json.load(f)
+        except (OSError, ValueError):
+            self.done = {}
 
-            LOG.debug("Completed getting cache for {}".format(TTS))
+    def is_done(self, dialog_file):
+        """Check if an unmodified dialog file has been pre-warmed."""
+        return self.done.get(dialog_file) == os.path.getmtime(dialog_file)
 
-        else:
-            LOG.debug("Pre-loaded cache for {} already exists".
-                      format(TTS))
-    else:
-        missing_path = cache_text_file if not \
-            os.path.isfile(cache_text_file)\
-            else cache_audio_dir
-        LOG.error("Path ({}) does not exist for getting the cache"
-                  .format(missing_path))
+    def mark_done(self, dialog_file):
+        with self.lock:
+            self.done[dialog_file] = os.path.getmtime(dialog_file)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.done, f)
+            os.replace(tmp_path, self.path)
 
 
-def copy_cache(cache_audio_dir):
+def copy_cache(cache_audio_dir, cache):
     """
     This method copies the cache from 'cache_audio_dir'
-    to TTS specific cache directory given by
-    get_cache_directory()
+    into the TTS cache, adding each file to the cache index
     Args:
-        cache_audio_dir (path): path containing .wav files
+        cache_audio_dir (path): path containing audio files
+        cache (TTSCache): cache of the TTS
     """
     if os.path.exists(cache_audio_dir):
-        # get tmp directory where tts cache is stored
-        dest = util.get_cache_directory('tts/' + 'Mimic2')
-        files = os.listdir(cache_audio_dir)
-        for f in files:
-            shutil.copy2(os.path.join(cache_audio_dir, f), dest)
-        LOG.debug("Copied all pre-loaded cache for {} to {}"
-                  .format(TTS, dest))
+        copied = 0
+        for f in os.listdir(cache_audio_dir):
+            key, ext = os.path.splitext(f)
+            if ext not in AUDIO_EXTENSIONS or key in cache:
+                continue
+            cache.add_file(key, os.path.join(cache_audio_dir, f),
+                           load_phonemes(cache_audio_dir, key))
+            copied += 1
+        LOG.debug("Copied {} pre-loaded cache files to {}"
+                  .format(copied, cache.directory))
     else:
-        LOG.debug("No Source directory for {} pre-loaded cache"
-                  .format(TTS))
+        LOG.debug("No Source directory for pre-loaded cache")
+
+
+def load_phonemes(cache_audio_dir, key):
+    """Load phonemes from the pre-loaded cache directory."""
+    pho_file = os.path.join(cache_audio_dir, key + '.pho')
+    if not os.path.isfile(pho_file):
+        return None
+    with open(pho_file) as cachefile:
+        phonemes = cachefile.read().strip()
+    try:
+        return json.loads(phonemes)
+    except ValueError:
+        return phonemes  # Stored as plain text
+
+
+def save_preloaded(cache_audio_dir, key, wav_file, phonemes):
+    """Store synthesized audio in the pre-loaded cache directory."""
+    ext = os.path.splitext(wav_file)[1]
+    shutil.copyfile(wav_file, os.path.join(cache_audio_dir, key + ext))
+    if phonemes:
+        with open(os.path.join(cache_audio_dir, key + '.pho'), 'w') as f:
+            json.dump(phonemes, f)
 
 
-# Start here
-def main(cache_audio_dir):
-    # Path where cache is stored and not cleared on reboot/TTS change
+def cache_sentence(tts, sentence, cache_audio_dir=None):
+    """Synthesize a sentence into the TTS cache unless already cached.
+
+    Arguments:
+        tts (TTS): the TTS to synthesize with
+        sentence (str): sentence to synthesize
+        cache_audio_dir (str): pre-loaded cache directory to also store
+                               the audio in
+
+    Returns:
+        bool: True if the sentence was synthesized
+    """
+    key = tts.cache_key(sentence)
+    if key in tts.cache:
+        return False
+    with tts.synthesis_lock(key):
+        if key in tts.cache:
+            return False
+        wav_file, phonemes = tts.get_tts(
+            sentence, tts.cache.audio_file(key, tts.audio_ext))
+        tts.cache.put(key, wav_file, phonemes)
     if cache_audio_dir:
-        cache_text_file = os.path.join(cache_audio_dir,
-                                       '..', 'cache_text.txt')
-        generate_cache_text(cache_audio_dir, cache_text_file)
-        download_audio(cache_audio_dir, cache_text_file)
-        copy_cache(cache_audio_dir)
+        save_preloaded(cache_audio_dir, key, wav_file, phonemes)
+    return True
+
+
+def prewarm(tts, dialog_dirs, workers=4, state=None, cache_audio_dir=None):
+    """Synthesize the sentences of all dialog files into the TTS cache.
+
+    Arguments:
+        tts (TTS): the TTS to synthesize with
+        dialog_dirs (list): directories with .dialog files, in priority
+                            order
+        workers (int): number of sentences synthesized in parallel
+        state (PrewarmState): dialog files already pre-warmed, these are
+                              skipped while their sentences are cached
+        cache_audio_dir (str): pre-loaded cache directory to also store
+                               the audio in
+
+    Returns:
+        dict: number of sentences synthesized, skipped and failed
+    """
+    stats = {'synthesized': 0, 'skipped': 0, 'failed': 0}
+    dialog_files = []
+    for dialog_dir in dialog_dirs:
+        dialog_files += sorted(glob.glob(os.path.join(dialog_dir,
+                                                      '*.dialog')))
+    futures = {}
+    file_keys = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Submit everything in priority order, then wait file by file
+        for dialog_file in dialog_files:
+            try:
+                sentences = read_dialog_sentences(dialog_file)
+            except (OSError, UnicodeDecodeError):
+                LOG.warning('Could not read {}'.format(dialog_file))
+                continue
+            chunks = [chunk for sentence in sentences
+                      for chunk in tts.prepare_sentence(sentence)]
+            keys = [tts.cache_key(chunk) for chunk in chunks]
+            if state and state.is_done(dialog_file) and \
+                    all(key in tts.cache for key in keys):
+                continue
+            for chunk, key in zip(chunks, keys):
+                if key not in futures:
+                    futures[key] = executor.submit(
+                        cache_sentence, tts, chunk, cache_audio_dir)
+            file_keys.append((dialog_file, keys))
+
+        try:
+            for dialog_file, keys in file_keys:
+                complete = True
+                for key in keys:
+                    try:
+                        futures[key].result()
+                    except Exception as e:
+                        LOG.error('Failed to synthesize a sentence of {} '
+                                  '({})'.format(dialog_file, repr(e)))
+                        complete = False
+                if complete and state:
+                    state.mark_done(dialog_file)
+        except KeyboardInterrupt:
+            # Don't wait for the remaining sentences, the state allows
+            # resuming later
+            for future in futures.values():
+                future.cancel()
+            raise
+
+    for future in futures.values():
+        if future.exception():
+            stats['failed'] += 1
+        elif future.result():
+            stats['synthesized'] += 1
+        else:
+            stats['skipped'] += 1
+    LOG.info('Pre-warmed TTS cache: {synthesized} synthesized, '
+             '{skipped} already cached, {failed} failed'.format(**stats))
+    return stats
+
+
+def prewarm_tts(tts, skills=True, workers=4):
+    """Pre-warm the cache of a TTS with the dialogs of its language.
+
+    Progress is stored in the pre-loaded cache directory if configured,
+    otherwise in the cache directory.
+
+    Arguments:
+        tts (TTS): the TTS to synthesize with
+        skills (bool): include the dialogs of the installed skills
+        workers (int): number of sentences synthesized in parallel
+
+    Returns:
+        dict: number of sentences synthesized, skipped and failed
+    """
+    cache_audio_dir = tts.config.get('preloaded_cache')
+    if cache_audio_dir:
+        os.makedirs(cache_audio_dir, exist_ok=True)
+    state = PrewarmState(os.path.join(cache_audio_dir or tts.cache.directory,
+                                      STATE_FILE))
+    return prewarm(tts, get_dialog_dirs(tts.lang, skills), workers, state,
+                   cache_audio_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pre-warm the TTS cache with the dialogs of Mycroft '
+                    'and the installed skills.')
+    parser.add_argument('--skills', action='store_true',
+                        help='Also pre-warm the dialogs of the installed '
+                             'skills')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Number of sentences synthesized in parallel '
+                             '(Default: 4)')
+    args = parser.parse_args()
+
+    from mycroft.tts import TTSFactory
+    tts = TTSFactory.create()
+    try:
+        prewarm_tts(tts, args.skills, args.workers)
+    finally:
+        tts.playback.stop()
+        tts.playback.join()
+
+
+if __name__ == '__main__':
+    main()
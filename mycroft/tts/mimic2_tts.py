@@ -17,8 +17,7 @@ from mycroft.tts import TTS, TTSValidator
 from mycroft.tts.remote_tts import RemoteTTSTimeoutException
 from mycroft.util.log import LOG
 from mycroft.util.format import pronounce_number
-from mycroft.tts import cache_handler
-from mycroft.util import play_wav, get_cache_directory
+from mycroft.util import play_wav
 from requests_futures.sessions import FuturesSession
 from requests.exceptions import (
     ReadTimeout, ConnectionError, ConnectTimeout, HTTPError
@@ -27,9 +26,7 @@ from urllib import parse
 from .mimic_tts import VISIMES
 import math
 import base64
-import os
 import re
-import json
 
 
 # Heuristic value, caps character length of a chunk of text to be spoken as a
@@ -168,18 +165,13 @@ def _sentence_chunker(text):
 
 
 class Mimic2(TTS):
+    # Requests go through a FuturesSession, made for concurrent use
+    concurrent_synthesis = True
 
     def __init__(self, lang, config):
         super(Mimic2, self).__init__(
             lang, config, Mimic2Validator(self)
         )
-        try:
-            LOG.info("Getting Pre-loaded cache")
-            cache_handler.main(config['preloaded_cache'])
-            LOG.info("Successfully downloaded Pre-loaded cache")
-        except Exception as e:
-            LOG.error("Could not get the pre-loaded cache ({})"
-                      .format(repr(e)))
         self.url = config['url']
         self.session = FuturesSession()
 
@@ -266,40 +258,6 @@ class Mimic2(TTS):
                 "Mimic 2 server request timed out. Falling back to mimic")
         return (wav_file, vis)
 
-    def save_phonemes(self, key, phonemes):
-        """
-            Cache phonemes
-
-            Args:
-                key:        Hash key for the sentence
-                phonemes:   phoneme string to save
-        """
-        cache_dir = get_cache_directory("tts/" + self.tts_name)
-        pho_file = os.path.join(cache_dir, key + ".pho")
-        try:
-            with open(pho_file, "w") as cachefile:
-                cachefile.write(json.dumps(phonemes))
-        except Exception:
-            LOG.exception("Failed to write {} to cache".format(pho_file))
-
-    def load_phonemes(self, key):
-        """
-            Load phonemes from cache file.
-
-            Args:
-                Key:    Key identifying phoneme cache
-        """
-        pho_file = os.path.join(get_cache_directory("tts/" + self.tts_name),
-                                key + ".pho")
-        if os.path.exists(pho_file):
-            try:
-                with open(pho_file, "r") as cachefile:
-                    phonemes = json.load(cachefile)
-                return phonemes
-            except Exception as e:
-                LOG.error("Failed to read .PHO from cache ({})".format(e))
-        return None
-
 
 class Mimic2Validator(TTSValidator):
 
@@ -94,7 +94,6 @@ class Mimic(TTS):
             ssml_tags=["speak", "ssml", "phoneme", "voice", "audio", "prosody"]
         )
         self.dl = None
-        self.clear_cache()
 
         # Download subscriber voices if needed
         self.is_subscriber = DeviceApi().is_subscriber
@@ -115,9 +114,8 @@ class Mimic(TTS):
             tag = tag.replace(key, value)
         return tag
 
-    @property
-    def args(self):
-        """ Build mimic arguments. """
+    def _binary_and_voice(self):
+        """Get the mimic binary and the voice to synthesize with."""
         if (self.voice in SUBSCRIBER_VOICES and
                 exists(SUBSCRIBER_VOICES[self.voice]) and self.is_subscriber):
             # Use subscriber voice
@@ -131,7 +129,23 @@ class Mimic(TTS):
             # Normal case use normal binary and selected voice
             mimic_bin = BIN
             voice = self.voice
+        return mimic_bin, voice
 
+    def cache_variant(self):
+        """Fallback voice and duration stretch in use, if any."""
+        _, voice = self._binary_and_voice()
+        variant = []
+        if voice != self.voice:
+            variant.append('voice=' + voice)
+        stretch = config.get('duration_stretch', None)
+        if stretch:
+            variant.append('duration_stretch=' + stretch)
+        return ','.join(variant) or None
+
+    @property
+    def args(self):
+        """ Build mimic arguments. """
+        mimic_bin, voice = self._binary_and_voice()
         args = [mimic_bin, '-voice', voice, '-psdur', '-ssml']
 
         stretch = config.get('duration_stretch', None)
@@ -0,0 +1,169 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Synthesis pipeline letting the TTS prepare upcoming chunks of speech
+while the current chunk is played.
+
+Chunks are wrapped in SynthesisJobs which are put on the playback queue in
+the order they should be spoken. A small pool of workers synthesizes the
+jobs in the same order, at most "lookahead" jobs ahead of playback. The
+playback thread waits for each job to become ready before playing it.
+"""
+from queue import Queue
+from threading import Event, Lock, Semaphore, Thread
+from time import time
+
+from mycroft.util.log import LOG
+
+
+class SynthesisJob:
+    """A chunk of text to be synthesized and played.
+
+    Arguments:
+        sentence (str): text to synthesize
+        ident (str): id reference to the current interaction
+        listen (bool): True if listening should be triggered after playback
+    """
+    def __init__(self, sentence, ident=None, listen=False):
+        self.sentence = sentence
+        self.ident = ident
+        self.listen = listen
+        self.requested_at = time()
+
+        # Result of the synthesis
+        self.audio_ext = None
+        self.wav_file = None
+        self.visemes = None
+        self.error = None
+
+        self.cancelled = False
+        self._ready = Event()
+        self._lock = Lock()
+        self._slot = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until the job is synthesized or cancelled.
+
+        Arguments:
+            timeout (float): max time to wait, None waits forever
+
+        Returns:
+            bool: True if the job is ready
+        """
+        return self._ready.wait(timeout)
+
+    def set_result(self, audio_ext, wav_file, visemes=None):
+        self.audio_ext = audio_ext
+        self.wav_file = wav_file
+        self.visemes = visemes
+        self._ready.set()
+
+    def set_error(self, error):
+        self.error = error
+        self._ready.set()
+
+    def hold_slot(self, slot):
+        """Keep a lookahead slot until the job is played or cancelled."""
+        with self._lock:
+            self._slot = slot
+
+    def release_slot(self):
+        """Give back the lookahead slot, if one is held."""
+        with self._lock:
+            if self._slot:
+                self._slot.release()
+                self._slot = None
+
+    def cancel(self):
+        """Cancel the job, waking anyone waiting for it."""
+        self.cancelled = True
+        self.release_slot()
+        self._ready.set()
+
+
+class SynthesisPipeline:
+    """Synthesize jobs in the background, a bounded number ahead of playback.
+
+    The worker threads are started when the first job is submitted. With a
+    lookahead of 0 jobs are synthesized directly in submit().
+
+    Arguments:
+        synthesize (callable): called with a SynthesisJob, should set its
+                               result (exceptions are set as the job error)
+        lookahead (int): max number of jobs synthesized ahead of playback
+    """
+    def __init__(self, synthesize, lookahead=2):
+        self.synthesize = synthesize
+        self.lookahead = max(0, lookahead)
+        self._jobs = Queue()
+        self._slots = Semaphore(self.lookahead)
+        self._workers = []
+        self._lock = Lock()
+        self._stopped = False
+
+    def submit(self, job):
+        """Schedule a job for synthesis.
+
+        Arguments:
+            job (SynthesisJob): the job to synthesize
+        """
+        if self.lookahead == 0:
+            self.synthesize(job)
+            return
+
+        with self._lock:
+            if not self._workers:
+                self._start_workers()
+        self._jobs.put(job)
+
+    def _start_workers(self):
+        for i in range(self.lookahead):
+            worker = Thread(target=self._work, daemon=True,
+                            name='TTSSynthesis-{}'.format(i))
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            # Take a slot before the job so slots are always held by the
+            # oldest jobs waiting for playback
+            self._slots.acquire()
+            job = self._jobs.get()
+            if job is None or self._stopped:
+                break
+            job.hold_slot(self._slots)
+            if job.cancelled:
+                job.release_slot()
+                continue
+
+            try:
+                self.synthesize(job)
+            except Exception as e:
+                LOG.debug('Synthesis of "{}" failed'.format(job.sentence))
+                job.set_error(e)
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        with self._lock:
+            self._stopped = True
+            for _ in self._workers:
+                self._jobs.put(None)
+                self._slots.release()
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
@@ -22,7 +22,6 @@ class ResponsiveVoice(TTS):
             lang, config, ResponsiveVoiceValidator(self), 'mp3',
             ssml_tags=[]
         )
-        self.clear_cache()
         self.pitch = config.get("pitch", 0.5)
         self.rate = config.get("rate", 0.5)
         self.vol = config.get("vol", 1)
@@ -32,6 +31,11 @@ class ResponsiveVoice(TTS):
         else:
             self.vn = self.sv = ""
 
+    def cache_variant(self):
+        """Configured pitch, rate, volume and gender."""
+        return 'pitch={},rate={},vol={},vn={}'.format(self.pitch, self.rate,
+                                                      self.vol, self.vn)
+
     def get_tts(self, sentence, wav_file):
         params = {"t": sentence, "tl": self.lang,
                   "pitch": self.pitch, "rate": self.rate,
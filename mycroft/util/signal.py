@@ -12,8 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import fcntl
+import mmap
+import struct
 import tempfile
 import time
+from contextlib import contextmanager
+from threading import Lock
 
 import os
 import os.path
@@ -87,6 +92,220 @@ def create_file(filename):
         f.write('')
 
 
+class FileSignalBackend:
+    """Signals stored as files in the IPC directory.
+
+    Every check stats the signal file so this is comparatively slow, but
+    the signals are visible to any tool able to touch a file.
+    """
+    def accepts(self, signal_name):
+        return True
+
+    def create(self, signal_name):
+        try:
+            path = os.path.join(get_ipc_directory(), "signal", signal_name)
+            create_file(path)
+            return os.path.isfile(path)
+        except IOError:
+            return False
+
+    def check(self, signal_name, sec_lifetime=0):
+        path = os.path.join(get_ipc_directory(), "signal", signal_name)
+        if os.path.isfile(path):
+            if sec_lifetime == 0:
+                # consume this single-use signal
+                os.remove(path)
+            elif sec_lifetime == -1:
+                return True
+            elif int(os.path.getctime(path) + sec_lifetime) < int(time.time()):
+                # remove once expired
+                os.remove(path)
+                return False
+            return True
+
+        # No such signal exists
+        return False
+
+
+class MmapSignalBackend:
+    """Signals stored in a table in a memory mapped file.
+
+    The table lives in the IPC directory (normally a RAM disk) and is shared
+    by all processes mapping it. Each slot holds a signal name and the time
+    the signal was created, 0.0 meaning the signal isn't set. Slots are
+    never freed so a process can cache the position of a name, and checking
+    a signal which isn't set is a plain memory read without any syscalls.
+    Modifications are serialized between processes using flock.
+
+    Arguments:
+        path (str): path of the table file
+    """
+    MAGIC = b'MSIG'
+    NUM_SLOTS = 64
+    NAME_SIZE = 56
+    HEADER = struct.Struct('4sI')  # magic, number of used slots
+    SLOT = struct.Struct('{}sd'.format(NAME_SIZE))  # name, creation time
+    SIZE = HEADER.size + NUM_SLOTS * SLOT.size
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = {}  # name -> offset of the creation time
+        self._scanned_slots = 0
+        self._local_lock = Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            with self._file_lock(fd):
+                if os.fstat(fd).st_size < self.SIZE:
+                    os.ftruncate(fd, self.SIZE)
+                    os.pwrite(fd, self.HEADER.pack(self.MAGIC, 0), 0)
+            self._mmap = mmap.mmap(fd, self.SIZE)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        if self._mmap[:4] != self.MAGIC:
+            raise ValueError('{} is not a signal table'.format(path))
+
+    @contextmanager
+    def _file_lock(self, fd=None):
+        fd = self._fd if fd is None else fd
+        with self._local_lock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _num_slots(self):
+        return self.HEADER.unpack_from(self._mmap, 0)[1]
+
+    def _find(self, signal_name):
+        """Get the offset of the time field for a signal name.
+
+        Returns:
+            int: offset in the table or None if the name has no slot
+        """
+        offset = self._offsets.get(signal_name)
+        if offset is None and self._num_slots() != self._scanned_slots:
+            # New slots were added by some process, index them
+            num_slots = self._num_slots()
+            for i in range(self._scanned_slots, num_slots):
+                slot_offset = self.HEADER.size + i * self.SLOT.size
+                name, _ = self.SLOT.unpack_from(self._mmap, slot_offset)
+                name = name.rstrip(b'\0').decode('utf-8')
+                self._offsets[name] = slot_offset + self.NAME_SIZE
+            self._scanned_slots = num_slots
+            offset = self._offsets.get(signal_name)
+        return offset
+
+    def _get_time(self, offset):
+        return struct.unpack_from('d', self._mmap, offset)[0]
+
+    def _set_time(self, offset, value):
+        struct.pack_into('d', self._mmap, offset, value)
+
+    def _allocate(self, signal_name):
+        """Add a slot for a signal name, must be called with the lock held.
+
+        Returns:
+            int: offset of the time field, None if the table is full
+        """
+        offset = self._find(signal_name)
+        if offset is not None:
+            return offset
+        num_slots = self._num_slots()
+        if num_slots >= self.NUM_SLOTS:
+            return None
+        slot_offset = self.HEADER.size + num_slots * self.SLOT.size
+        self.SLOT.pack_into(self._mmap, slot_offset,
+                            signal_name.encode('utf-8'), 0.0)
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, num_slots + 1)
+        return self._find(signal_name)
+
+    def accepts(self, signal_name):
+        """Check if the signal name can be stored in the table."""
+        return (len(signal_name.encode('utf-8')) <= self.NAME_SIZE and
+                (signal_name in self._offsets or
+                 self._num_slots() < self.NUM_SLOTS or
+                 self._find(signal_name) is not None))
+
+    def create(self, signal_name):
+        with self._file_lock():
+            offset = self._allocate(signal_name)
+            if offset is None:
+                return False
+            self._set_time(offset, time.time())
+        return True
+
+    def check(self, signal_name, sec_lifetime=0):
+        offset = self._find(signal_name)
+        if offset is None or self._get_time(offset) == 0.0:
+            return False  # No such signal exists
+        if sec_lifetime == -1:
+            return True
+
+        with self._file_lock():
+            created = self._get_time(offset)
+            if created == 0.0:
+                return False  # Consumed by someone else
+            if sec_lifetime == 0:
+                # consume this single-use signal
+                self._set_time(offset, 0.0)
+            elif int(created + sec_lifetime) < int(time.time()):
+                # remove once expired
+                self._set_time(offset, 0.0)
+                return False
+        return True
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+_file_backend = FileSignalBackend()
+_backend = None
+_backend_lock = Lock()
+
+
+def get_signal_backend():
+    """Get the signal backend selected in the config.
+
+    The "signal_backend" setting selects between "mmap" (default) and
+    "file". If the memory mapped table can't be set up the file backend is
+    used instead.
+
+    Returns:
+        the signal backend for this process
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_signal_backend()
+    return _backend
+
+
+def _create_signal_backend():
+    config = mycroft.configuration.Configuration.get()
+    if config.get('signal_backend', 'mmap') == 'mmap':
+        try:
+            path = os.path.join(get_ipc_directory(), 'signals.mmap')
+            return MmapSignalBackend(path)
+        except Exception as e:
+            LOG.warning('Could not set up signal table ({}), using '
+                        'signal files instead'.format(repr(e)))
+    return _file_backend
+
+
+def _backend_for(signal_name):
+    backend = get_signal_backend()
+    if not backend.accepts(signal_name):
+        LOG.warning('Signal table full, using signal file for '
+                    '{}'.format(signal_name))
+        return _file_backend
+    return backend
+
+
 def create_signal(signal_name):
     """Create a named signal
 
@@ -94,12 +313,7 @@ def create_signal(signal_name):
         signal_name (str): The signal's name.  Must only contain characters
             valid in filenames.
     """
-    try:
-        path = os.path.join(get_ipc_directory(), "signal", signal_name)
-        create_file(path)
-        return os.path.isfile(path)
-    except IOError:
-        return False
+    return _backend_for(signal_name).create(signal_name)
 
 
 def check_for_signal(signal_name, sec_lifetime=0):
@@ -115,18 +329,4 @@ def check_for_signal(signal_name, sec_lifetime=0):
     Returns:
         bool: True if the signal is defined, False otherwise
     """
-    path = os.path.join(get_ipc_directory(), "signal", signal_name)
-    if os.path.isfile(path):
-        if sec_lifetime == 0:
-            # consume this single-use signal
-            os.remove(path)
-        elif sec_lifetime == -1:
-            return True
-        elif int(os.path.getctime(path) + sec_lifetime) < int(time.time()):
-            # remove once expired
-            os.remove(path)
-            return False
-        return True
-
-    # No such signal exists
-    return False
+    return _backend_for(signal_name).check(signal_name, sec_lifetime)
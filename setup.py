@@ -69,7 +69,8 @@ setup(
             'mycroft-echo-observer=mycroft.messagebus.client.ws:echo',
             'mycroft-audio-test=mycroft.util.audio_test:main',
             'mycroft-enclosure-client=mycroft.client.enclosure.__main__:main',
-            'mycroft-cli-client=mycroft.client.text.__main__:main'
+            'mycroft-cli-client=mycroft.client.text.__main__:main',
+            'mycroft-tts-prewarm=mycroft.tts.cache_handler:main'
         ]
     }
 )
@@ -0,0 +1,109 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the message bus fan-out with and without subscriptions.
+
+Simulated connections deserialize each message they receive, as the bus
+client does. "filtered" connections subscribe to a few exact message types
+and one glob pattern. Reported is the time to route the messages and
+deserialize them in all connections and the traffic sent to the
+connections. Logging is disabled to only measure the routing.
+
+Run using:
+    python -m test.benchmarks.bus_fanout
+"""
+import argparse
+import json
+import random
+import time
+from unittest import mock
+
+from tornado import web
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+
+NAMESPACES = ['mycroft.audio', 'mycroft.gui', 'enclosure', 'skill',
+              'recognizer_loop', 'mycroft.skills']
+
+
+class SimulatedConnection(MessageBusEventHandler):
+    def __init__(self, subscriptions):
+        request = mock.Mock()
+        request.query_arguments = {}
+        if subscriptions:
+            request.query_arguments['subscribe'] = [
+                ','.join(subscriptions).encode()]
+        super().__init__(web.Application(), request)
+        self.received = 0
+        self.bytes = 0
+
+    def write_message(self, message, binary=False):
+        json.loads(message)
+        self.received += 1
+        self.bytes += len(message)
+
+
+def message_types(count):
+    return ['{}.event_{}'.format(NAMESPACES[i % len(NAMESPACES)], i)
+            for i in range(count)]
+
+
+def run(clients, messages, filtered):
+    types = message_types(60)
+    event_handler.client_connections.clear()
+    connections = []
+    for _ in range(clients):
+        subscriptions = None
+        if filtered:
+            subscriptions = random.sample(types, 5)
+            subscriptions.append(random.choice(NAMESPACES) + '.*')
+        connection = SimulatedConnection(subscriptions)
+        connection.open()
+        connections.append(connection)
+
+    payload = {'utterance': 'what is the weather like ' * 4}
+    serialized = [Message(random.choice(types), payload).serialize()
+                  for _ in range(messages)]
+    sender = connections[0]
+    start = time.monotonic()
+    for message in serialized:
+        sender.on_message(message)
+    duration = time.monotonic() - start
+    return (duration,
+            sum(c.received for c in connections),
+            sum(c.bytes for c in connections))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    event_handler.LOG = mock.Mock()
+    print('{:8}{:>10}{:>14}{:>14}{:>14}'.format(
+        'clients', 'mode', 'msgs/sec', 'delivered', 'MB sent'))
+    for clients in (10, 25, 50):
+        for filtered in (False, True):
+            duration, delivered, sent = run(clients, args.messages,
+                                            filtered)
+            print('{:<8}{:>10}{:>14.0f}{:>14}{:>14.1f}'.format(
+                clients, 'filtered' if filtered else 'all',
+                args.messages / duration, delivered, sent / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the request/response latency of the bus client.
+
+The websocket is replaced by a loopback connection answering each request
+after a fixed delay, the time spent beyond that delay is overhead of the
+client. "polling" is the previous wait_for_response() implementation
+checking for the response every 200 ms.
+
+Run using:
+    python -m test.benchmarks.bus_response
+"""
+import argparse
+import time
+from statistics import mean
+from threading import Timer
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.client import MessageBusClient
+
+
+class LoopbackConnection:
+    """Websocket stand-in answering each request from a thread."""
+    def __init__(self, bus, responders, delay):
+        self.bus = bus
+        self.responders = responders
+        self.delay = delay
+
+    def send(self, data):
+        message = Message.deserialize(data)
+        for i in range(self.responders):
+            reply = message.response({'responder': i})
+            Timer(self.delay, self.bus.on_message,
+                  [reply.serialize()]).start()
+
+
+def polling_wait_for_response(bus, message, timeout=3.0):
+    response = []
+
+    def handler(message):
+        response.append(message)
+
+    reply_type = message.msg_type + '.response'
+    bus.once(reply_type, handler)
+    bus.emit(message)
+    start_time = time.monotonic()
+    while len(response) == 0:
+        time.sleep(0.2)
+        if time.monotonic() - start_time > timeout:
+            bus.remove(reply_type, handler)
+            return None
+    return response[0]
+
+
+def measure(request, number):
+    latencies = []
+    for _ in range(number):
+        start = time.monotonic()
+        request()
+        latencies.append(time.monotonic() - start)
+    latencies.sort()
+    return (mean(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.01,
+                        help='Response time of the responders in seconds')
+    parser.add_argument('--responders', type=int, default=5,
+                        help='Number of responders for the batch request')
+    args = parser.parse_args()
+
+    bus = MessageBusClient(host='localhost', port=8181, route='/core')
+    bus.connected_event.set()
+
+    def single(wait):
+        bus.client = LoopbackConnection(bus, 1, args.delay)
+        return lambda: wait(Message('benchmark.request'))
+
+    def batch():
+        bus.client = LoopbackConnection(bus, args.responders, args.delay)
+        return lambda: bus.wait_for_responses(Message('benchmark.request'),
+                                              count=args.responders)
+
+    results = {}
+    results['polling'] = measure(
+        single(lambda m: polling_wait_for_response(bus, m)), args.number)
+    results['event'] = measure(single(bus.wait_for_response), args.number)
+    results['event, {} replies'.format(args.responders)] = measure(
+        batch(), args.number)
+    bus.emitter.close()
+
+    print('Responder delay {:.0f} ms'.format(args.delay * 1000))
+    print('{:20}{:>12}{:>12}'.format('latency (ms)', 'mean', 'p95'))
+    for name, (avg, p95) in results.items():
+        print('{:20}{:>12.1f}{:>12.1f}'.format(name, avg, p95))
+
+
+if __name__ == '__main__':
+    main()
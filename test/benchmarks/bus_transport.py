@@ -0,0 +1,153 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the websocket and Unix socket bus transports.
+
+A bus service runs in a thread of this process, serving both transports,
+with MessageBusClients connected through each transport and format:
+
+    latency: round trip of a message from a client through the bus back
+             to the same client's handler
+    throughput: messages per second received by the handler of a client
+                while another client sends as fast as it can
+
+Logging of the bus service and clients is disabled to only measure the
+transports.
+
+Run using:
+    python -m test.benchmarks.bus_transport
+"""
+import argparse
+import asyncio
+import time
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+from unittest import mock
+
+from tornado import httpserver, ioloop, web
+from tornado.testing import bind_unused_port
+
+from mycroft.messagebus import Message, load_config
+from mycroft.messagebus.client import MessageBusClient, client
+from mycroft.messagebus.client.handler_executor import HandlerExecutor
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+from mycroft.messagebus.service.local_server import LocalBusServer
+
+PAYLOAD = {'utterance': 'Tomorrow will be mostly sunny with a high of 22 '
+                        'degrees.', 'expect_response': False,
+           'meta': {'skill': 'WeatherSkill'}}
+
+
+def run_server(path, started, state):
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    queue_config = {'max_queue': 100000}
+    app = web.Application([('/core', MessageBusEventHandler, queue_config)])
+    sock, state['port'] = bind_unused_port()
+    server = httpserver.HTTPServer(app)
+    server.add_sockets([sock])
+    LocalBusServer(queue_config).listen_unix(path)
+    started.set()
+    ioloop.IOLoop.current().start()
+
+
+def connect(port, local, compact, subscriptions):
+    if local:
+        bus = MessageBusClient(compact=compact, subscriptions=subscriptions,
+                               executor=HandlerExecutor(budget=None))
+    else:
+        bus = MessageBusClient('127.0.0.1', port, compact=compact,
+                               subscriptions=subscriptions,
+                               executor=HandlerExecutor(budget=None))
+    Thread(target=bus.run_forever, daemon=True).start()
+    bus.connected_event.wait(5)
+    return bus
+
+
+def latency(bus, count):
+    received = Event()
+    bus.on('bench.ping', lambda m: received.set())
+    times = []
+    for _ in range(count):
+        received.clear()
+        start = time.monotonic()
+        bus.emit(Message('bench.ping', PAYLOAD))
+        received.wait(5)
+        times.append(time.monotonic() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[len(times) * 95 // 100] * 1000
+
+
+def throughput(sender, receiver, count):
+    done = Event()
+    received = [0]
+
+    def handler(message):
+        received[0] += 1
+        if received[0] == count:
+            done.set()
+    receiver.on('bench.load', handler)
+    start = time.monotonic()
+    for i in range(count):
+        sender.emit(Message('bench.load', PAYLOAD))
+    done.wait(60)
+    return received[0] / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--round-trips', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=5000)
+    args = parser.parse_args()
+
+    directory = mkdtemp()
+    path = join(directory, 'bus.sock')
+    state = {}
+    started = Event()
+    Thread(target=run_server, args=(path, started, state),
+           daemon=True).start()
+    started.wait(5)
+    config = {'websocket': {'host': '0.0.0.0', 'port': state['port'],
+                            'route': '/core', 'ssl': False,
+                            'local_socket': path}}
+
+    print('{:22}{:>10}{:>10}{:>14}'.format('transport', 'p50 ms', 'p95 ms',
+                                           'msgs/s'))
+    with mock.patch('mycroft.configuration.Configuration.get',
+                    return_value=config), \
+            mock.patch.object(event_handler, 'LOG'), \
+            mock.patch.object(client, 'LOG'), \
+            mock.patch.object(load_config, 'LOG'):
+        for local in (False, True):
+            for compact in (False, True):
+                name = '{} {}'.format('unix socket' if local else 'websocket',
+                                      'compact' if compact else 'json')
+                ping = connect(state['port'], local, compact, ['bench.ping'])
+                sender = connect(state['port'], local, compact, [])
+                receiver = connect(state['port'], local, compact,
+                                   ['bench.load'])
+                p50, p95 = latency(ping, args.round_trips)
+                rate = throughput(sender, receiver, args.messages)
+                print('{:22}{:>10.2f}{:>10.2f}{:>14.0f}'.format(
+                    name, p50, p95, rate))
+                for bus in (ping, sender, receiver):
+                    bus.close()
+                    bus.emitter.close()
+    rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Microbenchmark of the wake word audio buffer.
+
+Compares the CyclicAudioBuffer used by the ResponsiveRecognizer with the
+previous approach of slicing and concatenating a bytes object for every
+chunk read from the microphone.
+
+Run using:
+    python -m test.benchmarks.cyclic_audio_buffer
+"""
+import argparse
+from timeit import timeit
+
+from mycroft.client.speech.mic import CyclicAudioBuffer
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHUNK = 1024
+
+
+def slicing_loop(chunks, max_size, test_size, check_interval):
+    byte_data = b'\0' * 320
+    for i, chunk in enumerate(chunks):
+        if len(byte_data) < max_size:
+            byte_data += chunk
+        else:
+            byte_data = byte_data[len(chunk):] + chunk
+        if i % check_interval == 0:
+            byte_data[-test_size:]
+
+
+def cyclic_loop(chunks, max_size, test_size, check_interval):
+    audio_buffer = CyclicAudioBuffer(max_size, b'\0' * 320)
+    for i, chunk in enumerate(chunks):
+        audio_buffer.append(chunk)
+        if i % check_interval == 0:
+            bytes(audio_buffer.get_last(test_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seconds', type=float, default=600.0,
+                        help='Seconds of audio to process per run')
+    parser.add_argument('--saved-sec', type=float, default=3.0,
+                        help='Seconds of audio kept in the buffer')
+    parser.add_argument('--test-sec', type=float, default=1.2,
+                        help='Seconds of audio passed to the wake word check')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    chunk_bytes = CHUNK * SAMPLE_WIDTH
+    sec_per_buffer = CHUNK / SAMPLE_RATE
+    num_chunks = int(args.seconds / sec_per_buffer)
+    chunks = [bytes([i % 256]) * chunk_bytes for i in range(num_chunks)]
+    max_size = int(args.saved_sec * SAMPLE_RATE) * SAMPLE_WIDTH
+    test_size = int(args.test_sec * SAMPLE_RATE) * SAMPLE_WIDTH
+    check_interval = max(1, int(0.2 / sec_per_buffer))
+
+    print('{} chunks of {} bytes, {} byte window'.format(
+        num_chunks, chunk_bytes, max_size))
+    results = {}
+    for name, func in (('slicing', slicing_loop), ('cyclic', cyclic_loop)):
+        total = timeit(
+            lambda: func(chunks, max_size, test_size, check_interval),
+            number=args.runs)
+        results[name] = total / args.runs
+        print('{:8}: {:8.2f} ms per run, {:6.2f} us per chunk'.format(
+            name, 1000 * results[name], 1e6 * results[name] / num_chunks))
+    print('speedup: {:.1f}x'.format(results['slicing'] / results['cyclic']))
+
+
+if __name__ == '__main__':
+    main()
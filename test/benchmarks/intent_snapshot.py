@@ -0,0 +1,92 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of loading the vocabulary of the skills with the snapshot.
+
+The .voc and .rx files of synthetic skills are loaded without a snapshot,
+with an empty snapshot (cold, first boot) and with the snapshot saved by
+the previous run (warm). Each run uses a new IntentSnapshot, like a new
+skills process.
+
+Run using:
+    python -m test.benchmarks.intent_snapshot
+"""
+import argparse
+import os
+import time
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import mock
+
+from mycroft.skills import intent_snapshot
+from mycroft.skills.intent_snapshot import (
+    IntentSnapshot,
+    load_regex_snapshot,
+    load_vocabulary_snapshot
+)
+
+VOC_LINE = "(what's|what is) the (weather|forecast) {} {}|how's the sky {}\n"
+RX_LINE = '(for|in) (?P<Location{}>.+)\n'
+
+
+def create_skills(directory, skills, vocabs, lines):
+    skill_dirs = []
+    for skill in range(skills):
+        skill_dir = join(directory, 'skill{}'.format(skill), 'vocab', 'en-us')
+        os.makedirs(skill_dir)
+        for vocab in range(vocabs):
+            with open(join(skill_dir, 'Vocab{}.voc'.format(vocab)), 'w') as f:
+                f.writelines(VOC_LINE.format(vocab, line, line)
+                             for line in range(lines))
+        with open(join(skill_dir, 'Location.rx'), 'w') as f:
+            f.writelines(RX_LINE.format(line) for line in range(3))
+        skill_dirs.append(skill_dir)
+    return skill_dirs
+
+
+def load(skill_dirs, snapshot):
+    start = time.monotonic()
+    with mock.patch.object(intent_snapshot, '_snapshot', snapshot):
+        for skill, skill_dir in enumerate(skill_dirs):
+            skill_id = 'skill{}'.format(skill)
+            load_vocabulary_snapshot(skill_dir, skill_id)
+            load_regex_snapshot(skill_dir, skill_id)
+        if snapshot:
+            snapshot.save()
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--skills', type=int, default=60)
+    parser.add_argument('--vocabs', type=int, default=10,
+                        help='vocab files per skill')
+    parser.add_argument('--lines', type=int, default=8,
+                        help='lines per vocab file')
+    args = parser.parse_args()
+
+    directory = mkdtemp()
+    skill_dirs = create_skills(directory, args.skills, args.vocabs,
+                               args.lines)
+    path = join(directory, 'snapshot.json')
+    print('{:16}{:>10}'.format('load', 'seconds'))
+    for name in ('no snapshot', 'cold', 'warm'):
+        snapshot = IntentSnapshot(path) if name != 'no snapshot' else False
+        print('{:16}{:>10.3f}'.format(name, load(skill_dirs, snapshot)))
+    rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
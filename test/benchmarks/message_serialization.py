@@ -0,0 +1,126 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the json and compact message formats in messages per second.
+
+The messages are a mix of frequent small status messages, utterances,
+speech with visemes and larger GUI and settings payloads.
+
+    serialize: encode a message
+    route: get the message type, what the bus service needs
+    deserialize: decode a message and use its data, what a client does
+    to json: convert a received message for a json client
+
+Run using:
+    python -m test.benchmarks.message_serialization
+"""
+import argparse
+from timeit import timeit
+
+from mycroft.messagebus.message import Message, compact_to_json, compact_type
+
+CONTEXT = {'client_name': 'mycroft_listener', 'source': 'audio',
+           'destination': ['skills'], 'correlation_id': 'f' * 36}
+
+
+def message_mix():
+    settings = {'setting_{}'.format(i): {'value': 'x' * 20, 'type': 'text',
+                                         'label': 'Setting {}'.format(i)}
+                for i in range(60)}
+    visemes = [[str(i % 7), i * 0.05] for i in range(60)]
+    return [
+        Message('mycroft.audio.speaking', {'speaking': True}),
+        Message('mycroft.audio.speaking', {'speaking': False}),
+        Message('recognizer_loop:record_begin', context=CONTEXT),
+        Message('recognizer_loop:utterance',
+                {'utterances': ['what is the weather like tomorrow'],
+                 'lang': 'en-us'}, CONTEXT),
+        Message('speak', {'utterance': 'Tomorrow will be mostly sunny '
+                          'with a high of 22 degrees.',
+                          'expect_response': False,
+                          'meta': {'skill': 'WeatherSkill'}}, CONTEXT),
+        Message('enclosure.mouth.viseme_list',
+                {'start': 1589453333.2, 'visemes': visemes}),
+        Message('gui.value.set',
+                {'__from': 'mycroft-weather.mycroftai',
+                 'forecast': [{'date': '2020-05-{}'.format(i),
+                               'min': 12, 'max': 22, 'condition': 'sunny',
+                               'icon': 'icons/sun.svg'}
+                              for i in range(7)]}),
+        Message('mycroft.skills.settings.changed', settings),
+    ]
+
+
+def run(messages, number):
+    json_frames = [m.serialize() for m in messages]
+    compact_frames = [m.serialize_compact() for m in messages]
+    n = number * len(messages)
+
+    def serialize_json():
+        for message in messages:
+            message.serialize()
+
+    def serialize_compact():
+        for message in messages:
+            message.serialize_compact()
+
+    def route_json():
+        for frame in json_frames:
+            Message.deserialize(frame).msg_type
+
+    def route_compact():
+        for frame in compact_frames:
+            compact_type(frame)
+
+    def deserialize_json():
+        for frame in json_frames:
+            Message.deserialize(frame).data
+
+    def deserialize_compact():
+        for frame in compact_frames:
+            Message.deserialize_compact(frame).data
+
+    def to_json_compact():
+        for frame in compact_frames:
+            compact_to_json(frame)
+
+    results = {
+        'serialize': (serialize_json, serialize_compact),
+        'route': (route_json, route_compact),
+        'deserialize': (deserialize_json, deserialize_compact),
+        'to json': (None, to_json_compact)
+    }
+    for test, functions in results.items():
+        results[test] = [n / timeit(f, number=number) if f else None
+                         for f in functions]
+    return results, (sum(len(f) for f in json_frames),
+                     sum(len(f) for f in compact_frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    results, sizes = run(message_mix(), args.number)
+    print('{:16}{:>14}{:>14}'.format('msgs/sec', 'json', 'compact'))
+    for test, (json_rate, compact_rate) in results.items():
+        print('{:16}{:>14}{:>14.0f}'.format(
+            test, '-' if json_rate is None else '{:.0f}'.format(json_rate),
+            compact_rate))
+    print('{:16}{:>14}{:>14}'.format('bytes (mix)', *sizes))
+
+
+if __name__ == '__main__':
+    main()
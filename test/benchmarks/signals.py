@@ -0,0 +1,73 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the signal backends in calls per second.
+
+"check unset" is the common case in the audio loop, e.g. checking for
+'buttonPress' for every chunk of recorded audio.
+
+Run using:
+    python -m test.benchmarks.signals
+"""
+import argparse
+import tempfile
+from os.path import join
+from shutil import rmtree
+from timeit import timeit
+
+from mycroft.util.signal import FileSignalBackend, MmapSignalBackend
+
+
+def run(backend, number):
+    results = {}
+    results['check unset'] = timeit(
+        lambda: backend.check('benchmarkUnset'), number=number)
+
+    backend.create('benchmarkSet')
+    results['check set (-1)'] = timeit(
+        lambda: backend.check('benchmarkSet', -1), number=number)
+
+    def create_and_consume():
+        backend.create('benchmarkConsume')
+        backend.check('benchmarkConsume')
+    results['create + consume'] = timeit(create_and_consume,
+                                         number=number // 10)
+    results['create + consume'] *= 10
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        mmap_backend = MmapSignalBackend(join(temp_dir, 'signals.mmap'))
+        backends = (('file', FileSignalBackend()), ('mmap', mmap_backend))
+        results = {name: run(backend, args.number)
+                   for name, backend in backends}
+        mmap_backend.close()
+    finally:
+        rmtree(temp_dir)
+
+    print('{:20}{:>14}{:>14}'.format('calls/sec', 'file', 'mmap'))
+    for test in results['file']:
+        print('{:20}{:>14.0f}{:>14.0f}'.format(
+            test, args.number / results['file'][test],
+            args.number / results['mmap'][test]))
+
+
+if __name__ == '__main__':
+    main()
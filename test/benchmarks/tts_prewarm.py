@@ -0,0 +1,92 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of pre-warming the TTS cache with Mycroft's dialogs.
+
+Mimic2 synthesizes against a local stand-in for the mimic2 api with a
+fixed latency per request, the core dialogs are pre-warmed with different
+numbers of workers.
+
+Run using:
+    python -m test.benchmarks.tts_prewarm
+"""
+import argparse
+import base64
+import json
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+
+from mycroft.tts import cache_handler
+from mycroft.tts.mimic2_tts import Mimic2
+
+LATENCY = 0.05
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Mimic2Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = json.dumps({
+            'audio_base64': base64.b64encode(b'RIFF' * 1000).decode(),
+            'visimes': [['m', 0.1]]
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=LATENCY,
+                        help='Seconds per synthesis request')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+    LATENCY = args.latency
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Mimic2Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/synthesize?text='.format(server.server_port)
+    tts = Mimic2('en-us', {'url': url})
+    dialog_dirs = cache_handler.get_dialog_dirs('en-us', skills=False)
+    try:
+        for workers in args.workers:
+            tts.cache.clear()
+            start = time.monotonic()
+            stats = cache_handler.prewarm(tts, dialog_dirs, workers)
+            print('{:2} workers: {} sentences in {:.2f}s'.format(
+                workers, stats['synthesized'], time.monotonic() - start))
+        start = time.monotonic()
+        stats = cache_handler.prewarm(tts, dialog_dirs, max(args.workers))
+        print('Rerun: {} already cached in {:.2f}s'.format(
+            stats['skipped'], time.monotonic() - start))
+    finally:
+        tts.cache.clear()
+        tts.playback.stop()
+        tts.playback.join()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
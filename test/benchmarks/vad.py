@@ -0,0 +1,123 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark end of utterance detection of the available VAD modules.
+
+Each WAV file is treated as a recorded phrase followed by three seconds of
+the file's own background noise. For every VAD module the time at which the
+phrase was closed is reported relative to the end of the last clearly loud
+chunk, an estimate of where the speech ends. Negative values mean the
+recording was probably cut before the speech ended.
+
+By default the audio-accuracy-test data and the speech client test
+fixtures are used.
+
+Run using:
+    python -m test.benchmarks.vad [directory ...]
+"""
+import argparse
+import time
+import wave
+from glob import glob
+from os.path import basename, dirname, join
+
+from mycroft.client.speech.energy import create_energy_estimator
+from mycroft.client.speech.vad import VADS
+
+ROOT_DIR = dirname(dirname(dirname(__file__)))
+DEFAULT_DIRS = [
+    join(ROOT_DIR, 'mycroft', 'audio-accuracy-test', 'data',
+         'with_wake_word', 'query_after'),
+    join(ROOT_DIR, 'test', 'unittests', 'client', 'data')
+]
+CHUNK = 1024
+ENERGY_RATIO = 1.5
+TRAILING_SEC = 3.0
+
+
+def load_chunks(file_name):
+    with wave.open(file_name, 'rb') as wav:
+        sample_rate = wav.getframerate()
+        sample_width = wav.getsampwidth()
+        data = wav.readframes(wav.getnframes())
+    chunk_bytes = CHUNK * sample_width
+    chunks = [data[i:i + chunk_bytes]
+              for i in range(0, len(data) - chunk_bytes + 1, chunk_bytes)]
+    return chunks, sample_rate, sample_width
+
+
+def measure(vad, chunks, energies, threshold, sample_rate, sample_width):
+    """Return seconds recorded and processing time per chunk."""
+    sec_per_buffer = CHUNK / sample_rate
+    vad.reset(sample_rate, sample_width, sec_per_buffer)
+    start = time.monotonic()
+    for num_chunks, (chunk, energy) in enumerate(zip(chunks, energies), 1):
+        if vad.update(chunk, energy, threshold):
+            break
+    duration = time.monotonic() - start
+    return num_chunks * sec_per_buffer, duration / num_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directories', nargs='*', default=DEFAULT_DIRS)
+    args = parser.parse_args()
+
+    estimator = create_energy_estimator()
+    file_names = []
+    for directory in args.directories:
+        file_names += sorted(glob(join(directory, '*.wav')))
+    if not file_names:
+        print('No wav files found')
+        return
+
+    names = sorted(VADS)
+    totals = {name: 0.0 for name in names}
+    times = {name: 0.0 for name in names}
+    print('{:28}'.format('file') + ''.join('{:>10}'.format(n)
+                                           for n in names))
+    for file_name in file_names:
+        chunks, sample_rate, sample_width = load_chunks(file_name)
+        if not chunks:
+            continue
+        energies = [estimator.calc_energy(c, sample_width) for c in chunks]
+        # Use the quietest part of the file as background noise
+        quietest = min(range(len(chunks)), key=lambda i: energies[i])
+        num_padding = int(TRAILING_SEC * sample_rate / CHUNK)
+        chunks += [chunks[quietest]] * num_padding
+        energies += [energies[quietest]] * num_padding
+        threshold = sorted(energies)[len(energies) // 10] * ENERGY_RATIO
+        loud = [i for i, e in enumerate(energies) if e > 3 * threshold]
+        speech_end = (loud[-1] + 1 if loud else 0) * CHUNK / sample_rate
+
+        line = '{:28}'.format(basename(file_name)[:27])
+        for name in names:
+            recorded, per_chunk = measure(VADS[name](), chunks, energies,
+                                          threshold, sample_rate,
+                                          sample_width)
+            totals[name] += recorded - speech_end
+            times[name] += per_chunk
+            line += '{:>+10.2f}'.format(recorded - speech_end)
+        print(line)
+
+    num_files = len(file_names)
+    print('{:28}'.format('mean seconds after speech') +
+          ''.join('{:>+10.2f}'.format(totals[n] / num_files) for n in names))
+    print('{:28}'.format('mean us per chunk') +
+          ''.join('{:>10.1f}'.format(1e6 * times[n] / num_files)
+                  for n in names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of the vocabulary registration of the skills at boot.
+
+A bus service runs in a thread of this process. One client registers the
+vocabulary, regexes and intents of synthetic skills, another runs the
+IntentService and more clients stand in for the other services receiving
+every message. Reported are the bus messages sent and the time until the
+IntentService has registered everything, with a message per keyword and
+alias and with a register_vocab.bulk message per skill.
+
+Run using:
+    python -m test.benchmarks.vocab_registration
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import time
+from threading import Event, Thread
+from unittest import mock
+
+from adapt.intent import IntentBuilder
+from tornado import httpserver, ioloop, web
+from tornado.testing import bind_unused_port
+
+from mycroft.messagebus import Message, load_config
+from mycroft.messagebus.client import MessageBusClient, client
+from mycroft.messagebus.client.handler_executor import HandlerExecutor
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+from mycroft.skills.intent_service import IntentService
+from mycroft.skills.intent_service_interface import IntentServiceInterface
+
+
+def run_server(started, state):
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    app = web.Application([('/core', MessageBusEventHandler,
+                            {'max_queue': 1000000})])
+    sock, state['port'] = bind_unused_port()
+    server = httpserver.HTTPServer(app)
+    server.add_sockets([sock])
+    started.set()
+    ioloop.IOLoop.current().start()
+
+
+def connect(port):
+    # A single handler thread keeps the messages in order
+    bus = MessageBusClient('127.0.0.1', port,
+                           executor=HandlerExecutor(threads=1,
+                                                    skill_threads=0,
+                                                    budget=None))
+    Thread(target=bus.run_forever, daemon=True).start()
+    bus.connected_event.wait(5)
+    return bus
+
+
+class CountingBus:
+    """Bus client wrapper counting the emitted messages."""
+    def __init__(self, bus):
+        self.bus = bus
+        self.count = 0
+
+    def emit(self, message):
+        self.count += 1
+        self.bus.emit(message)
+
+
+def register_skills(interface, bulk, skills, vocabs, lines, aliases):
+    """Register the keywords, a regex and intents of synthetic skills."""
+    for skill in range(skills):
+        skill_id = 'skill{}'.format(skill)
+        with interface.batch(skill_id) if bulk else contextlib.suppress():
+            for vocab in range(vocabs):
+                vocab_type = '{}Vocab{}'.format(skill_id, vocab)
+                for line in range(lines):
+                    entity = 'word {} {} {}'.format(skill, vocab, line)
+                    interface.register_adapt_keyword(
+                        vocab_type, entity,
+                        [entity + ' alias {}'.format(a)
+                         for a in range(aliases)])
+            interface.register_adapt_regex(
+                'for (?P<{}Name>.*)'.format(skill_id))
+            for vocab in range(vocabs):
+                name = '{}:intent{}'.format(skill_id, vocab)
+                interface.register_adapt_intent(
+                    name, IntentBuilder(name).require(
+                        '{}Vocab{}'.format(skill_id, vocab)).build())
+
+
+def run(port, bulk, args):
+    skills_bus = connect(port)
+    intent_bus = connect(port)
+    others = [connect(port) for _ in range(args.listeners)]
+    service = IntentService(intent_bus)
+    done = Event()
+    intent_bus.on('bench.done', lambda m: done.set())
+
+    counter = CountingBus(skills_bus)
+    interface = IntentServiceInterface(counter)
+    start = time.monotonic()
+    register_skills(interface, bulk, args.skills, args.vocabs, args.lines,
+                    args.aliases)
+    skills_bus.emit(Message('bench.done'))
+    done.wait(600)
+    elapsed = time.monotonic() - start
+
+    intents = len(service.engine.intent_parsers)
+    for bus in [skills_bus, intent_bus] + others:
+        bus.close()
+        bus.emitter.close()
+    return counter.count, elapsed, intents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--skills', type=int, default=60)
+    parser.add_argument('--vocabs', type=int, default=10,
+                        help='vocab files per skill')
+    parser.add_argument('--lines', type=int, default=8,
+                        help='lines per vocab file')
+    parser.add_argument('--aliases', type=int, default=2,
+                        help='aliases per line')
+    parser.add_argument('--listeners', type=int, default=4,
+                        help='other clients receiving all messages')
+    args = parser.parse_args()
+
+    logging.getLogger('tornado.access').setLevel(logging.WARNING)
+    state = {}
+    started = Event()
+    Thread(target=run_server, args=(started, state), daemon=True).start()
+    started.wait(5)
+
+    print('{:18}{:>10}{:>12}{:>10}'.format('registration', 'messages',
+                                           'seconds', 'intents'))
+    config = {'websocket': {'host': '127.0.0.1', 'port': state['port'],
+                            'route': '/core', 'ssl': False,
+                            'local_socket': None}}
+    with mock.patch('mycroft.configuration.Configuration.get',
+                    return_value=config), \
+            mock.patch.object(event_handler, 'LOG'), \
+            mock.patch.object(client, 'LOG'), \
+            mock.patch.object(load_config, 'LOG'):
+        for bulk in (False, True):
+            count, elapsed, intents = run(state['port'], bulk, args)
+            print('{:18}{:>10}{:>12.2f}{:>10}'.format(
+                'bulk' if bulk else 'per keyword', count, elapsed, intents))
+
+
+if __name__ == '__main__':
+    main()
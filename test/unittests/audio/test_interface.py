@@ -12,14 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import time
 import unittest
 from shutil import rmtree
 from threading import Thread
 from time import sleep
+from unittest import mock
 
 from os.path import exists
 
 import mycroft.audio
+from mycroft.audio import SpeakingState
+from mycroft.messagebus import Message
 from mycroft.util import create_signal, check_for_signal
 
 """
@@ -59,5 +63,99 @@ class TestInterface(unittest.TestCase):
         self.assertTrue(done_waiting)
 
 
+class TestSpeakingState(unittest.TestCase):
+    def setUp(self):
+        self.bus = mock.Mock()
+        self.state = SpeakingState()
+        self.state.bind(self.bus)
+
+    def start_waiting(self):
+        """Wait while speaking in a thread, return dict with end time."""
+        result = {}
+
+        def wait():
+            self.state.wait_while_speaking()
+            result['time'] = time.monotonic()
+
+        thread = Thread(target=wait, daemon=True)
+        thread.start()
+        return thread, result
+
+    def test_bind(self):
+        registered = [call[0][0] for call in self.bus.on.call_args_list]
+        self.assertIn('mycroft.audio.speaking', registered)
+        self.assertIn('speak', registered)
+        # The current state is requested
+        sent = self.bus.emit.call_args[0][0]
+        self.assertEqual(sent.msg_type, 'mycroft.audio.is_speaking')
+
+    def test_not_speaking_returns_immediately(self):
+        self.assertTrue(self.state.wait_while_speaking(timeout=0.05))
+
+    def test_wakes_on_speech_end(self):
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': True}))
+        self.assertTrue(self.state.is_speaking())
+        thread, result = self.start_waiting()
+        sleep(0.2)
+        self.assertEqual(result, {})
+        end_time = time.monotonic()
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': False}))
+        thread.join(1)
+        self.assertLess(result['time'] - end_time, 0.01)
+
+    def test_pending_speech(self):
+        self.state.speak_requested()
+        thread, result = self.start_waiting()
+        sleep(0.1)
+        # Speech started, then ended
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': True}))
+        sleep(0.1)
+        self.assertEqual(result, {})
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': False}))
+        thread.join(1)
+        self.assertIn('time', result)
+
+    def test_speak_handled_while_speaking(self):
+        """Handlers run in parallel, speak may be seen after it started."""
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': True}))
+        self.state.speak_requested()
+        thread, result = self.start_waiting()
+        sleep(0.05)
+        end_time = time.monotonic()
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': False}))
+        thread.join(1)
+        self.assertLess(result['time'] - end_time, 0.01)
+
+    def test_pending_speech_timeout(self):
+        self.state.PENDING_TIMEOUT = 0.1
+        self.state.speak_requested()
+        start = time.monotonic()
+        self.assertTrue(self.state.wait_while_speaking())
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_timeout(self):
+        self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                           {'speaking': True}))
+        self.assertFalse(self.state.wait_while_speaking(timeout=0.05))
+
+    def test_wrappers_use_bound_state(self):
+        with mock.patch('mycroft.audio.speaking_state', self.state):
+            self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                               {'speaking': True}))
+            self.assertTrue(mycroft.audio.is_speaking())
+            self.state.handle_speaking(Message('mycroft.audio.speaking',
+                                               {'speaking': False}))
+            self.assertFalse(mycroft.audio.is_speaking())
+            start = time.monotonic()
+            mycroft.audio.wait_while_speaking()
+            self.assertLess(time.monotonic() - start, 0.1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.client.speech.mic import CyclicAudioBuffer
+
+
+class TestCyclicBuffer(unittest.TestCase):
+    def test_init(self):
+        buff = CyclicAudioBuffer(16, b'abc')
+        self.assertEqual(len(buff), 3)
+        self.assertEqual(buff.get(), b'abc')
+
+    def test_append_until_full(self):
+        buff = CyclicAudioBuffer(8)
+        buff.append(b'1234')
+        buff.append(b'5678')
+        self.assertEqual(buff.get(), b'12345678')
+        self.assertEqual(len(buff), 8)
+
+    def test_wrap_around(self):
+        buff = CyclicAudioBuffer(8)
+        buff.append(b'123456')
+        buff.append(b'abcd')
+        self.assertEqual(buff.get(), b'3456abcd')
+        buff.append(b'XYZ')
+        self.assertEqual(buff.get(), b'6abcdXYZ')
+
+    def test_oversized_append(self):
+        buff = CyclicAudioBuffer(4, b'ab')
+        buff.append(b'0123456789')
+        self.assertEqual(buff.get(), b'6789')
+
+    def test_get_last(self):
+        buff = CyclicAudioBuffer(8)
+        buff.append(b'123456')
+        buff.append(b'abcd')
+        self.assertEqual(bytes(buff.get_last(3)), b'bcd')
+        self.assertEqual(bytes(buff.get_last(6)), b'56abcd')
+        # Requests bigger than the buffer content are capped
+        self.assertEqual(bytes(buff.get_last(100)), b'3456abcd')
+
+    def test_matches_slicing(self):
+        """Compare against the old slice and concatenate approach."""
+        size = 100
+        buff = CyclicAudioBuffer(size)
+        reference = b''
+        for i in range(50):
+            chunk = bytes([i]) * 17
+            buff.append(chunk)
+            reference = (reference + chunk)[-size:]
+            self.assertEqual(buff.get(), reference)
+            self.assertEqual(bytes(buff.get_last(30)), reference[-30:])
+
+    def test_clear(self):
+        buff = CyclicAudioBuffer(8, b'1234')
+        buff.clear()
+        self.assertEqual(len(buff), 0)
+        self.assertEqual(buff.get(), b'')
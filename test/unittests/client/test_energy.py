@@ -0,0 +1,125 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import unittest
+from unittest import mock
+import wave
+from os.path import dirname, join
+
+from mycroft.client.speech import energy
+from mycroft.client.speech.energy import (AudioopEnergyEstimator,
+                                          NumpyEnergyEstimator,
+                                          RollingMean,
+                                          create_energy_estimator)
+
+DATA_DIR = join(dirname(__file__), 'data')
+CHUNK_SIZE = 2048  # 1024 frames of 16 bit audio
+
+
+def load_wav(name):
+    with wave.open(join(DATA_DIR, name), 'rb') as wav:
+        return wav.readframes(wav.getnframes()), wav.getsampwidth()
+
+
+def load_golden_energies():
+    """Energies calculated with audioop.rms for each chunk of the fixtures.
+    """
+    with open(join(DATA_DIR, 'energies.json')) as f:
+        return json.load(f)
+
+
+class EstimatorGoldenTests:
+    """Compare estimator output with the stored audioop results."""
+    def create_estimator(self):
+        raise NotImplementedError
+
+    def test_calc_energy(self):
+        estimator = self.create_estimator()
+        for name, expected in load_golden_energies().items():
+            data, sample_width = load_wav(name)
+            energies = [estimator.calc_energy(data[i:i + CHUNK_SIZE],
+                                              sample_width)
+                        for i in range(0, len(data), CHUNK_SIZE)]
+            self.assertEqual(energies, expected, name)
+
+    def test_calc_energies(self):
+        estimator = self.create_estimator()
+        for name, expected in load_golden_energies().items():
+            data, sample_width = load_wav(name)
+            energies = estimator.calc_energies(data, sample_width, CHUNK_SIZE)
+            self.assertEqual(energies, expected, name)
+
+    def test_empty_chunk(self):
+        estimator = self.create_estimator()
+        self.assertEqual(estimator.calc_energy(b'', 2), 0)
+        self.assertEqual(estimator.calc_energies(b'', 2, CHUNK_SIZE), [])
+
+
+@unittest.skipUnless(energy.numpy, 'numpy is not installed')
+class TestNumpyEnergyEstimator(EstimatorGoldenTests, unittest.TestCase):
+    def create_estimator(self):
+        return NumpyEnergyEstimator()
+
+    def test_invalid_sample_width(self):
+        with self.assertRaises(ValueError):
+            NumpyEnergyEstimator().calc_energy(b'\x00\x00\x00', 3)
+
+
+@unittest.skipUnless(energy.audioop, 'audioop is not available')
+class TestAudioopEnergyEstimator(EstimatorGoldenTests, unittest.TestCase):
+    def create_estimator(self):
+        return AudioopEnergyEstimator()
+
+
+class TestCreateEnergyEstimator(unittest.TestCase):
+    @unittest.skipUnless(energy.audioop, 'audioop is not available')
+    def test_default_is_audioop(self):
+        self.assertIsInstance(create_energy_estimator(),
+                              AudioopEnergyEstimator)
+
+    @unittest.skipUnless(energy.numpy, 'numpy is not installed')
+    def test_numpy_without_audioop(self):
+        with mock.patch.object(energy, 'audioop', None):
+            self.assertIsInstance(create_energy_estimator(),
+                                  NumpyEnergyEstimator)
+
+    @unittest.skipUnless(energy.audioop, 'audioop is not available')
+    def test_select_audioop(self):
+        self.assertIsInstance(create_energy_estimator('audioop'),
+                              AudioopEnergyEstimator)
+
+
+class TestRollingMean(unittest.TestCase):
+    def test_matches_inline_average(self):
+        """Ensure the mean is identical to the previous inline version."""
+        num_samples = 10
+        values = load_golden_energies()['mycroft_wakeup.wav']
+        rolling = RollingMean(num_samples)
+
+        energies = []
+        idx_energy = 0
+        avg_energy = 0.0
+        for value in values:
+            if len(energies) < num_samples:
+                energies.append(value)
+                avg_energy += float(value) / num_samples
+            else:
+                avg_energy -= float(energies[idx_energy]) / num_samples
+                avg_energy += float(value) / num_samples
+                energies[idx_energy] = value
+                idx_energy = (idx_energy + 1) % num_samples
+            rolling.append(value)
+            self.assertEqual(rolling.value, avg_energy)
+            self.assertEqual(rolling.is_full, len(energies) == num_samples)
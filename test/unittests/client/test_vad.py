@@ -0,0 +1,159 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import math
+import struct
+import unittest
+import wave
+from os.path import dirname, join
+
+from mycroft.client.speech import vad
+from mycroft.client.speech.energy import create_energy_estimator
+from mycroft.client.speech.vad import (create_vad, EnergyVAD, LegacyVAD,
+                                       SpectralVAD)
+
+DATA_DIR = join(dirname(__file__), 'data')
+CHUNK = 1024
+SAMPLE_RATE = 16000
+SEC_PER_BUFFER = CHUNK / SAMPLE_RATE
+
+
+def sine_chunk(freq, amplitude=8000):
+    samples = [int(amplitude * math.sin(2 * math.pi * freq * i / SAMPLE_RATE))
+               for i in range(CHUNK)]
+    return struct.pack('<{}h'.format(CHUNK), *samples)
+
+
+def run_vad(detector, energies, threshold, chunk=b''):
+    """Feed energies to the detector, return chunks until completion."""
+    detector.reset(SAMPLE_RATE, 2, SEC_PER_BUFFER)
+    for num_chunks, energy in enumerate(energies, 1):
+        if detector.update(chunk, energy, threshold):
+            return num_chunks
+    return None
+
+
+def legacy_record_phrase(energies, threshold):
+    """The phrase end logic formerly inlined in _record_phrase."""
+    sec_per_buffer = SEC_PER_BUFFER
+    num_loud_chunks = 0
+    noise = 0
+    silence_duration = 0
+    min_loud_chunks = int(0.5 / sec_per_buffer)
+    max_chunks_of_silence = int(3.0 / sec_per_buffer)
+    for num_chunks, energy in enumerate(energies, 1):
+        if energy > threshold:
+            if noise < 25:
+                noise += 200 * sec_per_buffer
+            num_loud_chunks += 1
+        elif noise > 0:
+            noise -= 100 * sec_per_buffer
+        was_loud_enough = num_loud_chunks > min_loud_chunks
+        quiet_enough = noise <= 0
+        if quiet_enough:
+            silence_duration += sec_per_buffer
+            if silence_duration < 0.25:
+                quiet_enough = False
+        else:
+            silence_duration = 0
+        recorded_too_much_silence = num_chunks > max_chunks_of_silence
+        if quiet_enough and (was_loud_enough or recorded_too_much_silence):
+            return num_chunks
+    return None
+
+
+class TestEnergyVAD(unittest.TestCase):
+    def test_ends_after_silence(self):
+        detector = EnergyVAD({'silence_sec': 0.25, 'min_speech_sec': 0.1})
+        energies = [10] * 3 + [500] * 5 + [10] * 10
+        # 0.25 seconds is 4 chunks of silence after 3 + 5 chunks
+        self.assertEqual(run_vad(detector, energies, 100), 12)
+
+    def test_short_pause_continues(self):
+        detector = EnergyVAD({'silence_sec': 0.25})
+        energies = [500] * 5 + [10] * 2 + [500] * 5 + [10] * 10
+        self.assertEqual(run_vad(detector, energies, 100), 16)
+
+    def test_noise_burst_continues(self):
+        detector = EnergyVAD({'silence_sec': 0.25,
+                              'timeout_with_silence': 1.0})
+        energies = [500] * 2 + [10] * 100
+        self.assertEqual(run_vad(detector, energies, 100),
+                         int(1.0 / SEC_PER_BUFFER) + 1)
+
+    def test_timeout_without_speech(self):
+        detector = EnergyVAD({'timeout_with_silence': 1.0})
+        energies = [10] * 100
+        self.assertEqual(run_vad(detector, energies, 100),
+                         int(1.0 / SEC_PER_BUFFER) + 1)
+
+
+class TestLegacyVAD(unittest.TestCase):
+    def test_matches_previous_implementation(self):
+        patterns = [
+            [10] * 60,
+            [10] * 3 + [500] * 20 + [10] * 30,
+            [500] * 5 + [10] * 3 + [500] * 4 + [10] * 60,
+            [500, 10] * 40
+        ]
+        for energies in patterns:
+            self.assertEqual(run_vad(LegacyVAD(), energies, 100),
+                             legacy_record_phrase(energies, 100))
+
+
+@unittest.skipUnless(vad.numpy, 'numpy is not installed')
+class TestSpectralVAD(unittest.TestCase):
+    def setUp(self):
+        self.detector = SpectralVAD()
+        self.detector.reset(SAMPLE_RATE, 2, SEC_PER_BUFFER)
+
+    def test_quiet_is_not_speech(self):
+        chunk = sine_chunk(1000, amplitude=50)
+        self.assertFalse(self.detector.is_speech(chunk, 35, 100))
+
+    def test_speech_band(self):
+        chunk = sine_chunk(1000)
+        self.assertTrue(self.detector.is_speech(chunk, 5657, 100))
+
+    def test_low_frequency_hum_rejected(self):
+        chunk = sine_chunk(60)
+        self.assertFalse(self.detector.is_speech(chunk, 5657, 100))
+
+    def test_recorded_fixture(self):
+        """record.wav has loud low frequency noise around the speech."""
+        with wave.open(join(DATA_DIR, 'record.wav'), 'rb') as wav:
+            data = wav.readframes(wav.getnframes())
+        estimator = create_energy_estimator()
+        chunks = [data[i:i + 2 * CHUNK]
+                  for i in range(0, len(data) - 2 * CHUNK + 1, 2 * CHUNK)]
+        threshold = 1000
+        speech = [self.detector.is_speech(c, estimator.calc_energy(c, 2),
+                                          threshold)
+                  for c in chunks]
+        # Energy alone flags every chunk, only the middle contains speech
+        self.assertEqual(speech[:4], [False] * 4)
+        self.assertEqual(speech[-4:], [False] * 4)
+        self.assertTrue(all(speech[4:6]))
+
+
+class TestCreateVAD(unittest.TestCase):
+    def test_default(self):
+        self.assertIsInstance(create_vad(None), SpectralVAD)
+
+    def test_select(self):
+        self.assertIsInstance(create_vad({'module': 'legacy'}), LegacyVAD)
+        self.assertIsInstance(create_vad({'module': 'energy'}), EnergyVAD)
+
+    def test_unknown(self):
+        self.assertIsInstance(create_vad({'module': 'foo'}), SpectralVAD)
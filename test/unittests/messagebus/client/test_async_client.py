@@ -0,0 +1,250 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+from tornado import httpserver, web
+from tornado.netutil import bind_sockets
+from tornado.testing import bind_unused_port
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.client import AsyncMessageBusClient
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+
+from .test_client import WS_CONF
+
+
+@mock.patch('mycroft.configuration.Configuration.get',
+            mock.Mock(return_value=WS_CONF))
+@mock.patch.object(event_handler, 'LOG', mock.Mock())
+class TestAsyncMessageBusClient(TestCase):
+    def setUp(self):
+        self.connections = []
+        patcher = mock.patch.object(event_handler, 'client_connections',
+                                    self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        sock, self.port = bind_unused_port()
+        self.server = None
+        self.start_server([sock])
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.stop_server()
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def start_server(self, sockets=None, route='/core'):
+        app = web.Application([(route, MessageBusEventHandler)])
+        self.server = httpserver.HTTPServer(app)
+        self.server.add_sockets(sockets or bind_sockets(self.port,
+                                                        '127.0.0.1'))
+
+    def stop_server(self):
+        self.server.stop()
+        for connection in list(self.connections):
+            connection.close()
+
+    def run_until(self, coroutine, timeout=10):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(coroutine, timeout))
+
+    def create_client(self, **kwargs):
+        client = AsyncMessageBusClient(host='127.0.0.1', port=self.port,
+                                       **kwargs)
+        client.RECONNECT_DELAY = 0.05
+        self.clients.append(client)
+        return client
+
+    def connect(self, client):
+        opened = asyncio.Event()
+        client.once('open', opened.set)
+        client.run_in_background()
+        self.run_until(opened.wait())
+
+    def start_responder(self, request_type='test.request'):
+        responder = self.create_client(subscriptions=[request_type])
+
+        def respond(message):
+            responder.emit(message.response({'value': message.data['n']}))
+        responder.on(request_type, respond)
+        self.connect(responder)
+        return responder
+
+    def test_handlers(self):
+        received = []
+        coroutine_done = asyncio.Event()
+
+        async def coroutine_handler(message):
+            await asyncio.sleep(0)
+            received.append(('coroutine', message.data))
+            coroutine_done.set()
+
+        executor_thread = []
+
+        def executor_handler(message):
+            executor_thread.append(threading.current_thread())
+
+        bus = self.create_client()
+        bus.on('test', lambda m: received.append(('sync', m.data)))
+        bus.on('test', coroutine_handler)
+        executor = ThreadPoolExecutor(1)
+        bus.on('test', executor_handler, executor=executor)
+        self.connect(bus)
+
+        bus.emit(Message('test', {'a': 1}))
+        self.run_until(coroutine_done.wait())
+        executor.shutdown(wait=True)
+        self.assertIn(('sync', {'a': 1}), received)
+        self.assertIn(('coroutine', {'a': 1}), received)
+        self.assertEqual(len(executor_thread), 1)
+        self.assertNotEqual(executor_thread[0], threading.current_thread())
+
+    def test_once(self):
+        received = []
+        done = asyncio.Event()
+        bus = self.create_client()
+        bus.once('test', received.append)
+        bus.on('test.done', lambda m: done.set())
+        self.connect(bus)
+
+        bus.emit(Message('test'))
+        bus.emit(Message('test'))
+        bus.emit(Message('test.done'))
+        self.run_until(done.wait())
+        self.assertEqual(len(received), 1)
+        self.assertNotIn('test', bus.handlers)
+
+    def test_wait_for_response(self):
+        self.start_responder()
+        bus = self.create_client(subscriptions=['test.request.response'])
+        self.connect(bus)
+        response = self.run_until(bus.wait_for_response(
+            Message('test.request', {'n': 7})))
+        self.assertEqual(response.data, {'value': 7})
+
+    def test_wait_for_response_timeout(self):
+        bus = self.create_client()
+        self.connect(bus)
+        response = self.run_until(
+            bus.wait_for_response(Message('test.request'), timeout=0.1))
+        self.assertIsNone(response)
+        self.assertEqual(bus._waiters, {})
+        self.assertEqual(dict(bus._waiters_by_type), {})
+
+    def test_concurrent_requests(self):
+        """Every request gets its own reply, matched by correlation id."""
+        self.start_responder()
+        bus = self.create_client(subscriptions=['test.request.response'])
+        self.connect(bus)
+
+        async def requests():
+            return await asyncio.gather(*[
+                bus.wait_for_response(Message('test.request', {'n': n}),
+                                      timeout=10)
+                for n in range(1000)])
+        responses = self.run_until(requests(), timeout=30)
+        self.assertEqual([r.data['value'] for r in responses],
+                         list(range(1000)))
+
+    def test_derived_requests(self):
+        """Requests derived from the same message don't share an id."""
+        self.start_responder()
+        bus = self.create_client(subscriptions=['test.request.response'])
+        self.connect(bus)
+        parent = Message('test.parent', context={'correlation_id': 'parent'})
+
+        async def requests():
+            return await asyncio.gather(*[
+                bus.wait_for_response(parent.reply('test.request',
+                                                   {'n': n}))
+                for n in range(2)])
+        responses = self.run_until(requests())
+        self.assertEqual([r.data['value'] for r in responses], [0, 1])
+
+    def test_compact(self):
+        self.start_responder()
+        bus = self.create_client(subscriptions=['test.request.response'],
+                                 compact=True)
+        self.connect(bus)
+        response = self.run_until(bus.wait_for_response(
+            Message('test.request', {'n': 1})))
+        self.assertEqual(response.data, {'value': 1})
+
+    def test_buffer_while_disconnected(self):
+        received = []
+        done = asyncio.Event()
+        listener = self.create_client(subscriptions=['test', 'test.done'])
+        listener.on('test', lambda m: received.append(m.data['n']))
+        listener.on('test.done', lambda m: done.set())
+        self.connect(listener)
+
+        bus = self.create_client(max_buffer=5)
+        for n in range(8):
+            bus.emit(Message('test', {'n': n}))
+        bus.emit(Message('test.done'))
+        self.assertEqual(len(bus.buffer), 5)
+        self.assertEqual(bus.dropped, 4)
+
+        self.connect(bus)
+        self.run_until(done.wait())
+        self.assertEqual(received, [4, 5, 6, 7])
+        self.assertEqual(len(bus.buffer), 0)
+
+    def test_reconnect(self):
+        bus = self.create_client()
+        closed = asyncio.Event()
+        bus.on('close', closed.set)
+        self.connect(bus)
+
+        self.stop_server()
+        self.run_until(closed.wait())
+        self.assertFalse(bus.connected)
+        bus.emit(Message('test', {'n': 1}))  # Buffered
+
+        received = []
+        done = asyncio.Event()
+        reopened = asyncio.Event()
+        bus.on('test', lambda m: (received.append(m.data), done.set()))
+        bus.once('open', reopened.set)
+        self.start_server()
+        self.run_until(reopened.wait())
+        self.run_until(done.wait())
+        self.assertEqual(received, [{'n': 1}])
+
+    def test_failed_handshake(self):
+        """Handshake errors don't stop the reconnection attempts."""
+        self.stop_server()
+        self.start_server(route='/other')
+        bus = self.create_client()
+        opened = asyncio.Event()
+        bus.once('open', opened.set)
+        task = bus.run_in_background()
+        self.run_until(asyncio.sleep(0.2))
+        self.assertFalse(task.done())
+
+        self.stop_server()
+        self.start_server()
+        self.run_until(opened.wait())
+        self.assertTrue(bus.connected)
@@ -12,9 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from unittest.mock import patch
+import time
+from queue import Queue
+from threading import Timer
+from unittest.mock import Mock, patch
 
-from mycroft.messagebus.client import MessageBusClient
+from websocket import ABNF
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.client import MessageBusClient, MessageWaiter
+from mycroft.metrics.tracing import Tracer
 
 WS_CONF = {
     'websocket': {
@@ -37,3 +44,154 @@ class TestMessageBusClient:
     def test_create_client(self, mock_conf):
         mc = MessageBusClient()
         assert mc.client.url == 'ws://testhost:1337/core'
+
+
+class LoopbackConnection:
+    """Websocket stand-in answering each request from a thread."""
+    def __init__(self, bus, responders=1, delay=0.01):
+        self.bus = bus
+        self.responders = responders
+        self.delay = delay
+        self.sent = []
+
+    def send(self, data):
+        message = Message.deserialize(data)
+        self.sent.append(message)
+        for i in range(self.responders):
+            reply = message.response({'responder': i})
+            Timer(self.delay * (i + 1), self.bus.on_message,
+                  [reply.serialize()]).start()
+
+
+@patch('mycroft.configuration.Configuration.get', return_value=WS_CONF)
+class TestWaitForResponse:
+    def create_bus(self, responders=1, delay=0.01):
+        bus = MessageBusClient()
+        bus.client = LoopbackConnection(bus, responders, delay)
+        bus.connected_event.set()
+        return bus
+
+    def test_response(self, _):
+        bus = self.create_bus()
+        start = time.monotonic()
+        response = bus.wait_for_response(Message('test.request'))
+        assert response.data == {'responder': 0}
+        # The reply is delivered without polling
+        assert time.monotonic() - start < 0.1
+        assert bus.emitter.listeners('test.request.response') == []
+
+    def test_timeout(self, _):
+        bus = self.create_bus(responders=0)
+        start = time.monotonic()
+        assert bus.wait_for_response(Message('test.request'),
+                                     timeout=0.1) is None
+        assert 0.1 <= time.monotonic() - start < 0.3
+        assert bus.emitter.listeners('test.request.response') == []
+
+    def test_ignores_other_requests(self, _):
+        bus = self.create_bus(delay=0.05)
+        # Reply to another request arriving first
+        other = Message('test.request', context={'correlation_id': 'other'})
+        Timer(0.01, bus.on_message,
+              [other.response({'other': True}).serialize()]).start()
+        response = bus.wait_for_response(Message('test.request'))
+        assert response.data == {'responder': 0}
+        sent_id = bus.client.sent[0].context['correlation_id']
+        assert response.context['correlation_id'] == sent_id
+
+    def test_derived_requests(self, _):
+        bus = self.create_bus()
+        parent = Message('test.parent', context={'correlation_id': 'parent'})
+        for _ in range(2):
+            bus.wait_for_response(parent.reply('test.request'))
+        ids = [m.context['correlation_id'] for m in bus.client.sent]
+        assert len(set(ids)) == 2
+        assert 'parent' not in ids
+
+    def test_reply_without_id(self, _):
+        bus = self.create_bus(responders=0)
+        Timer(0.01, bus.on_message,
+              [Message('test.request.response').serialize()]).start()
+        assert bus.wait_for_response(Message('test.request')) is not None
+
+    def test_responses(self, _):
+        bus = self.create_bus(responders=3)
+        responses = bus.wait_for_responses(Message('test.request'), count=2)
+        assert [r.data['responder'] for r in responses] == [0, 1]
+
+        # Without count the responses are collected until the timeout
+        responses = bus.wait_for_responses(Message('test.request'),
+                                           timeout=0.2)
+        assert len(responses) == 3
+
+    def test_message_waiter(self, _):
+        bus = self.create_bus(responders=0)
+        waiter = MessageWaiter(bus, 'test.event', count=2)
+        for i in range(3):
+            bus.on_message(Message('test.event', {'i': i}).serialize())
+        responses = waiter.wait(1)
+        assert [r.data['i'] for r in responses] == [0, 1]
+
+
+@patch('mycroft.configuration.Configuration.get', return_value=WS_CONF)
+class TestSubscriptions:
+    def test_subscription_url(self, _):
+        mc = MessageBusClient(subscriptions=['speak', 'mycroft.audio.*'])
+        assert mc.client.url == ('ws://testhost:1337/core?'
+                                 'subscribe=speak%2Cmycroft.audio.%2A')
+
+    def test_subscribe(self, _):
+        mc = MessageBusClient()
+        mc.client = LoopbackConnection(mc, responders=0)
+        mc.connected_event.set()
+        mc.subscribe(['speak'])
+        sent = mc.client.sent[0]
+        assert sent.msg_type == 'mycroft.bus.subscribe'
+        assert sent.data == {'message_types': ['speak']}
+        # Used when reconnecting
+        assert 'subscribe=speak' in mc.create_client().url
+
+
+@patch('mycroft.configuration.Configuration.get', return_value=WS_CONF)
+class TestCompactFormat:
+    def test_compact_url(self, _):
+        mc = MessageBusClient(compact=True)
+        assert mc.client.url == 'ws://testhost:1337/core?format=compact'
+
+    def test_emit_compact(self, _):
+        mc = MessageBusClient(compact=True)
+        mc.client = Mock()
+        mc.connected_event.set()
+        mc.emit(Message('speak', {'utterance': 'hello'}))
+        frame, opcode = mc.client.send.call_args[0]
+        assert opcode == ABNF.OPCODE_BINARY
+        assert Message.deserialize_compact(frame).data == {
+            'utterance': 'hello'}
+
+    def test_receive_compact(self, _):
+        mc = MessageBusClient(compact=True)
+        received = Queue()
+        mc.on('speak', received.put)
+        mc.on('message', received.put)
+        mc.on_message(
+            Message('speak', {'utterance': 'hi'}).serialize_compact())
+        messages = [received.get(timeout=1), received.get(timeout=1)]
+        raw = [m for m in messages if isinstance(m, str)][0]
+        parsed = [m for m in messages if not isinstance(m, str)][0]
+        assert Message.deserialize(raw).msg_type == 'speak'
+        assert parsed.data == {'utterance': 'hi'}
+
+
+@patch('mycroft.configuration.Configuration.get', return_value=WS_CONF)
+class TestTracing:
+    def test_traced_request(self, _):
+        mc = MessageBusClient()
+        mc.client = LoopbackConnection(mc)
+        mc.connected_event.set()
+        mc.tracer = Tracer(process='test')
+        request = Message('test.request', context={'trace': {'id': 'tr'}})
+        mc.wait_for_response(request)
+        assert 'emitted' in mc.client.sent[0].context['trace']
+        span = mc.tracer.spans[0]
+        assert (span.trace, span.kind, span.name) == (
+            'tr', 'bus', 'test.request.response')
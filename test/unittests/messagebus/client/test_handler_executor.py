@@ -0,0 +1,184 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from threading import Event
+from unittest import TestCase, mock
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.client import handler_executor
+from mycroft.messagebus.client.handler_executor import HandlerExecutor
+from mycroft.messagebus.client.threaded_event_emitter import \
+    ThreadedEventEmitter
+
+
+def skill_handler(skill_id, func):
+    def wrapper(*args):
+        func(*args)
+    wrapper.skill_id = skill_id
+    return wrapper
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestHandlerExecutor(TestCase):
+    def setUp(self):
+        self.release = Event()
+        self.executor = HandlerExecutor(
+            threads=2, skill_threads=1, budget=None,
+            lanes={'audio': {'threads': 1, 'events': ['mycroft.audio.*']}})
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.close()
+
+    def block(self, message=None):
+        self.release.wait(5)
+
+    def test_lane_names(self):
+        handler = skill_handler('my-skill', print)
+        self.assertEqual(self.executor.lane_name('speak', print), 'default')
+        self.assertEqual(
+            self.executor.lane_name('my-skill:Hello.intent', handler),
+            'my-skill')
+        self.assertEqual(
+            self.executor.lane_name('mycroft.audio.service.play', handler),
+            'audio')
+        self.assertEqual(self.executor.lane_name('mycroft.stop', handler),
+                         'default')
+        executor = HandlerExecutor(skill_threads=0)
+        self.assertEqual(executor.lane_name('my-skill:Hello.intent', handler),
+                         'default')
+
+    def test_cached_lanes_limit(self):
+        executor = HandlerExecutor(budget=None)
+        executor.MAX_CACHED_LANES = 10
+        for i in range(20):
+            self.assertEqual(executor.lane_name('test.{}.response'.format(i)),
+                             'default')
+        self.assertEqual(len(executor._pattern_lanes), 10)
+        self.assertEqual(executor.lane_name('mycroft.stop',
+                                            skill_handler('a', print)),
+                         'default')
+
+    def test_chained_handlers(self):
+        """A handler waiting for another handler of its lane gets a thread.
+        """
+        executor = HandlerExecutor(threads=2, budget=None)
+        self.addCleanup(executor.close)
+        handled = Event()
+        results = []
+        executor.submit('b', time.sleep, (0.01,))  # Leaves an idle worker
+        self.assertTrue(wait_until(
+            lambda: executor.lanes['default'].idle == 1))
+        executor.submit('a', lambda: results.append(handled.wait(2)))
+        executor.submit('b', handled.set)
+        self.assertTrue(wait_until(lambda: results == [True], 3))
+
+    def test_stop_with_blocked_skill(self):
+        stopped = Event()
+        self.executor.submit('my-skill:Wait.intent',
+                             skill_handler('my-skill', self.block))
+        self.executor.submit('mycroft.stop',
+                             skill_handler('my-skill', stopped.set))
+        self.assertTrue(stopped.wait(2))
+
+    def test_blocked_skill_doesnt_stall_others(self):
+        done = []
+        self.executor.submit('slow-skill:Wait.intent',
+                             skill_handler('slow-skill', self.block))
+        self.executor.submit('slow-skill:Other.intent',
+                             skill_handler('slow-skill', done.append), ('a',))
+        self.executor.submit('fast-skill:Hello.intent',
+                             skill_handler('fast-skill', done.append), ('b',))
+        self.executor.submit('speak', done.append, ('c',))
+        self.assertTrue(wait_until(lambda: len(done) == 2))
+        self.assertEqual(sorted(done), ['b', 'c'])
+
+        stats = self.executor.stats()['lanes']['slow-skill']
+        self.assertEqual(stats['running'], 1)
+        self.assertEqual(stats['queued'], 1)
+        self.release.set()
+        self.assertTrue(wait_until(lambda: len(done) == 3))
+
+    def test_lane_size(self):
+        for _ in range(5):
+            self.executor.submit('speak', self.block)
+        self.assertTrue(wait_until(
+            lambda: self.executor.stats()['lanes']['default']['running'] == 2))
+        stats = self.executor.stats()['lanes']['default']
+        self.assertEqual(stats['workers'], 2)
+        self.assertEqual(stats['queued'], 3)
+        self.assertGreaterEqual(stats['max_depth'], 3)
+
+    @mock.patch.object(handler_executor, 'LOG')
+    def test_stats(self, mock_log):
+        def fail():
+            raise ValueError
+
+        self.executor.submit('speak', time.sleep, (0.01,))
+        self.executor.submit('speak', fail)
+        self.assertTrue(wait_until(
+            lambda: self.executor.stats()['events'].get(
+                'speak', {}).get('count') == 2))
+        stats = self.executor.stats()['events']['speak']
+        self.assertEqual(stats['failed'], 1)
+        self.assertGreaterEqual(stats['max'], 0.01)
+        self.assertTrue(mock_log.error.called)
+
+    @mock.patch.object(handler_executor, 'LOG')
+    def test_watchdog(self, mock_log):
+        executor = HandlerExecutor(threads=1, budget=0.05)
+        try:
+            executor.submit('speak', self.block)
+            executor.submit('recognizer_loop:utterance', self.block)
+            self.assertTrue(wait_until(
+                lambda: mock_log.warning.call_count >= 2))
+            warnings = [c[0][0] for c in mock_log.warning.call_args_list]
+            self.assertTrue(any('has been running' in w and 'speak' in w
+                                for w in warnings))
+            self.assertTrue(any('waiting in lane default' in w
+                                for w in warnings))
+            # Each handler is only reported once
+            executor.check()
+            executor.check()
+            running = [c for c in mock_log.warning.call_args_list
+                       if 'has been running' in c[0][0]]
+            self.assertEqual(len(running), 1)
+        finally:
+            self.release.set()
+            executor.close()
+
+
+class TestThreadedEventEmitterLanes(TestCase):
+    def test_handlers_run_in_lanes(self):
+        executor = HandlerExecutor(threads=1, skill_threads=1, budget=None)
+        emitter = ThreadedEventEmitter(executor=executor)
+        release = Event()
+        received = []
+        emitter.on('slow-skill:Wait.intent',
+                   skill_handler('slow-skill', lambda m: release.wait(5)))
+        emitter.on('speak', received.append)
+        try:
+            emitter.emit('slow-skill:Wait.intent', Message('a'))
+            emitter.emit('speak', Message('b'))
+            self.assertTrue(wait_until(lambda: len(received) == 1))
+        finally:
+            release.set()
+            emitter.close()
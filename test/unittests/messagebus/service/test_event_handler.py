@@ -0,0 +1,148 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, mock
+
+from tornado import web
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import (
+    MessageBusEventHandler,
+    MessageSubscription
+)
+
+
+def create_handler(subscribe=None, wire_format=None):
+    request = mock.Mock()
+    request.query_arguments = {}
+    request.remote_ip = '127.0.0.1'
+    if subscribe is not None:
+        request.query_arguments['subscribe'] = [subscribe.encode()]
+    if wire_format is not None:
+        request.query_arguments['format'] = [wire_format.encode()]
+    handler = MessageBusEventHandler(web.Application(), request)
+    handler.write_message = mock.Mock()
+    handler.open()
+    handler.write_message.reset_mock()  # Ignore the "connected" message
+    return handler
+
+
+def received(handler):
+    return [decode(call[0][0]).msg_type
+            for call in handler.write_message.call_args_list]
+
+
+def decode(frame):
+    if isinstance(frame, bytes):
+        return Message.deserialize_compact(frame)
+    return Message.deserialize(frame)
+
+
+class TestMessageSubscription(TestCase):
+    def test_matches(self):
+        subscription = MessageSubscription(['speak', 'mycroft.audio.*'])
+        self.assertTrue(subscription.matches('speak'))
+        self.assertTrue(subscription.matches('mycroft.audio.service.play'))
+        self.assertFalse(subscription.matches('speak.response'))
+        self.assertFalse(subscription.matches('mycroft.audio'))
+        # Cached results stay the same
+        self.assertTrue(subscription.matches('speak'))
+        self.assertFalse(subscription.matches('mycroft.audio'))
+
+    def test_parse(self):
+        subscription = MessageSubscription.parse('speak, mycroft.stop,')
+        self.assertEqual(subscription.message_types, ['speak', 'mycroft.stop'])
+
+
+class TestMessageBusEventHandler(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(event_handler, 'client_connections', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unfiltered(self):
+        sender = create_handler()
+        receiver = create_handler()
+        sender.on_message(Message('speak').serialize())
+        sender.on_message(Message('gui.value.set').serialize())
+        self.assertEqual(received(receiver), ['speak', 'gui.value.set'])
+        self.assertEqual(received(sender), ['speak', 'gui.value.set'])
+
+    def test_subscribe_on_connect(self):
+        sender = create_handler()
+        audio = create_handler('speak,mycroft.audio.*')
+        for msg_type in ('speak', 'gui.value.set',
+                         'mycroft.audio.service.stop'):
+            sender.on_message(Message(msg_type).serialize())
+        self.assertEqual(received(audio),
+                         ['speak', 'mycroft.audio.service.stop'])
+
+    def test_subscribe_message(self):
+        sender = create_handler()
+        receiver = create_handler()
+        receiver.on_message(Message('mycroft.bus.subscribe',
+                                    {'message_types': ['speak']}).serialize())
+        # The subscribe message isn't forwarded
+        self.assertEqual(received(sender), [])
+
+        sender.on_message(Message('gui.value.set').serialize())
+        sender.on_message(Message('speak').serialize())
+        self.assertEqual(received(receiver), ['speak'])
+
+        # Subscribing to None restores receiving everything
+        receiver.on_message(Message('mycroft.bus.subscribe',
+                                    {'message_types': None}).serialize())
+        sender.on_message(Message('gui.value.set').serialize())
+        self.assertEqual(received(receiver), ['speak', 'gui.value.set'])
+
+    def test_stats(self):
+        sender = create_handler()
+        create_handler('speak')
+        sender.on_message(Message('speak').serialize())
+        sender.on_message(Message('mycroft.bus.stats').serialize())
+        response = Message.deserialize(
+            sender.write_message.call_args[0][0])
+        self.assertEqual(response.msg_type, 'mycroft.bus.stats.response')
+        stats = response.data['connections']
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[1]['sent'], 1)
+        self.assertEqual(stats[1]['dropped'], 0)
+
+    def test_compact_format(self):
+        json_client = create_handler()
+        compact_client = create_handler(wire_format='compact')
+        message = Message('speak', {'utterance': 'hello'}, {'a': 1})
+
+        json_client.on_message(message.serialize_compact())
+        json_client.on_message(message.serialize())
+        for args, kwargs in json_client.write_message.call_args_list:
+            self.assertIsInstance(args[0], str)
+            self.assertFalse(kwargs['binary'])
+        for args, kwargs in compact_client.write_message.call_args_list:
+            self.assertIsInstance(args[0], bytes)
+            self.assertTrue(kwargs['binary'])
+        for handler in (json_client, compact_client):
+            for call in handler.write_message.call_args_list:
+                received_message = decode(call[0][0])
+                self.assertEqual(received_message.data, message.data)
+                self.assertEqual(received_message.context, message.context)
+
+    def test_compact_not_parsed(self):
+        create_handler(wire_format='compact')
+        sender = create_handler(wire_format='compact')
+        with mock.patch('mycroft.messagebus.message.LazyMessage._parse') \
+                as mock_parse:
+            sender.on_message(Message('speak').serialize_compact())
+        mock_parse.assert_not_called()
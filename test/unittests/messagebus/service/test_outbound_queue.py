@@ -0,0 +1,246 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import socket
+import time
+from threading import Event, Thread
+from unittest import TestCase, mock
+
+from tornado import httpserver, ioloop, web
+from tornado.testing import bind_unused_port
+from websocket import create_connection
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+from mycroft.messagebus.service.outbound_queue import OutboundQueue
+
+
+class WriteFuture:
+    """Future of a write, resolved by the test."""
+    def __init__(self):
+        self.callbacks = []
+        self.error = None
+        self.resolved = False
+
+    def done(self):
+        return self.resolved
+
+    def cancelled(self):
+        return False
+
+    def exception(self):
+        return self.error
+
+    def add_done_callback(self, callback):
+        if self.resolved:
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+
+    def resolve(self, error=None):
+        self.resolved = True
+        self.error = error
+        for callback in self.callbacks:
+            callback(self)
+
+
+class SlowConnection:
+    """Connection where writes complete when the test says so."""
+    def __init__(self):
+        self.written = []
+        self.futures = []
+
+    def write(self, message):
+        self.written.append(message)
+        future = WriteFuture()
+        self.futures.append(future)
+        return future
+
+    def busy(self):
+        return any(not future.resolved for future in self.futures)
+
+    def complete_writes(self):
+        while self.busy():
+            next(f for f in self.futures if not f.resolved).resolve()
+
+
+class TestOutboundQueue(TestCase):
+    def test_direct_write(self):
+        written = []
+        queue = OutboundQueue(written.append)
+        for i in range(5):
+            self.assertTrue(queue.put('test', str(i)))
+        self.assertEqual(written, ['0', '1', '2', '3', '4'])
+        self.assertEqual(len(queue), 0)
+
+    def test_waits_for_write(self):
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy)
+        for i in range(3):
+            queue.put('test', str(i))
+        self.assertEqual(connection.written, ['0'])
+        self.assertEqual(len(queue), 2)
+        connection.complete_writes()
+        self.assertEqual(connection.written, ['0', '1', '2'])
+        self.assertEqual(queue.stats()['max_depth'], 2)
+
+    def test_drop_oldest(self):
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy,
+                              max_size=2)
+        for i in range(5):
+            self.assertTrue(queue.put('test', str(i)))
+        connection.complete_writes()
+        self.assertEqual(connection.written, ['0', '3', '4'])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_drop_newest(self):
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy,
+                              max_size=2, policy='drop_newest')
+        for i in range(5):
+            queue.put('test', str(i))
+        connection.complete_writes()
+        self.assertEqual(connection.written, ['0', '1', '2'])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_disconnect(self):
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy,
+                              max_size=2, policy='disconnect')
+        self.assertTrue(all(queue.put('test', str(i)) for i in range(3)))
+        self.assertFalse(queue.put('test', '3'))
+        self.assertTrue(queue.closed)
+        self.assertEqual(len(queue), 0)
+
+    def test_coalesce(self):
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy,
+                              coalesce=['level'])
+        queue.put('level', 'level 0')
+        queue.put('level', 'level 1')
+        queue.put('speak', 'speak')
+        queue.put('level', 'level 2')
+        queue.put('level', 'level 3')
+        connection.complete_writes()
+        self.assertEqual(connection.written, ['level 0', 'level 3', 'speak'])
+        self.assertEqual(queue.coalesced, 2)
+
+        # Once sent the type is queued again
+        queue.put('level', 'level 4')
+        self.assertEqual(connection.written[-1], 'level 4')
+
+    def test_write_error(self):
+        def write(message):
+            raise IOError('Connection closed')
+        queue = OutboundQueue(write)
+        self.assertFalse(queue.put('test', 'message'))
+
+        connection = SlowConnection()
+        queue = OutboundQueue(connection.write, connection.busy)
+        queue.put('test', '0')
+        queue.put('test', '1')
+        connection.futures[0].resolve(IOError('Connection closed'))
+        self.assertTrue(queue.closed)
+        self.assertFalse(queue.put('test', '2'))
+
+
+class BusServer:
+    """Message bus service running in a thread."""
+    def __init__(self, **queue_config):
+        self.queue_config = queue_config
+        self.started = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+
+    def run(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.loop = ioloop.IOLoop.current()
+        app = web.Application([('/core', MessageBusEventHandler,
+                                self.queue_config)])
+        sock, self.port = bind_unused_port()
+        self.server = httpserver.HTTPServer(app)
+        self.server.add_sockets([sock])
+        self.started.set()
+        self.loop.start()
+
+    def connect(self, subscribe=None, **kwargs):
+        url = 'ws://127.0.0.1:{}/core'.format(self.port)
+        if subscribe is not None:
+            url += '?subscribe=' + subscribe
+        connection = create_connection(url, timeout=10, **kwargs)
+        connection.recv()  # Connected message
+        return connection
+
+    def stop(self):
+        def stop():
+            self.server.stop()
+            self.loop.stop()
+        self.loop.add_callback(stop)
+        self.thread.join(5)
+
+
+@mock.patch.object(event_handler, 'LOG', mock.Mock())
+@mock.patch.object(event_handler, 'client_connections', [])
+class TestSlowClient(TestCase):
+    """One client not reading its messages mustn't hold up the others."""
+    def setUp(self):
+        self.server = BusServer(max_queue=1000)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_slow_client(self):
+        fast = self.server.connect()
+        # Small receive buffer so the server's writes block quickly
+        slow = self.server.connect(
+            sockopt=((socket.SOL_SOCKET, socket.SO_RCVBUF, 4096),))
+        sender = self.server.connect(subscribe='')
+
+        received = []
+
+        def receive():
+            while len(received) < number:
+                received.append(fast.recv())
+        number = 3000
+        receiver = Thread(target=receive, daemon=True)
+        receiver.start()
+
+        payload = {'data': 'x' * 2000}
+        start = time.monotonic()
+        for i in range(number):
+            sender.send(Message('soak', payload).serialize())
+            if i % 10 == 0:
+                time.sleep(0.005)  # Keep the rate the fast client handles
+        receiver.join(10)
+        self.assertEqual(len(received), number)
+        self.assertLess(time.monotonic() - start, 10)
+
+        sender.send(Message('mycroft.bus.stats').serialize())
+        stats = self.receive_stats(sender)
+        slow_stats = max(stats, key=lambda s: s['dropped'])
+        self.assertGreater(slow_stats['dropped'], 0)
+        self.assertLessEqual(slow_stats['max_depth'], 1000)
+        for connection in (fast, slow, sender):
+            connection.close()
+
+    @staticmethod
+    def receive_stats(connection):
+        while True:
+            message = Message.deserialize(connection.recv())
+            if message.msg_type == 'mycroft.bus.stats.response':
+                return message.data['connections']
@@ -0,0 +1,174 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import socket
+from os.path import join
+from queue import Queue, Empty
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+from unittest import TestCase, mock
+
+from tornado import httpserver, ioloop, web
+from tornado.testing import bind_unused_port
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.client import MessageBusClient
+from mycroft.messagebus.client.handler_executor import HandlerExecutor
+from mycroft.messagebus.local_transport import (
+    COMPACT_FRAME,
+    FRAME_HEADER,
+    JSON_FRAME,
+    LocalSocketApp,
+    decode_frame,
+    encode_frame
+)
+from mycroft.messagebus.service import event_handler
+from mycroft.messagebus.service.event_handler import MessageBusEventHandler
+from mycroft.messagebus.service.local_server import LocalBusServer
+
+
+class TestFrames(TestCase):
+    def test_json(self):
+        frame = encode_frame('{"type": "spéak"}')
+        kind, length = FRAME_HEADER.unpack_from(frame)
+        self.assertEqual(kind, JSON_FRAME)
+        self.assertEqual(length, len(frame) - FRAME_HEADER.size)
+        self.assertEqual(decode_frame(kind, frame[FRAME_HEADER.size:]),
+                         '{"type": "spéak"}')
+
+    def test_compact(self):
+        data = Message('speak').serialize_compact()
+        frame = encode_frame(data)
+        kind, length = FRAME_HEADER.unpack_from(frame)
+        self.assertEqual(kind, COMPACT_FRAME)
+        self.assertEqual(decode_frame(kind, frame[FRAME_HEADER.size:]), data)
+
+
+class BusServer:
+    """Bus service on a websocket and a Unix socket, running in a thread."""
+    def __init__(self, path):
+        self.path = path
+        self.started = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+
+    def run(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.loop = ioloop.IOLoop.current()
+        app = web.Application([('/core', MessageBusEventHandler)])
+        sock, self.port = bind_unused_port()
+        self.server = httpserver.HTTPServer(app)
+        self.server.add_sockets([sock])
+        self.local_server = LocalBusServer()
+        self.local_server.listen_unix(self.path)
+        self.started.set()
+        self.loop.start()
+
+    def stop(self):
+        def stop():
+            self.server.stop()
+            self.local_server.stop()
+            for connection in list(event_handler.client_connections):
+                connection.close()
+            self.loop.stop()
+        self.loop.add_callback(stop)
+        self.thread.join(5)
+
+
+@mock.patch.object(event_handler, 'LOG', mock.Mock())
+class TestLocalTransport(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(event_handler, 'client_connections', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = mkdtemp()
+        self.path = join(self.directory, 'bus.sock')
+        self.server = BusServer(self.path)
+        config = {'websocket': {'host': '0.0.0.0', 'port': self.server.port,
+                                'route': '/core', 'ssl': False,
+                                'local_socket': self.path}}
+        patcher = mock.patch('mycroft.configuration.Configuration.get',
+                             return_value=config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+            client.emitter.close()
+        self.server.stop()
+        rmtree(self.directory)
+
+    def connect(self, **kwargs):
+        bus = MessageBusClient(executor=HandlerExecutor(budget=None),
+                               **kwargs)
+        self.clients.append(bus)
+        Thread(target=bus.run_forever, daemon=True).start()
+        self.assertTrue(bus.connected_event.wait(5))
+        return bus
+
+    def receive(self, bus, msg_type):
+        received = Queue()
+        bus.on(msg_type, received.put)
+        return received
+
+    def test_local_and_websocket_clients(self):
+        local = self.connect()
+        compact = self.connect(compact=True)
+        websocket = self.connect(host='127.0.0.1', port=self.server.port)
+        self.assertIsInstance(local.client, LocalSocketApp)
+        self.assertIsInstance(compact.client, LocalSocketApp)
+        self.assertNotIsInstance(websocket.client, LocalSocketApp)
+
+        from_local = self.receive(websocket, 'from.local')
+        from_websocket = self.receive(compact, 'from.websocket')
+        from_compact = self.receive(local, 'from.compact')
+        local.emit(Message('from.local', {'n': 1}))
+        websocket.emit(Message('from.websocket', {'n': 2}))
+        compact.emit(Message('from.compact', {'n': 3}))
+        self.assertEqual(from_local.get(timeout=2).data, {'n': 1})
+        self.assertEqual(from_websocket.get(timeout=2).data, {'n': 2})
+        self.assertEqual(from_compact.get(timeout=2).data, {'n': 3})
+
+    def test_subscriptions(self):
+        bus = self.connect(subscriptions=['speak'])
+        speak = self.receive(bus, 'speak')
+        other = self.receive(bus, 'other')
+        sender = self.connect()
+        sender.emit(Message('other'))
+        sender.emit(Message('speak'))
+        self.assertEqual(speak.get(timeout=2).msg_type, 'speak')
+        with self.assertRaises(Empty):
+            other.get(timeout=0.1)
+
+    def test_fall_back_to_websocket(self):
+        """A socket without a bus listening isn't used."""
+        stale = join(self.directory, 'stale.sock')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(stale)
+        sock.close()
+
+        bus = MessageBusClient(executor=HandlerExecutor(budget=None))
+        bus.local_socket = stale
+        bus.client = bus.create_client()
+        self.assertIsInstance(bus.client, LocalSocketApp)
+        self.clients.append(bus)
+        Thread(target=bus.run_forever, daemon=True).start()
+        self.assertTrue(bus.connected_event.wait(5))
+        self.assertIsNone(bus.local_socket)
+        self.assertNotIsInstance(bus.client, LocalSocketApp)
@@ -0,0 +1,95 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+from unittest import TestCase
+
+from mycroft.messagebus.message import (
+    Message,
+    compact_to_json,
+    compact_type
+)
+
+
+class TestCompactFormat(TestCase):
+    def setUp(self):
+        self.message = Message('recognizer_loop:utterance',
+                               {'utterances': ['what time is it'],
+                                'lang': 'en-us', 'unicode': 'åäö'},
+                               {'source': 'audio'})
+
+    def test_round_trip(self):
+        frame = self.message.serialize_compact()
+        self.assertIsInstance(frame, bytes)
+        message = Message.deserialize_compact(frame)
+        self.assertEqual(message.msg_type, self.message.msg_type)
+        self.assertEqual(message.data, self.message.data)
+        self.assertEqual(message.context, self.message.context)
+
+    def test_type_only(self):
+        frame = self.message.serialize_compact()
+        self.assertEqual(compact_type(frame)[0], 'recognizer_loop:utterance')
+        with self.assertRaises(ValueError):
+            compact_type(b'\x07' + frame[1:])
+
+    def test_to_json(self):
+        frame = self.message.serialize_compact()
+        json_message = Message.deserialize(compact_to_json(frame))
+        self.assertEqual(json.loads(compact_to_json(frame)),
+                         json.loads(self.message.serialize()))
+        self.assertEqual(json_message.data, self.message.data)
+
+    def test_empty_payload(self):
+        message = Message('mycroft.stop')
+        frame = message.serialize_compact()
+        self.assertEqual(json.loads(compact_to_json(frame)),
+                         json.loads(message.serialize()))
+
+        # Frames with an empty payload object
+        frame = frame[:compact_type(frame)[1]] + b'{}'
+        self.assertEqual(json.loads(compact_to_json(frame)),
+                         {'type': 'mycroft.stop'})
+        message = Message.deserialize_compact(frame)
+        self.assertEqual(message.data, {})
+        self.assertEqual(Message.deserialize(compact_to_json(frame)).data,
+                         {})
+
+    def test_lazy_message(self):
+        message = Message.deserialize_compact(
+            self.message.serialize_compact())
+        # Unparsed messages are serialized from the frame
+        self.assertIsNotNone(message._frame)
+        self.assertEqual(json.loads(message.serialize()),
+                         json.loads(self.message.serialize()))
+        self.assertIsNotNone(message._frame)
+
+        # Changes are serialized
+        message.context['destination'] = 'skills'
+        self.assertIsNone(message._frame)
+        reparsed = Message.deserialize_compact(message.serialize_compact())
+        self.assertEqual(reparsed.context['destination'], 'skills')
+
+        message = Message.deserialize_compact(
+            self.message.serialize_compact())
+        message.msg_type = 'speak'
+        self.assertEqual(Message.deserialize(message.serialize()).msg_type,
+                         'speak')
+
+    def test_reply(self):
+        message = Message.deserialize_compact(
+            self.message.serialize_compact())
+        reply = message.response({'ok': True})
+        self.assertEqual(reply.msg_type,
+                         'recognizer_loop:utterance.response')
+        self.assertEqual(reply.context, {'source': 'audio'})
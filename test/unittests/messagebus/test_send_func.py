@@ -0,0 +1,155 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import socket
+from unittest import TestCase, mock
+
+from websocket import ABNF, WebSocketConnectionClosedException
+
+from mycroft.messagebus import Message, send_func
+
+WS_CONF = {
+    'websocket': {
+        "host": "testhost",
+        "port": 1337,
+        "route": "/core",
+        "ssl": False
+    }
+}
+
+
+class MockConnection:
+    def __init__(self, fail_after=None):
+        self.sent = []
+        self.fail_after = fail_after
+        self.closed = False
+        # peer is the bus end of the socket, writing a frame per send
+        self.sock, self.peer = socket.socketpair()
+        self.timeout = None
+
+    def send(self, data):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise WebSocketConnectionClosedException()
+        self.sent.append(Message.deserialize(data))
+
+    def recv_data_frame(self, control_frame=False):
+        data = self.sock.recv(1024)
+        if not data:
+            raise WebSocketConnectionClosedException()
+        if data == b'close':
+            return ABNF.OPCODE_CLOSE, None
+        return ABNF.OPCODE_TEXT, data
+
+    def gettimeout(self):
+        return self.timeout
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.peer.close()
+
+
+@mock.patch('mycroft.configuration.Configuration.get',
+            return_value=WS_CONF)
+@mock.patch.object(send_func, 'create_connection')
+class TestBusSender(TestCase):
+    def test_reuse_connection(self, mock_create, mock_conf):
+        connection = MockConnection()
+        mock_create.return_value = connection
+        sender = send_func.BusSender()
+        for i in range(3):
+            sender.send(Message('test', {'n': i}))
+
+        mock_create.assert_called_once_with(
+            'ws://testhost:1337/core?subscribe=')
+        self.assertEqual(mock_conf.call_count, 1)
+        self.assertEqual([m.data['n'] for m in connection.sent], [0, 1, 2])
+
+    def test_send_many(self, mock_create, mock_conf):
+        connection = MockConnection()
+        mock_create.return_value = connection
+        sender = send_func.BusSender('ws://bus')
+        sender.send_many(Message('test', {'n': i}) for i in range(100))
+        self.assertEqual(len(connection.sent), 100)
+        sender.close()
+        self.assertTrue(connection.closed)
+        self.assertIsNone(sender.connection)
+
+    def test_reconnect(self, mock_create, mock_conf):
+        """Messages not sent over a closed connection are sent again."""
+        broken = MockConnection(fail_after=2)
+        new = MockConnection()
+        mock_create.side_effect = [broken, new]
+        sender = send_func.BusSender('ws://bus')
+        sender.send_many(Message('test', {'n': i}) for i in range(5))
+        self.assertEqual([m.data['n'] for m in broken.sent], [0, 1])
+        self.assertEqual([m.data['n'] for m in new.sent], [2, 3, 4])
+        self.assertTrue(broken.closed)
+
+    def test_closed_by_bus(self, mock_create, mock_conf):
+        """A connection closed by the bus is reopened before sending."""
+        old = MockConnection()
+        new = MockConnection()
+        mock_create.side_effect = [old, new]
+        sender = send_func.BusSender('ws://bus')
+        sender.send(Message('test', {'n': 0}))
+        old.peer.close()
+        sender.send(Message('test', {'n': 1}))
+        self.assertEqual([m.data['n'] for m in old.sent], [0])
+        self.assertEqual([m.data['n'] for m in new.sent], [1])
+        self.assertTrue(old.closed)
+
+    def test_close_frame(self, mock_create, mock_conf):
+        old = MockConnection()
+        new = MockConnection()
+        mock_create.side_effect = [old, new]
+        sender = send_func.BusSender('ws://bus')
+        sender.send(Message('test', {'n': 0}))
+        old.peer.sendall(b'close')
+        sender.send(Message('test', {'n': 1}))
+        self.assertEqual([m.data['n'] for m in new.sent], [1])
+
+    def test_messages_from_bus(self, mock_create, mock_conf):
+        """Messages sent by the bus are dropped, the connection is kept."""
+        connection = MockConnection()
+        mock_create.return_value = connection
+        sender = send_func.BusSender('ws://bus')
+        sender.send(Message('test', {'n': 0}))
+        connection.peer.sendall(Message('connected').serialize().encode())
+        sender.send(Message('test', {'n': 1}))
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual([m.data['n'] for m in connection.sent], [0, 1])
+        self.assertIsNone(connection.timeout)
+
+    def test_connection_refused(self, mock_create, mock_conf):
+        mock_create.side_effect = ConnectionRefusedError
+        sender = send_func.BusSender('ws://bus')
+        with self.assertRaises(ConnectionRefusedError):
+            sender.send(Message('test'))
+        self.assertEqual(mock_create.call_count, 2)
+
+    def test_send_functions(self, mock_create, mock_conf):
+        connection = MockConnection()
+        mock_create.return_value = connection
+        with mock.patch.object(send_func, '_sender', None), \
+                mock.patch.object(send_func, 'atexit'):
+            send_func.send('speak', {'utterance': 'hello'})
+            send_func.send_many([('speak', {'utterance': 'a'}),
+                                 Message('speak', {'utterance': 'b'})])
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual([m.data['utterance'] for m in connection.sent],
+                         ['hello', 'a', 'b'])
@@ -0,0 +1,148 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Timer
+from unittest import TestCase
+
+from mycroft.messagebus import Message
+from mycroft.messagebus.traffic import (
+    FILE_MAGIC,
+    Recorder,
+    Replayer,
+    TrafficWriter,
+    read_traffic,
+    replay_traffic,
+    utterance_storm
+)
+
+
+class FakeBus:
+    """Bus replying to utterances, except the ones containing "drop"."""
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.handlers = {}
+        self.sent = []
+
+    def on(self, msg_type, handler):
+        self.handlers.setdefault(msg_type, []).append(handler)
+
+    def remove(self, msg_type, handler):
+        self.handlers[msg_type].remove(handler)
+
+    def receive(self, message):
+        for handler in self.handlers.get('message', []):
+            handler(message.serialize())
+        for handler in self.handlers.get(message.msg_type, []):
+            handler(message)
+
+    def emit(self, message):
+        self.sent.append((time.monotonic(), message))
+        if 'drop' not in message.data['utterances'][0]:
+            reply = message.reply('mycroft.skill.handler.complete')
+            Timer(self.delay, self.receive, [reply]).start()
+
+
+class TestTrafficFile(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = join(self.directory, 'traffic.bus')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_write_read(self):
+        writer = TrafficWriter(self.path)
+        writer.write(Message('speak', {'utterance': 'hi'}, {'a': 1}), 0.5)
+        writer.write(Message('mycroft.stop'), 1.25)
+        writer.close()
+
+        records = list(read_traffic(self.path))
+        self.assertEqual([offset for offset, _ in records], [0.5, 1.25])
+        self.assertEqual(records[0][1].msg_type, 'speak')
+        self.assertEqual(records[0][1].data, {'utterance': 'hi'})
+        self.assertEqual(records[0][1].context, {'a': 1})
+        self.assertEqual(records[1][1].msg_type, 'mycroft.stop')
+
+    def test_truncated_file(self):
+        writer = TrafficWriter(self.path)
+        writer.write(Message('speak'), 0)
+        writer.write(Message('speak'), 1)
+        writer.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(f.seek(0, 2) - 3)
+        self.assertEqual(len(list(read_traffic(self.path))), 1)
+
+    def test_not_traffic_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"type": "speak"}\n')
+        with self.assertRaises(ValueError):
+            list(read_traffic(self.path))
+
+    def test_record_and_replay_types(self):
+        bus = FakeBus()
+        recorder = Recorder(bus, self.path, ['recognizer_loop:*', 'speak'])
+        bus.receive(Message('recognizer_loop:utterance',
+                            {'utterances': ['hello']}, {'replay_id': 'x'}))
+        bus.receive(Message('mycroft.skill.handler.complete'))
+        bus.receive(Message('speak', {'utterance': 'hi'}))
+        recorder.close()
+
+        with open(self.path, 'rb') as f:
+            self.assertTrue(f.read().startswith(FILE_MAGIC))
+        self.assertEqual([m.msg_type for _, m in read_traffic(self.path)],
+                         ['recognizer_loop:utterance', 'speak'])
+        replayed = list(replay_traffic(self.path))
+        self.assertEqual(len(replayed), 1)
+        self.assertNotIn('replay_id', replayed[0][1].context)
+
+
+class TestReplayer(TestCase):
+    def test_replies_and_dropped(self):
+        bus = FakeBus()
+        replayer = Replayer(bus, timeout=0.5)
+        report = replayer.run(utterance_storm(['hello', 'drop this'], 10))
+        self.assertEqual(report['sent'], 10)
+        self.assertEqual(report['replies'], 5)
+        self.assertEqual(report['dropped'], 5)
+        self.assertGreaterEqual(report['p50'], 10)
+        self.assertGreaterEqual(report['max'], report['p95'])
+
+    def test_speed(self):
+        traffic = [(10.0 + i * 0.05, Message('recognizer_loop:utterance',
+                                             {'utterances': ['hello']}))
+                   for i in range(5)]
+
+        bus = FakeBus()
+        Replayer(bus).run(traffic, speed=1.0)
+        elapsed = bus.sent[-1][0] - bus.sent[0][0]
+        self.assertGreaterEqual(elapsed, 0.19)
+
+        bus = FakeBus()
+        Replayer(bus).run(traffic, speed=2.0)
+        elapsed = bus.sent[-1][0] - bus.sent[0][0]
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.19)
+
+        bus = FakeBus()
+        Replayer(bus).run(traffic, speed=0)
+        elapsed = bus.sent[-1][0] - bus.sent[0][0]
+        self.assertLess(elapsed, 0.05)
+
+    def test_storm_rate(self):
+        offsets = [offset for offset, _ in utterance_storm(['a'], 4, 20)]
+        self.assertEqual(offsets, [0, 0.05, 0.1, 0.15])
@@ -0,0 +1,136 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, mock
+
+from mycroft.messagebus import Message
+from mycroft.metrics import tracing
+from mycroft.metrics.tracing import (
+    BUCKETS,
+    Span,
+    Tracer,
+    histograms,
+    read_spans
+)
+
+
+def transmit(message, sender, receiver, service=None):
+    """Send a message between two tracers like the bus would."""
+    sender.on_emit(message)
+    message = Message.deserialize(message.serialize())
+    if service:
+        service.on_route(message)
+    receiver.on_receive(message)
+    return message
+
+
+class TestTracer(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = join(self.directory, 'traces.jsonl')
+        self.speech = Tracer(self.path, process='speech')
+        self.skills = Tracer(self.path, process='skills')
+        self.audio = Tracer(self.path, process='audio')
+        self.service = Tracer(self.path, process='service')
+
+    def tearDown(self):
+        for tracer in (self.speech, self.skills, self.audio, self.service):
+            tracer.close()
+        rmtree(self.directory)
+
+    def interaction(self):
+        utterance = Message('recognizer_loop:utterance',
+                            {'utterances': ['what time is it']},
+                            {'trace': {'id': 'trace-1'}})
+        received = transmit(utterance, self.speech, self.skills,
+                            self.service)
+        time.sleep(0.01)  # Intent matching
+        intent = received.reply('TimeSkill:handle_query_time')
+        received = transmit(intent, self.skills, self.skills, self.service)
+        time.sleep(0.02)  # Skill handler
+        speak = received.reply('speak', {'utterance': "It's noon"})
+        transmit(speak, self.skills, self.audio, self.service)
+
+    def test_spans(self):
+        self.interaction()
+        process_spans = {s.name: s for s in self.skills.spans
+                         if s.kind == 'process'}
+        self.assertEqual(sorted(process_spans), [
+            'TimeSkill:handle_query_time -> speak',
+            'recognizer_loop:utterance -> TimeSkill:handle_query_time'
+        ])
+        handler = process_spans['TimeSkill:handle_query_time -> speak']
+        self.assertGreaterEqual(handler.duration, 0.02)
+
+        self.assertEqual([s.name for s in self.audio.spans], ['speak'])
+        self.assertEqual(self.audio.spans[0].kind, 'bus')
+        self.assertEqual(len(self.service.spans), 3)
+        self.assertTrue(all(s.trace == 'trace-1' for s in
+                            self.skills.spans))
+
+    def test_untraced(self):
+        transmit(Message('speak'), self.skills, self.audio, self.service)
+        self.assertEqual(len(self.audio.spans), 0)
+        self.assertEqual(len(self.service.spans), 0)
+
+    def test_file(self):
+        self.interaction()
+        spans = read_spans(self.path)
+        # 3 routed, 3 received and 2 process spans
+        self.assertEqual(len(spans), 8)
+        self.assertEqual({s.process for s in spans},
+                         {'service', 'skills', 'audio'})
+
+    def test_ring(self):
+        tracer = Tracer(ring_size=2)
+        for i in range(5):
+            tracer.record(Span('t', 'bus', str(i), 0, 1, 'test'))
+        self.assertEqual([s.name for s in tracer.spans], ['3', '4'])
+
+    def test_histograms(self):
+        spans = [Span('t', 'bus', 'speak', 0, d / 1000, 'audio')
+                 for d in (0.5, 3, 3, 40, 4000)]
+        stats = histograms(spans)[('bus', 'speak')]
+        self.assertEqual(stats['count'], 5)
+        self.assertAlmostEqual(stats['p50'], 3)
+        self.assertAlmostEqual(stats['max'], 4000)
+        self.assertEqual(stats['buckets'][BUCKETS.index(1)], 1)
+        self.assertEqual(stats['buckets'][BUCKETS.index(5)], 2)
+        self.assertEqual(stats['buckets'][BUCKETS.index(50)], 1)
+        self.assertEqual(stats['buckets'][BUCKETS.index(5000)], 1)
+
+
+class TestStartTrace(TestCase):
+    def tearDown(self):
+        tracing._tracer = None
+
+    @mock.patch('mycroft.configuration.Configuration.get')
+    def test_disabled(self, mock_get):
+        mock_get.return_value = {'tracing': {'enabled': False}}
+        tracing._tracer = None
+        message = tracing.start_trace(Message('test'))
+        self.assertNotIn('trace', message.context)
+        self.assertIsNone(tracing.get_tracer())
+
+    @mock.patch('mycroft.configuration.Configuration.get')
+    def test_enabled(self, mock_get):
+        mock_get.return_value = {'tracing': {'enabled': True, 'file': None}}
+        tracing._tracer = None
+        message = tracing.start_trace(Message('test'), 'ident')
+        self.assertEqual(message.context['trace'], {'id': 'ident'})
+        self.assertIsInstance(tracing.get_tracer(), Tracer)
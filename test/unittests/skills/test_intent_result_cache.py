@@ -0,0 +1,69 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, mock
+
+from mycroft.skills.intent_result_cache import IntentResultCache
+
+
+class TestIntentResultCache(TestCase):
+    def test_get(self):
+        cache = IntentResultCache()
+        compute = mock.Mock(return_value={'intent_type': 'stop'})
+        key = cache.key('adapt', ('stop',), 'en-us')
+        self.assertEqual(cache.get(key, compute), {'intent_type': 'stop'})
+        # Matches are copied in and out
+        compute.return_value['utterance'] = 'stop'
+        match = cache.get(key, compute)
+        self.assertEqual(match, {'intent_type': 'stop'})
+        match['utterance'] = 'stop'
+        self.assertEqual(cache.get(key, compute), {'intent_type': 'stop'})
+        self.assertEqual(compute.call_count, 1)
+
+        # No match is cached too
+        key = cache.key('padatious', 'hello', 'en-us')
+        self.assertEqual(cache.lookup(key), (False, None))
+        cache.put(key, None)
+        self.assertEqual(cache.lookup(key), (True, None))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 2))
+        self.assertEqual(stats['hit_rate'], 0.6)
+
+    def test_invalidate(self):
+        cache = IntentResultCache()
+        key = cache.key('adapt', ('stop',), 'en-us')
+        cache.put(key, 'old')
+        cache.invalidate()
+        self.assertEqual(cache.lookup(key), (False, None))
+        # A match computed before the invalidation isn't kept
+        cache.put(key, 'old')
+        self.assertEqual(cache.stats()['size'], 0)
+        new_key = cache.key('adapt', ('stop',), 'en-us')
+        self.assertNotEqual(new_key, key)
+        self.assertEqual(cache.get(new_key, lambda: 'new'), 'new')
+
+    def test_size_limit(self):
+        cache = IntentResultCache(max_size=2)
+        keys = [cache.key('adapt', (utt,), 'en-us')
+                for utt in ('a', 'b', 'c')]
+        cache.put(keys[0], 'a')
+        cache.put(keys[1], 'b')
+        cache.lookup(keys[0])
+        cache.put(keys[2], 'c')
+        self.assertEqual(list(cache.entries), [keys[0], keys[2]])
+
+        disabled = IntentResultCache(max_size=0)
+        disabled.put(keys[0], 'a')
+        self.assertEqual(disabled.lookup(keys[0]), (False, None))
@@ -12,9 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import contextlib
+import time
 import unittest
+from threading import Timer
+from unittest import mock
 
-from mycroft.skills.intent_service import ContextManager
+from adapt.intent import IntentBuilder
+
+from mycroft.messagebus import Message
+from mycroft.skills.intent_service import ContextManager, IntentService
+from mycroft.skills.intent_service_interface import IntentServiceInterface
 
 
 class MockEmitter(object):
@@ -68,5 +76,211 @@ class ContextManagerTest(unittest.TestCase):
         self.assertEqual(len(self.context_manager.frame_stack), 0)
 
 
+class ConverseBus:
+    """Bus answering converse requests like the skill manager would.
+
+    Arguments:
+        skills (dict): skill_id -> (delay, result), a result of None means
+                       the skill never responds
+    """
+    def __init__(self, skills):
+        self.skills = skills
+        self.handlers = {}
+        self.requests = []
+
+    def on(self, msg_type, handler):
+        self.handlers[msg_type] = handler
+
+    def emit(self, message):
+        if message.msg_type != 'skill.converse.request':
+            return
+        skill_id = message.data['skill_id']
+        self.requests.append(skill_id)
+        delay, result = self.skills[skill_id]
+        if result is None:
+            return
+        if result == 'missing':
+            reply = message.reply('skill.converse.error',
+                                  {'skill_id': skill_id,
+                                   'error': 'skill id does not exist'})
+        else:
+            reply = message.reply('skill.converse.response',
+                                  {'skill_id': skill_id, 'result': result})
+        Timer(delay, self.handlers[reply.msg_type], (reply,)).start()
+
+
+@mock.patch('mycroft.skills.intent_service.send_converse_metrics')
+class ConverseTest(unittest.TestCase):
+    def create_service(self, skills):
+        self.bus = ConverseBus(skills)
+        service = IntentService(self.bus)
+        service.converse_response_timeout = 0.5
+        for skill_id in reversed(list(skills)):
+            service.add_active_skill(skill_id)
+        return service
+
+    def test_priority(self, _):
+        service = self.create_service({'a': (0.05, False),
+                                       'b': (0.1, True),
+                                       'c': (0.01, True)})
+        start = time.monotonic()
+        self.assertTrue(service._converse(['hello'], 'en-us'))
+        self.assertLess(time.monotonic() - start, 0.3)
+        # c is never asked, its converse() could act on the utterance
+        self.assertEqual(self.bus.requests, ['a', 'b'])
+        self.assertEqual(service.active_skills[0][0], 'b')
+
+    def test_reset_notifies_all(self, _):
+        service = self.create_service({'a': (0.01, True),
+                                       'b': (0.01, True)})
+        service.reset_converse(Message('mycroft.speech.recognition.unknown'))
+        self.assertEqual(self.bus.requests, ['a', 'b'])
+
+    def test_wakes_on_response(self, _):
+        service = self.create_service({'a': (0.01, True)})
+        start = time.monotonic()
+        self.assertEqual(service.converse(['a'], ['hello'], 'en-us'), 'a')
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertLess(service.converse_latencies['a'], 0.1)
+
+    def test_declined(self, _):
+        service = self.create_service({'a': (0.01, False),
+                                       'b': (0.02, False)})
+        self.assertFalse(service._converse(['hello'], 'en-us'))
+
+    def test_timeout(self, _):
+        service = self.create_service({'a': (0, None), 'b': (0.01, True)})
+        start = time.monotonic()
+        # a doesn't respond in time and is considered to have declined
+        self.assertEqual(service.converse(['a', 'b'], ['hello'], 'en-us'),
+                         'b')
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+        self.assertNotIn('a', service.converse_latencies)
+
+    def test_missing_skill(self, _):
+        service = self.create_service({'a': (0.01, 'missing'),
+                                       'b': (0.01, True)})
+        self.assertEqual(service.converse(['a', 'b'], ['hello'], 'en-us'),
+                         'b')
+        self.assertEqual([s[0] for s in service.active_skills], ['b'])
+
+    def test_metrics(self, mock_send_metrics):
+        service = self.create_service({'a': (0.01, False)})
+        message = Message('recognizer_loop:utterance', context={'ident': 1})
+        service._converse(['hello'], 'en-us', message)
+        request, ident = mock_send_metrics.call_args[0]
+        self.assertEqual(ident, 1)
+        self.assertEqual(list(request.latencies), ['a'])
+
+
+class BulkRegistrationTest(unittest.TestCase):
+    def register(self, bulk):
+        """Register a skill's vocabulary and intent, in bulk or not."""
+        bus = ConverseBus({})
+        service = IntentService(bus)
+        interface = IntentServiceInterface(bus)
+        bus.emit = lambda message: bus.handlers[message.msg_type](message)
+
+        with interface.batch() if bulk else contextlib.suppress():
+            interface.register_adapt_keyword('skillWeather', 'weather',
+                                             ['forecast'])
+            interface.register_adapt_keyword('skillWeather', 'rain')
+            interface.register_adapt_regex('in (?P<skillLocation>.*)')
+            interface.register_adapt_intent(
+                'skill:weather', IntentBuilder('skill:weather')
+                .require('skillWeather').optionally('skillLocation').build())
+        return service
+
+    def test_same_result_as_single_messages(self):
+        for utterance in ('weather in paris', 'what is the forecast',
+                          'will it rain'):
+            single = self.register(False)._adapt_intent_match(
+                [utterance], [utterance], 'en-us')
+            bulk = self.register(True)._adapt_intent_match(
+                [utterance], [utterance], 'en-us')
+            self.assertEqual(bulk['intent_type'], 'skill:weather')
+            self.assertEqual(bulk, single)
+
+
+class ReloadVocabTest(unittest.TestCase):
+    def setUp(self):
+        bus = ConverseBus({})
+        self.service = IntentService(bus)
+        self.register = bus.handlers['register_vocab.bulk']
+
+    @staticmethod
+    def bulk(skill_id, words):
+        vocab_type = skill_id + 'Word'
+        return Message('register_vocab.bulk', {
+            'skill_id': skill_id,
+            'vocab': [{'start': word, 'end': vocab_type} for word in words],
+            'regex': ['with (?P<{}Name>.*)'.format(skill_id)],
+            'intents': [IntentBuilder(skill_id + ':intent')
+                        .require(vocab_type).build().__dict__]})
+
+    def match(self, utterance):
+        intent = self.service._adapt_intent_match([utterance], [utterance],
+                                                  'en-us')
+        return intent['intent_type'] if intent else None
+
+    def test_same_vocab(self):
+        self.register(self.bulk('a', ['apple']))
+        self.service.handle_detach_skill(Message('detach_skill',
+                                                 {'skill_id': 'a:'}))
+        with mock.patch.object(self.service, '_add_vocab') as add_vocab:
+            self.register(self.bulk('a', ['apple']))
+            add_vocab.assert_not_called()
+        self.assertEqual(self.match('apple'), 'a:intent')
+
+    def test_changed_vocab(self):
+        self.register(self.bulk('a', ['apple']))
+        self.register(self.bulk('b', ['banana']))
+        self.register(self.bulk('a', ['apricot']))
+        self.assertEqual(self.match('apricot'), 'a:intent')
+        self.assertEqual(list(self.service.engine.trie.lookup('apple')), [])
+        self.assertEqual(self.match('banana'), 'b:intent')
+        self.assertEqual(len(self.service.engine.regular_expressions_entities),
+                         2)
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        bus = ConverseBus({})
+        self.service = IntentService(bus)
+        bus.handlers['register_vocab.bulk'](ReloadVocabTest.bulk('a',
+                                                                 ['apple']))
+
+    def match(self, utterance):
+        intent = self.service._cached_adapt_intent_match(
+            [utterance], [utterance], 'en-us')
+        return intent['intent_type'] if intent else None
+
+    def test_cached_until_changed(self):
+        with mock.patch.object(self.service, '_adapt_intent_match',
+                               wraps=self.service._adapt_intent_match) as \
+                adapt_match:
+            self.assertEqual(self.match('apple'), 'a:intent')
+            self.assertEqual(self.match('apple'), 'a:intent')
+            self.assertEqual(adapt_match.call_count, 1)
+
+            self.service.handle_detach_skill(Message('detach_skill',
+                                                     {'skill_id': 'a:'}))
+            self.assertIsNone(self.match('apple'))
+            self.assertEqual(adapt_match.call_count, 2)
+
+    def test_not_cached_with_context(self):
+        self.service.handle_add_context(Message('add_context',
+                                                {'context': 'aWord',
+                                                 'word': 'apple'}))
+        self.match('apple')
+        self.match('apple')
+        stats = self.service.result_cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 0)
+
+        self.service.handle_clear_context(Message('clear_context'))
+        self.match('apple')
+        self.assertEqual(self.service.result_cache.stats()['size'], 1)
+
+
 if __name__ == '__main__':
     unittest.main()
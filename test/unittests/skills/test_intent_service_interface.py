@@ -1,5 +1,7 @@
 import unittest
 
+from adapt.intent import IntentBuilder
+
 from mycroft.skills.intent_service_interface import IntentServiceInterface
 
 
@@ -57,3 +59,30 @@ class FunctionTest(unittest.TestCase):
         intent_service = IntentServiceInterface(self.emitter)
         intent_service.register_adapt_regex('.*')
         self.check_emitter([{'regex': '.*'}])
+
+    def test_batch(self):
+        intent_service = IntentServiceInterface(self.emitter)
+        with intent_service.batch():
+            intent_service.register_adapt_keyword('test_intent', 'test',
+                                                  ['test2'])
+            with intent_service.batch():
+                intent_service.register_adapt_regex('.*')
+            intent_service.register_adapt_intent(
+                'test', IntentBuilder('test').require('test_intent').build())
+            self.assertEqual(self.emitter.get_types(), [])
+
+        self.assertEqual(self.emitter.get_types(), ['register_vocab.bulk'])
+        bulk = self.emitter.get_results()[0]
+        self.assertEqual(bulk['vocab'],
+                         [{'start': 'test', 'end': 'test_intent'},
+                          {'start': 'test2', 'end': 'test_intent',
+                           'alias_of': 'test'}])
+        self.assertEqual(bulk['regex'], ['.*'])
+        self.assertEqual([i['name'] for i in bulk['intents']], ['test'])
+        self.assertIn('test', intent_service)
+
+    def test_empty_batch(self):
+        intent_service = IntentServiceInterface(self.emitter)
+        with intent_service.batch():
+            pass
+        self.assertEqual(self.emitter.get_types(), [])
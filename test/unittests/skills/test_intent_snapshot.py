@@ -0,0 +1,98 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, mock
+
+from mycroft.skills import intent_snapshot
+from mycroft.skills.intent_snapshot import (
+    IntentSnapshot,
+    load_regex_snapshot,
+    load_vocabulary_snapshot,
+    resource_hash
+)
+
+
+class TestIntentSnapshot(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        self.path = join(self.directory, 'snapshot.json')
+        self.vocab_dir = join(self.directory, 'skill', 'vocab', 'en-us')
+        os.makedirs(self.vocab_dir)
+        self.write('Weather.voc', '(weather|forecast)\nrain\n')
+        self.write('City.rx', '(?P<City>.*) city\n')
+        patcher = mock.patch.object(intent_snapshot, '_snapshot',
+                                    IntentSnapshot(self.path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, name, content):
+        with open(join(self.vocab_dir, name), 'w') as f:
+            f.write(content)
+
+    def test_resource_hash(self):
+        voc_hash = resource_hash(self.vocab_dir, '.voc')
+        rx_hash = resource_hash(self.vocab_dir, '.rx')
+        self.write('Other.rx', 'other')
+        self.assertEqual(resource_hash(self.vocab_dir, '.voc'), voc_hash)
+        self.assertNotEqual(resource_hash(self.vocab_dir, '.rx'), rx_hash)
+        self.write('Weather.voc', 'weather\n')
+        self.assertNotEqual(resource_hash(self.vocab_dir, '.voc'), voc_hash)
+
+    def test_reuse_until_changed(self):
+        vocab = load_vocabulary_snapshot(self.vocab_dir, 'A')
+        self.assertEqual(vocab, {'AWeather': [['forecast', 'weather'],
+                                              ['rain']]})
+        regex = load_regex_snapshot(self.vocab_dir, 'A')
+        self.assertEqual(regex, ['(?P<ACity>.*) city'])
+        intent_snapshot._snapshot.save()
+
+        # A new process only parses changed files
+        with mock.patch.object(intent_snapshot, '_snapshot',
+                               IntentSnapshot(self.path)), \
+                mock.patch.object(intent_snapshot,
+                                  'load_vocabulary') as load_vocabulary:
+            self.assertEqual(load_vocabulary_snapshot(self.vocab_dir, 'A'),
+                             vocab)
+            load_vocabulary.assert_not_called()
+
+            self.write('Weather.voc', 'sunshine\n')
+            load_vocabulary.return_value = {'AWeather': [['sunshine']]}
+            self.assertEqual(load_vocabulary_snapshot(self.vocab_dir, 'A'),
+                             {'AWeather': [['sunshine']]})
+            load_vocabulary.assert_called_once_with(self.vocab_dir, 'A')
+
+    def test_save_drops_unused(self):
+        load_vocabulary_snapshot(self.vocab_dir, 'A')
+        load_vocabulary_snapshot(self.vocab_dir, 'B')
+        intent_snapshot._snapshot.save()
+
+        snapshot = IntentSnapshot(self.path)
+        self.assertEqual(len(snapshot.entries), 2)
+        snapshot.get('vocab:A:{}'.format(self.vocab_dir),
+                     resource_hash(self.vocab_dir, '.voc'), None)
+        snapshot.save()
+        self.assertEqual(list(IntentSnapshot(self.path).entries),
+                         ['vocab:A:{}'.format(self.vocab_dir)])
+
+    def test_broken_snapshot(self):
+        with open(self.path, 'w') as f:
+            f.write('{"version": 1, "entr')
+        snapshot = IntentSnapshot(self.path)
+        self.assertEqual(snapshot.entries, {})
+        self.assertEqual(snapshot.get('key', 'hash', lambda: [1]), [1])
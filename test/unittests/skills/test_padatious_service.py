@@ -0,0 +1,207 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+from unittest import TestCase, mock
+
+from mycroft.messagebus import Message
+from mycroft.skills.core import FallbackSkill
+from mycroft.skills.intent_result_cache import IntentResultCache
+from mycroft.skills.padatious_service import PadatiousService
+from mycroft.skills.padatious_worker import WorkerError
+
+
+class MatchData:
+    def __init__(self, name, conf):
+        self.name = name
+        self.conf = conf
+        self.matches = {}
+
+
+class FakeContainer:
+    """IntentContainer matching the utterances listed in intent files."""
+    instances = []
+    train_started = None
+    train_continue = None
+
+    def __init__(self, cache_dir):
+        self.intents = {}
+        self.trained = False
+        FakeContainer.instances.append(self)
+
+    def load_entity(self, name, file_name):
+        pass
+
+    def load_intent(self, name, file_name):
+        with open(file_name) as f:
+            self.intents[name] = f.read().split('\n')
+
+    def train(self, single_thread=False):
+        if FakeContainer.train_started:
+            FakeContainer.train_started.set()
+            FakeContainer.train_continue.wait(5)
+        self.trained = True
+
+    def calc_intents(self, utt):
+        assert self.trained
+        return [MatchData(name, 1.0 if utt in lines else 0.1)
+                for name, lines in self.intents.items()]
+
+
+class TestPadatiousService(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        FakeContainer.instances = []
+        FakeContainer.train_started = None
+        config = {'padatious': {'intent_cache': self.directory,
+                                'train_delay': 0.01}}
+        for patcher in (mock.patch('padatious.IntentContainer',
+                                   FakeContainer),
+                        mock.patch('mycroft.configuration.Configuration.get',
+                                   return_value=config),
+                        mock.patch('mycroft.skills.padatious_service.'
+                                   'report_timing'),
+                        mock.patch.object(FallbackSkill, 'fallback_handlers',
+                                          {}),
+                        mock.patch.object(PadatiousService, 'instance')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.bus = mock.Mock()
+        self.cache = IntentResultCache()
+        self.service = PadatiousService(self.bus,
+                                        mock.Mock(result_cache=self.cache))
+        # The tests train explicitly instead of after the delay
+        self.service.train_delay = 60
+        self.addCleanup(self.cancel_training)
+
+    def cancel_training(self):
+        if self.service.train_timer:
+            self.service.train_timer.cancel()
+
+    def register(self, name, *lines):
+        file_name = join(self.directory, name.replace(':', '_'))
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(lines))
+        self.service.register_intent(Message('padatious:register_intent',
+                                             {'name': name,
+                                              'file_name': file_name}))
+
+    def test_train_only_when_changed(self):
+        self.register('skill:time.intent', 'what time is it')
+        self.register('skill:date.intent', 'what day is it')
+        self.service.train(Message('mycroft.skills.initialized'))
+        self.assertEqual(len(FakeContainer.instances), 1)
+        self.assertEqual(self.service.calc_intent('what time is it').name,
+                         'skill:time.intent')
+        self.assertEqual(self.service.stats['retrained'], 2)
+
+        # Reloading the skill without changes keeps the container
+        self.service.handle_detach_skill(Message('detach_skill',
+                                                 {'skill_id': 'skill:'}))
+        self.register('skill:time.intent', 'what time is it')
+        self.register('skill:date.intent', 'what day is it')
+        self.service.train()
+        self.assertEqual(len(FakeContainer.instances), 1)
+
+        self.register('skill:date.intent', 'what is the date')
+        self.service.train()
+        self.assertEqual(len(FakeContainer.instances), 2)
+        self.assertEqual(self.service.stats['retrained'], 1)
+        self.assertEqual(self.service.stats['trainings'], 2)
+
+    def test_previous_model_answers_during_training(self):
+        self.register('skill:time.intent', 'what time is it')
+        self.service.train()
+
+        FakeContainer.train_started = Event()
+        FakeContainer.train_continue = Event()
+        self.register('skill:time.intent', 'tell me the time')
+        training = Thread(target=self.service.train)
+        training.start()
+        self.assertTrue(FakeContainer.train_started.wait(5))
+
+        message = Message('intent_failure', {'utterance': 'what time is it'})
+        self.assertTrue(self.service.handle_fallback(message))
+        self.assertEqual(self.bus.emit.call_args[0][0].msg_type,
+                         'skill:time.intent')
+
+        FakeContainer.train_continue.set()
+        training.join(5)
+        self.assertEqual(self.service.calc_intent('tell me the time').conf,
+                         1.0)
+        self.assertEqual(self.service.stats['unanswered'], 0)
+        self.assertEqual(self.service.stats['blackouts'], 1)
+
+    def test_detached_intent_not_matched(self):
+        self.register('skill:time.intent', 'what time is it')
+        self.register('other:clock.intent', 'what time is it', 'clock')
+        self.service.train()
+        self.assertEqual(self.service.calc_intent('what time is it').name,
+                         'skill:time.intent')
+        self.service.handle_detach_intent(Message(
+            'detach_intent', {'intent_name': 'skill:time.intent'}))
+        self.assertEqual(self.service.calc_intent('what time is it').name,
+                         'other:clock.intent')
+
+    def test_result_cache(self):
+        self.register('skill:time.intent', 'what time is it')
+        self.service.train()
+        container = FakeContainer.instances[0]
+        with mock.patch.object(container, 'calc_intents',
+                               wraps=container.calc_intents) as calc_intents:
+            matches = self.service.calc_intent_batch(['what time is it',
+                                                      'stop'])
+            self.assertEqual([m.conf for m in matches], [1.0, 0.1])
+            # The fallback modifies the match it handles
+            matches[0].matches['utterance'] = 'what time is it'
+            match = self.service.calc_intent('what time is it')
+            self.assertEqual(match.matches, {})
+            self.assertEqual(calc_intents.call_count, 2)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        self.register('skill:time.intent', 'tell me the time')
+        self.service.train()
+        self.assertEqual(self.service.calc_intent('what time is it').conf,
+                         0.1)
+
+    def test_failures_not_cached(self):
+        self.assertIsNone(self.service.calc_intent('what time is it'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+        self.register('skill:time.intent', 'what time is it')
+        self.service.train()
+        pool = mock.Mock()
+        pool.best_matches.side_effect = [WorkerError('Worker is gone'),
+                                         [MatchData('skill:time.intent',
+                                                    1.0)]]
+        self.service.pool = self.service.container = pool
+        with mock.patch('mycroft.skills.padatious_service.LOG'):
+            self.assertIsNone(self.service.calc_intent('what time is it'))
+        # The pool recovered
+        self.assertEqual(self.service.calc_intent('what time is it').conf,
+                         1.0)
+        self.assertEqual(pool.best_matches.call_count, 2)
+
+    def test_blackout_stats(self):
+        message = Message('intent_failure', {'utterance': 'what time is it'})
+        self.assertFalse(self.service.handle_fallback(message))
+        self.service.handle_stats(Message('padatious:stats'))
+        stats = self.bus.emit.call_args[0][0].data
+        self.assertEqual(stats['unanswered'], 1)
+        self.assertGreater(stats['blackout'], 0.0)
+        self.assertEqual(stats['trainings'], 0)
@@ -0,0 +1,140 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import time
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from unittest import TestCase
+
+from mycroft.skills.padatious_worker import PadatiousPool, WorkerError
+
+
+class MatchData:
+    def __init__(self, name, conf):
+        self.name = name
+        self.conf = conf
+        self.matches = {'pid': str(os.getpid())}
+
+
+class FakeContainer:
+    """IntentContainer "training" by copying the intent files to the cache.
+
+    The workers only see the lines of the cached copies.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.intents = {}
+
+    def load_entity(self, name, file_name):
+        pass
+
+    def load_intent(self, name, file_name):
+        if name == 'slow':
+            time.sleep(1)
+        cached = join(self.cache_dir, name)
+        if not os.path.isfile(cached):
+            with open(file_name) as f, open(cached, 'w') as g:
+                g.write(f.read())
+        with open(cached) as f:
+            self.intents[name] = f.read().split('\n')
+
+    def train(self, single_thread=False):
+        if 'fail' in self.intents:
+            raise ValueError('Broken intent')
+
+    def calc_intents(self, utt):
+        return [MatchData(name, 1.0 if utt in lines else 0.1)
+                for name, lines in self.intents.items()]
+
+
+class TestPadatiousPool(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = mkdtemp()
+        cls.pool = PadatiousPool(cls.directory, 2, FakeContainer)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.stop()
+        rmtree(cls.directory)
+
+    def intent_file(self, name, *lines):
+        file_name = join(self.directory, name + '.intent')
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(lines))
+        return file_name
+
+    def test_batch(self):
+        self.pool.train({'time': self.intent_file('time', 'what time is it'),
+                         'day': self.intent_file('day', 'what day is it')},
+                        {})
+        utterances = ['what time is it', 'what day is it', 'hello',
+                      'what time is it']
+        matches = self.pool.best_matches(utterances)
+        self.assertEqual([match.conf for match in matches],
+                         [1.0, 1.0, 0.1, 1.0])
+        self.assertEqual(matches[0].name, 'time')
+        self.assertEqual(matches[1].name, 'day')
+        # The batch is split between the worker processes
+        self.assertEqual(len({match.matches['pid'] for match in matches}), 2)
+
+        matches = self.pool.best_matches(['what time is it'], {'time'})
+        self.assertEqual(matches[0].name, 'day')
+        self.assertEqual(self.pool.best_matches([]), [])
+
+    def test_failed_training(self):
+        self.pool.train({'stop': self.intent_file('stop', 'stop')}, {})
+        with self.assertRaises(WorkerError):
+            self.pool.train({'fail': self.intent_file('fail', 'fail')}, {})
+        self.assertEqual(self.pool.best_matches(['stop'])[0].name, 'stop')
+
+    def test_queries_during_reload(self):
+        self.pool.train({'stop': self.intent_file('stop', 'stop')}, {})
+        training = Thread(target=self.pool.train,
+                          args=({'stop': self.intent_file('stop', 'stop'),
+                                 'slow': self.intent_file('slow', 'slow')},
+                                {}))
+        training.start()
+        latencies = []
+        while training.is_alive():
+            start = time.monotonic()
+            self.assertEqual(self.pool.best_matches(['stop'])[0].name,
+                             'stop')
+            latencies.append(time.monotonic() - start)
+        training.join()
+        # The workers answer while the new container is loaded
+        self.assertLess(max(latencies), 0.5)
+        self.assertEqual(self.pool.best_matches(['slow'])[0].name, 'slow')
+
+    def test_respawn(self):
+        self.pool.train({'stop': self.intent_file('stop', 'stop')}, {})
+        respawned = self.pool.respawned
+        dead = self.pool.workers[0].process
+        dead.terminate()
+        dead.join()
+        matches = self.pool.best_matches(['stop', 'stop'])
+        self.assertEqual([match.name for match in matches], ['stop'] * 2)
+        self.assertEqual(self.pool.respawned, respawned + 1)
+        self.assertIsNot(self.pool.workers[0].process, dead)
+
+    def test_stopped(self):
+        pool = PadatiousPool(self.directory, 1, FakeContainer)
+        pool.stop()
+        with self.assertRaises(WorkerError):
+            pool.best_matches(['stop'])
+        with self.assertRaises(WorkerError):
+            pool.train({'stop': self.intent_file('stop', 'stop')}, {})
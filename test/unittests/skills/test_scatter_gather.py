@@ -0,0 +1,147 @@
+# Copyright 2020 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from queue import Queue
+from threading import Timer
+from unittest import TestCase
+
+from mycroft.messagebus import Message
+from mycroft.skills.scatter_gather import ScatterGatherService
+
+
+class QueryBus:
+    """Bus answering play:query like CommonPlaySkills would.
+
+    Arguments:
+        skills (dict): skill_id -> (delay, conf), a conf of None means the
+                       skill can't play the phrase, a delay of None means
+                       the skill never responds
+    """
+    def __init__(self, skills):
+        self.skills = skills
+        self.handlers = {}
+        self.gathered = Queue()
+
+    def on(self, msg_type, handler):
+        self.handlers.setdefault(msg_type, []).append(handler)
+
+    def remove(self, msg_type, handler):
+        self.handlers[msg_type].remove(handler)
+
+    def receive(self, message):
+        for handler in self.handlers.get(message.msg_type, []):
+            handler(message)
+
+    def emit(self, message):
+        if message.msg_type == 'play:query.gather.response':
+            self.gathered.put((time.monotonic(), message))
+        elif message.msg_type == 'play:query':
+            for skill_id, (delay, conf) in self.skills.items():
+                self.answer(message, skill_id, delay, conf)
+        else:
+            self.receive(message)
+
+    def answer(self, message, skill_id, delay, conf):
+        if delay is None:
+            return
+        data = {'phrase': message.data['phrase'], 'skill_id': skill_id}
+        self.receive(message.response(dict(data, searching=True)))
+        if conf is None:
+            result = dict(data, searching=False)
+        else:
+            result = dict(data, conf=conf, callback_data=None)
+        Timer(delay, self.receive, [message.response(result)]).start()
+
+    def register(self):
+        for skill_id in self.skills:
+            self.receive(Message('play:query.register',
+                                 {'skill_id': skill_id}))
+
+    def gather(self, **data):
+        start = time.monotonic()
+        self.receive(Message('play:query.gather',
+                             dict(data, phrase='the beatles')))
+        end, response = self.gathered.get(timeout=5)
+        return end - start, response.data
+
+
+class TestScatterGather(TestCase):
+    def create_service(self, skills, timeout=2.0):
+        bus = QueryBus(skills)
+        service = ScatterGatherService(bus, {'ack_timeout': 0.5,
+                                             'timeout': timeout})
+        bus.register()
+        self.addCleanup(service.shutdown)
+        return bus, service
+
+    def test_all_answered(self):
+        bus, _ = self.create_service({'a': (0.05, 0.6), 'b': (0.1, None),
+                                      'c': (0.01, 0.8)})
+        elapsed, result = bus.gather()
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual([r['skill_id'] for r in result['results']],
+                         ['c', 'a'])
+        self.assertEqual(sorted(result['response_times']), ['a', 'b', 'c'])
+        self.assertGreaterEqual(result['response_times']['b'], 0.1)
+        self.assertEqual(result['missing'], [])
+
+    def test_threshold(self):
+        bus, _ = self.create_service({'a': (0.01, 1.0), 'slow': (1.5, 0.6)})
+        elapsed, result = bus.gather()
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(result['results'][0]['skill_id'], 'a')
+        self.assertEqual(result['missing'], ['slow'])
+
+        elapsed, result = bus.gather(threshold=0.5)
+        self.assertLess(elapsed, 0.5)
+        elapsed, result = bus.gather(threshold=1.1)
+        self.assertGreaterEqual(elapsed, 1.5)
+        self.assertEqual(len(result['results']), 2)
+
+    def test_timeout(self):
+        bus, _ = self.create_service({'a': (0.01, 0.5), 'slow': (3, 0.6)},
+                                     timeout=0.8)
+        elapsed, result = bus.gather()
+        self.assertGreaterEqual(elapsed, 0.8)
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(result['missing'], ['slow'])
+
+    def test_unacknowledged_and_detached(self):
+        bus, service = self.create_service({'a': (0.01, 0.5),
+                                            'gone': (None, None)})
+        elapsed, result = bus.gather()
+        self.assertGreaterEqual(elapsed, 0.5)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(result['missing'], [])
+
+        bus.receive(Message('detach_skill', {'skill_id': 'gone:'}))
+        self.assertEqual(service.responders['play:query'], {'a'})
+        elapsed, _ = bus.gather()
+        self.assertLess(elapsed, 0.5)
+
+    def test_unregistered_skill(self):
+        bus, _ = self.create_service({'a': (0.01, 0.5)})
+        bus.skills['other'] = (0.2, 0.6)
+        elapsed, result = bus.gather()
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertEqual(len(result['results']), 2)
+
+    def test_stats(self):
+        bus, service = self.create_service({'a': (0.01, 0.5)})
+        bus.gather()
+        bus.gather()
+        stats = service.response_times['play:query'].as_dict()
+        self.assertEqual(stats['a']['count'], 2)
+        self.assertGreaterEqual(stats['a']['max'], stats['a']['mean'])
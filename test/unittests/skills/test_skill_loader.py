@@ -35,7 +35,7 @@ class TestSkillLoader(MycroftUnitTestBase):
         self._mock_skill_instance()
         # TODO: un-mock these when they are more testable
         self.loader._load_skill_source = Mock(
-            return_value=Mock()
+            return_value=MagicMock()
         )
         self.loader._check_for_first_run = Mock()
 
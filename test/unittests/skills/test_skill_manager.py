@@ -301,13 +301,16 @@ class TestSkillManager(MycroftUnitTestBase):
         self.skill_dir.joinpath('__init__.py').touch()
         patch_obj = self.mock_package + 'SkillLoader'
         self.skill_manager.skill_loaders = {}
-        with patch(patch_obj, spec=True) as loader_mock:
+        snapshot_patch = self.mock_package + 'get_intent_snapshot'
+        with patch(patch_obj, spec=True) as loader_mock, \
+                patch(snapshot_patch) as snapshot_mock:
             self.skill_manager._load_on_startup()
             loader_mock.return_value.load.assert_called_once_with()
             self.assertEqual(
                 loader_mock.return_value,
                 self.skill_manager.skill_loaders[str(self.skill_dir)]
             )
+            snapshot_mock.return_value.save.assert_called_once_with()
         self.assertListEqual(
             ['mycroft.skills.initialized'],
             self.message_bus_mock.message_types
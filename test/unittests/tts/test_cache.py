@@ -0,0 +1,128 @@
+import os
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from os.path import exists, join
+
+from mycroft.tts.cache import TTSCache, hash_sentence
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.cache = TTSCache(self.directory, 'Mimic', 'ap', 'en-us')
+
+    def tearDown(self):
+        self.cache.close()
+        rmtree(self.directory)
+
+    def add(self, sentence, size=10, phonemes=None, cache=None):
+        cache = cache or self.cache
+        key = hash_sentence(sentence)
+        audio_file = cache.audio_file(key, 'wav')
+        with open(audio_file, 'wb') as f:
+            f.write(b'0' * size)
+        cache.put(key, audio_file, phonemes)
+        return key, audio_file
+
+    def test_get(self):
+        key, audio_file = self.add('hello world', phonemes='HH:0.1 AH:0.2')
+        entry = self.cache.get(key)
+        self.assertEqual(entry.audio_file, audio_file)
+        self.assertEqual(entry.phonemes, 'HH:0.1 AH:0.2')
+        self.assertIsNone(self.cache.get(hash_sentence('not cached')))
+        self.assertEqual(self.cache.stats(), {'entries': 1, 'bytes': 10,
+                                              'hits': 1, 'misses': 1})
+
+    def test_contains(self):
+        key, _ = self.add('hello world')
+        self.assertIn(key, self.cache)
+        self.assertNotIn(hash_sentence('not cached'), self.cache)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_phonemes(self):
+        phonemes = [['hh', '0.1'], ['ah', '0.2']]
+        key, _ = self.add('hello world', phonemes=phonemes)
+        self.assertEqual(self.cache.get_phonemes(key), phonemes)
+        self.cache.set_phonemes(key, 'HH:0.1')
+        self.assertEqual(self.cache.get_phonemes(key), 'HH:0.1')
+        self.assertIsNone(self.cache.get_phonemes(hash_sentence('other')))
+
+    def test_voice_namespace(self):
+        key, _ = self.add('hello world')
+        other = TTSCache(self.directory, 'Mimic', 'slt', 'en-us')
+        self.assertIsNone(other.get(key))
+        self.assertNotEqual(other.audio_file(key, 'wav'),
+                            self.cache.audio_file(key, 'wav'))
+        other.close()
+
+    def test_lru_entry_limit(self):
+        self.cache.max_entries = 2
+        first, first_file = self.add('first')
+        second, _ = self.add('second')
+        self.cache.get(first)
+        self.add('third')
+        # second is least recently used
+        self.assertIn(first, self.cache)
+        self.assertNotIn(second, self.cache)
+        self.assertTrue(exists(first_file))
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+    def test_size_limit(self):
+        self.cache.max_bytes = 25
+        first, first_file = self.add('first')
+        self.add('second')
+        self.add('third')
+        self.assertNotIn(first, self.cache)
+        self.assertFalse(exists(first_file))
+        self.assertEqual(self.cache.stats()['bytes'], 20)
+
+    def test_new_entry_is_kept(self):
+        self.cache.max_bytes = 5
+        key, audio_file = self.add('too large')
+        self.assertIn(key, self.cache)
+        self.assertTrue(exists(audio_file))
+
+    def test_lfu(self):
+        self.cache.policy = 'lfu'
+        self.cache.max_entries = 2
+        first, _ = self.add('first')
+        second, _ = self.add('second')
+        self.cache.get(first)
+        self.cache.get(first)
+        self.cache.get(second)
+        # Used more recently but less frequently
+        self.cache.get(second)
+        self.cache.get(first)
+        self.add('third')
+        self.assertIn(first, self.cache)
+        self.assertNotIn(second, self.cache)
+
+    def test_reopen(self):
+        key, audio_file = self.add('hello', phonemes='HH:0.1')
+        missing, missing_file = self.add('missing')
+        self.cache.close()
+        os.remove(missing_file)
+
+        self.cache = TTSCache(self.directory, 'Mimic', 'ap', 'en-us')
+        self.assertEqual(self.cache.get(key).audio_file, audio_file)
+        self.assertNotIn(missing, self.cache)
+
+    def test_add_file(self):
+        source = join(self.directory, 'source.wav')
+        with open(source, 'wb') as f:
+            f.write(b'RIFF')
+        key = hash_sentence('preloaded')
+        self.cache.add_file(key, source, [['hh', '0.1']])
+        entry = self.cache.get(key)
+        self.assertNotEqual(entry.audio_file, source)
+        with open(entry.audio_file, 'rb') as f:
+            self.assertEqual(f.read(), b'RIFF')
+
+    def test_clear(self):
+        key, audio_file = self.add('hello')
+        self.cache.clear()
+        self.assertNotIn(key, self.cache)
+        self.assertFalse(exists(audio_file))
+        self.assertEqual(self.cache.stats()['entries'], 0)
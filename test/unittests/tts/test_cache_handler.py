@@ -0,0 +1,212 @@
+import base64
+import json
+import os
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+from os.path import exists, join
+
+from mycroft.tts import cache_handler
+from mycroft.tts.cache import TTSCache, hash_sentence
+from mycroft.tts.mimic2_tts import Mimic2
+
+
+class MockTTS:
+    """Minimal TTS writing the sentence as audio."""
+    audio_ext = 'wav'
+
+    def __init__(self, directory, delay=0.01):
+        self.cache = TTSCache(directory, 'MockTTS', 'voice', 'en-us')
+        self.config = {}
+        self.lang = 'en-us'
+        self.delay = delay
+        self.fail = set()
+        self.synthesized = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = Lock()
+
+    def prepare_sentence(self, sentence):
+        return [sentence]
+
+    def cache_key(self, sentence):
+        return hash_sentence(sentence)
+
+    def synthesis_lock(self, key):
+        return Lock()  # Concurrent synthesis
+
+    def get_tts(self, sentence, wav_file):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.running, self.max_running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        if sentence in self.fail:
+            raise IOError('TTS server not reachable')
+        with open(wav_file, 'w') as f:
+            f.write(sentence)
+        self.synthesized.append(sentence)
+        return wav_file, 'phonemes'
+
+
+def write_dialog(directory, name, lines):
+    with open(join(directory, name + '.dialog'), 'w') as f:
+        f.write('\n'.join(lines))
+
+
+class TestReadDialog(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_read_dialog_sentences(self):
+        write_dialog(self.directory, 'test', [
+            '# A comment',
+            '',
+            'I am ready.',
+            '(Hi|Hello) there',
+            'The time is {{time}}',
+            'First sentence. Second sentence?',
+            '<<< LOADING <<<'
+        ])
+        sentences = cache_handler.read_dialog_sentences(
+            join(self.directory, 'test.dialog'))
+        self.assertEqual(sentences, ['I am ready.', 'Hello there',
+                                     'Hi there', 'First sentence.',
+                                     'Second sentence?'])
+
+
+class TestPrewarm(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.dialog_dir = join(self.directory, 'dialog')
+        self.cache_dir = join(self.directory, 'cache')
+        for d in (self.dialog_dir, self.cache_dir):
+            os.makedirs(d)
+        write_dialog(self.dialog_dir, 'first', ['one', 'two', 'three'])
+        write_dialog(self.dialog_dir, 'second', ['four', 'five', 'one'])
+        self.tts = MockTTS(self.cache_dir)
+        self.state = cache_handler.PrewarmState(join(self.directory,
+                                                     'state.json'))
+
+    def tearDown(self):
+        self.tts.cache.close()
+        rmtree(self.directory)
+
+    def test_prewarm(self):
+        stats = cache_handler.prewarm(self.tts, [self.dialog_dir],
+                                      workers=4, state=self.state)
+        self.assertEqual(stats, {'synthesized': 5, 'skipped': 0,
+                                 'failed': 0})
+        self.assertEqual(sorted(self.tts.synthesized),
+                         ['five', 'four', 'one', 'three', 'two'])
+        self.assertIn(hash_sentence('four'), self.tts.cache)
+        self.assertGreater(self.tts.max_running, 1)
+        self.assertLessEqual(self.tts.max_running, 4)
+
+    def test_skip_cached(self):
+        cache_handler.cache_sentence(self.tts, 'one')
+        stats = cache_handler.prewarm(self.tts, [self.dialog_dir],
+                                      workers=2)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(self.tts.synthesized.count('one'), 1)
+
+    def test_resume(self):
+        self.tts.fail = {'five'}
+        stats = cache_handler.prewarm(self.tts, [self.dialog_dir],
+                                      workers=2, state=self.state)
+        self.assertEqual(stats['failed'], 1)
+
+        # Only the dialog file with the failure is processed again
+        self.tts.fail = set()
+        self.tts.synthesized = []
+        state = cache_handler.PrewarmState(self.state.path)
+        self.assertTrue(state.is_done(join(self.dialog_dir, 'first.dialog')))
+        stats = cache_handler.prewarm(self.tts, [self.dialog_dir],
+                                      workers=2, state=state)
+        self.assertEqual(self.tts.synthesized, ['five'])
+        self.assertEqual(stats, {'synthesized': 1, 'skipped': 2,
+                                 'failed': 0})
+
+    def test_cleared_cache(self):
+        cache_handler.prewarm(self.tts, [self.dialog_dir], workers=2,
+                              state=self.state)
+        self.tts.cache.clear()
+        self.tts.synthesized = []
+        state = cache_handler.PrewarmState(self.state.path)
+        stats = cache_handler.prewarm(self.tts, [self.dialog_dir],
+                                      workers=2, state=state)
+        self.assertEqual(stats['synthesized'], 5)
+        self.assertIn(hash_sentence('one'), self.tts.cache)
+
+    def test_preloaded_cache(self):
+        preloaded = join(self.directory, 'preloaded')
+        os.makedirs(preloaded)
+        cache_handler.prewarm(self.tts, [self.dialog_dir], workers=2,
+                              cache_audio_dir=preloaded)
+        key = hash_sentence('one')
+        self.assertTrue(exists(join(preloaded, key + '.wav')))
+
+        # Import into an empty cache
+        imported = join(self.directory, 'imported')
+        os.makedirs(imported)
+        cache = TTSCache(imported, 'MockTTS', 'voice', 'en-us')
+        cache_handler.copy_cache(preloaded, cache)
+        self.assertEqual(cache.stats()['entries'], 5)
+        self.assertEqual(cache.get(key).phonemes, 'phonemes')
+        cache.close()
+
+
+class MockMimic2Handler(BaseHTTPRequestHandler):
+    """Stand-in for the mimic2 api."""
+    def do_GET(self):
+        text = parse_qs(urlparse(self.path).query)['text'][0]
+        time.sleep(0.02)
+        body = json.dumps({
+            'audio_base64': base64.b64encode(text.encode()).decode(),
+            'visimes': [['m', 0.1]]
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPrewarmMimic2(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), MockMimic2Handler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = mkdtemp()
+        write_dialog(self.directory, 'test', ['I am ready.', 'Goodbye.'])
+        url = 'http://127.0.0.1:{}/synthesize?text='.format(
+            self.server.server_port)
+        self.tts = Mimic2('en-us', {'url': url})
+        self.tts.cache.clear()
+
+    def tearDown(self):
+        self.tts.cache.clear()
+        self.tts.playback.stop()
+        self.tts.playback.join()
+        self.server.shutdown()
+        self.server.server_close()
+        rmtree(self.directory)
+
+    def test_prewarm(self):
+        stats = cache_handler.prewarm(self.tts, [self.directory], workers=2)
+        self.assertEqual(stats['synthesized'], 2)
+        entry = self.tts.cache.get(hash_sentence('I am ready.'))
+        with open(entry.audio_file) as f:
+            self.assertEqual(f.read(), 'I am ready.')
+        self.assertEqual(entry.phonemes, [['m', 0.1]])
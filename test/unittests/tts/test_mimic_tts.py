@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from mycroft.tts import mimic_tts
+from mycroft.tts.cache import hash_sentence
+from mycroft.tts.mimic_tts import Mimic
+
+
+def create_mimic(voice, is_subscriber=True):
+    # The cache key only depends on the voice settings
+    tts = Mimic.__new__(Mimic)
+    tts.voice = voice
+    tts.is_subscriber = is_subscriber
+    return tts
+
+
+@mock.patch.object(mimic_tts, 'config', {})
+class TestMimicCacheKey(unittest.TestCase):
+    def test_default_key(self):
+        tts = create_mimic('ap')
+        self.assertEqual(tts.cache_key('hello'), hash_sentence('hello'))
+
+    @mock.patch.object(mimic_tts, 'exists')
+    def test_fallback_voice(self, mock_exists):
+        tts = create_mimic('trinity')
+        mock_exists.return_value = False
+        self.assertEqual(tts.args[2], 'ap')
+        fallback_key = tts.cache_key('hello')
+        self.assertNotEqual(fallback_key, hash_sentence('hello'))
+
+        # Downloaded subscriber voice
+        mock_exists.return_value = True
+        self.assertEqual(tts.args[2], 'trinity')
+        self.assertEqual(tts.cache_key('hello'), hash_sentence('hello'))
+
+    def test_duration_stretch(self):
+        tts = create_mimic('ap')
+        with mock.patch.object(mimic_tts, 'config',
+                               {'duration_stretch': '1.2'}):
+            self.assertIn('duration_stretch=1.2', tts.args)
+            key = tts.cache_key('hello')
+        self.assertNotEqual(key, hash_sentence('hello'))
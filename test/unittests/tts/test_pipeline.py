@@ -0,0 +1,202 @@
+import random
+import time
+import unittest
+from queue import Queue
+from threading import Lock
+from unittest import mock
+
+import mycroft.tts
+from mycroft.tts.pipeline import SynthesisJob, SynthesisPipeline
+
+
+class TestSynthesisPipeline(unittest.TestCase):
+    def setUp(self):
+        self.lock = Lock()
+        self.synthesized = []
+
+    def synthesize(self, job):
+        time.sleep(random.uniform(0, 0.02))
+        with self.lock:
+            self.synthesized.append(job.sentence)
+        job.set_result('wav', job.sentence + '.wav')
+
+    def test_ordered_playback(self):
+        pipeline = SynthesisPipeline(self.synthesize, lookahead=3)
+        jobs = [SynthesisJob(str(i)) for i in range(20)]
+        for job in jobs:
+            pipeline.submit(job)
+
+        played = []
+        for job in jobs:
+            self.assertTrue(job.wait(2))
+            job.release_slot()
+            played.append(job.wav_file)
+        pipeline.shutdown()
+        self.assertEqual(played, [str(i) + '.wav' for i in range(20)])
+
+    def test_lookahead_is_bounded(self):
+        pipeline = SynthesisPipeline(self.synthesize, lookahead=2)
+        jobs = [SynthesisJob(str(i)) for i in range(5)]
+        for job in jobs:
+            pipeline.submit(job)
+        time.sleep(0.2)
+        # Nothing is played, only two jobs may be prepared
+        self.assertEqual(sorted(self.synthesized), ['0', '1'])
+        self.assertFalse(jobs[2].ready)
+
+        # Starting playback of a job lets the next one be synthesized
+        jobs[0].release_slot()
+        self.assertTrue(jobs[2].wait(1))
+        self.assertFalse(jobs[3].wait(0.1))
+        for job in jobs:
+            job.cancel()
+        pipeline.shutdown()
+
+    def test_cancel(self):
+        pipeline = SynthesisPipeline(self.synthesize, lookahead=1)
+        jobs = [SynthesisJob(str(i)) for i in range(4)]
+        for job in jobs:
+            pipeline.submit(job)
+        self.assertTrue(jobs[0].wait(1))
+        for job in jobs:
+            job.cancel()
+        # Cancelled jobs are released immediately
+        self.assertTrue(all(job.wait(0) for job in jobs))
+
+        # The pipeline keeps working after a cancel
+        job = SynthesisJob('after cancel')
+        pipeline.submit(job)
+        self.assertTrue(job.wait(1))
+        self.assertEqual(job.wav_file, 'after cancel.wav')
+        self.assertNotIn('3', self.synthesized)
+        pipeline.shutdown()
+
+    def test_error(self):
+        def fail(job):
+            raise ValueError('synthesis failed')
+
+        pipeline = SynthesisPipeline(fail, lookahead=1)
+        job = SynthesisJob('fail')
+        pipeline.submit(job)
+        self.assertTrue(job.wait(1))
+        self.assertIsInstance(job.error, ValueError)
+        pipeline.shutdown()
+
+    def test_no_lookahead(self):
+        pipeline = SynthesisPipeline(self.synthesize, lookahead=0)
+        job = SynthesisJob('sync')
+        pipeline.submit(job)
+        self.assertTrue(job.ready)
+
+        def fail(job):
+            raise ValueError('synthesis failed')
+        pipeline = SynthesisPipeline(fail, lookahead=0)
+        with self.assertRaises(ValueError):
+            pipeline.submit(SynthesisJob('fail'))
+
+
+class PipelineTestTTS(mycroft.tts.TTS):
+    def __init__(self):
+        super().__init__('en-us', {}, mock.Mock())
+        self.synthesized = []
+
+    def get_tts(self, sentence, wav_file):
+        time.sleep(0.02)
+        self.synthesized.append(sentence)
+        with open(wav_file, 'wb') as f:
+            f.write(b'RIFF')
+        return wav_file, None
+
+
+@mock.patch('mycroft.tts.send_playback_metric', mock.Mock())
+class TestPipelinedPlayback(unittest.TestCase):
+    def setUp(self):
+        self.tts = PipelineTestTTS()
+        self.tts.init(mock.Mock())
+        self.played = Queue()
+        self.tts.playback.play = self.play
+
+    def tearDown(self):
+        self.tts.playback.stop()
+        self.tts.playback.join()
+        self.tts.pipeline.shutdown()
+        self.tts.clear_cache()
+
+    def play(self, job):
+        # Synthesis of the next chunk happens during playback
+        time.sleep(0.05)
+        self.played.put(job.sentence)
+
+    @mock.patch('mycroft.tts.create_signal', mock.Mock())
+    @mock.patch('mycroft.tts.send_first_audio_metric')
+    def test_chunks_played_in_order(self, mock_metric):
+        sentences = ['one', 'two', 'three', 'four']
+        self.tts._preprocess_sentence = lambda s: sentences
+        start = time.monotonic()
+        self.tts.execute('one two three four', 'ident')
+        # execute only queues the chunks
+        self.assertLess(time.monotonic() - start, 0.02)
+
+        played = [self.played.get(timeout=2) for _ in sentences]
+        self.assertEqual(played, sentences)
+        # Synthesis overlaps playback (4 * 0.02 + 4 * 0.05 serially)
+        self.assertLess(time.monotonic() - start, 0.28)
+        self.assertEqual(mock_metric.call_count, 1)
+        self.assertEqual(mock_metric.call_args[0][0].sentence, 'one')
+
+    @mock.patch('mycroft.tts.create_signal', mock.Mock())
+    def test_clear_cancels_synthesis(self):
+        sentences = [str(i) for i in range(10)]
+        self.tts._preprocess_sentence = lambda s: sentences
+        self.tts.execute(' '.join(sentences), 'ident')
+        self.played.get(timeout=1)
+        self.tts.playback.clear()
+        time.sleep(0.2)
+        self.assertLess(len(self.tts.synthesized), len(sentences))
+        self.assertTrue(self.played.qsize() <= 1)
+
+    @mock.patch('mycroft.tts.create_signal', mock.Mock())
+    def test_clear_cancels_current_job(self):
+        self.tts.get_tts = self.slow_get_tts(0.3)
+        self.tts._preprocess_sentence = lambda s: ['one']
+        self.tts.execute('one', 'ident')
+        # Wait for playback to take the job off the queue
+        for _ in range(100):
+            if self.tts.playback.current_job:
+                break
+            time.sleep(0.01)
+        self.tts.playback.clear()
+        time.sleep(0.5)
+        self.assertTrue(self.played.empty())
+
+    @mock.patch('mycroft.tts.create_signal', mock.Mock())
+    def test_synthesis_serialized(self):
+        running = []
+        overlaps = []
+
+        def get_tts(sentence, wav_file):
+            running.append(sentence)
+            overlaps.append(len(running))
+            time.sleep(0.05)
+            with open(wav_file, 'wb') as f:
+                f.write(b'RIFF')
+            running.remove(sentence)
+            return wav_file, None
+
+        self.tts.get_tts = get_tts
+        sentences = ['one', 'one', 'two']
+        self.tts._preprocess_sentence = lambda s: sentences
+        self.tts.execute('one one two', 'ident')
+        played = [self.played.get(timeout=2) for _ in sentences]
+        self.assertEqual(played, sentences)
+        self.assertEqual(max(overlaps), 1)
+        # The repeated chunk was synthesized once
+        self.assertEqual(len(overlaps), 2)
+
+    def slow_get_tts(self, delay):
+        def get_tts(sentence, wav_file):
+            time.sleep(delay)
+            with open(wav_file, 'wb') as f:
+                f.write(b'RIFF')
+            return wav_file, None
+        return get_tts
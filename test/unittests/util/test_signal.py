@@ -12,19 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import tempfile
 import unittest
 from shutil import rmtree
+from unittest.mock import patch
 
 from os.path import exists, isfile, join
 from tempfile import gettempdir
 
 from mycroft.util import create_signal, check_for_signal
+from mycroft.util.signal import FileSignalBackend, MmapSignalBackend
 
 
 class TestSignals(unittest.TestCase):
     def setUp(self):
         if exists(join(gettempdir(), 'mycroft')):
             rmtree(join(gettempdir(), 'mycroft'))
+        backend_patch = patch('mycroft.util.signal.get_signal_backend',
+                              return_value=FileSignalBackend())
+        backend_patch.start()
+        self.addCleanup(backend_patch.stop)
 
     def test_create_signal(self):
         create_signal('test_signal')
@@ -45,5 +52,65 @@ class TestSignals(unittest.TestCase):
                                      'mycroft/ipc/signal/test_signal')))
 
 
+class TestMmapSignals(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(rmtree, self.temp_dir)
+        self.path = join(self.temp_dir, 'signals.mmap')
+        self.backend = MmapSignalBackend(self.path)
+        self.addCleanup(self.backend.close)
+        backend_patch = patch('mycroft.util.signal.get_signal_backend',
+                              return_value=self.backend)
+        backend_patch.start()
+        self.addCleanup(backend_patch.stop)
+
+    def test_check_signal(self):
+        self.assertFalse(check_for_signal('test_signal'))
+        self.assertTrue(create_signal('test_signal'))
+        self.assertTrue(check_for_signal('test_signal'))
+        # Single use signals are consumed
+        self.assertFalse(check_for_signal('test_signal'))
+
+    def test_never_expiring_signal(self):
+        create_signal('test_signal')
+        self.assertTrue(check_for_signal('test_signal', -1))
+        self.assertTrue(check_for_signal('test_signal', -1))
+
+    def test_expiry(self):
+        with patch('mycroft.util.signal.time.time', return_value=100.0):
+            create_signal('test_signal')
+        with patch('mycroft.util.signal.time.time', return_value=101.0):
+            self.assertTrue(check_for_signal('test_signal', 5))
+        with patch('mycroft.util.signal.time.time', return_value=110.0):
+            self.assertFalse(check_for_signal('test_signal', 5))
+        # Expired signals are removed
+        self.assertFalse(check_for_signal('test_signal', -1))
+
+    def test_shared_between_mappings(self):
+        """Separate mappings of the table act like separate processes."""
+        other = MmapSignalBackend(self.path)
+        self.addCleanup(other.close)
+        self.assertFalse(other.check('test_signal'))
+        create_signal('test_signal')
+        self.assertTrue(other.check('test_signal', -1))
+        self.assertTrue(other.check('test_signal'))
+        self.assertFalse(check_for_signal('test_signal'))
+
+    def test_table_full_falls_back_to_files(self):
+        for i in range(MmapSignalBackend.NUM_SLOTS):
+            self.assertTrue(self.backend.create('signal{}'.format(i)))
+        self.assertFalse(self.backend.accepts('one_too_many'))
+        with patch('mycroft.util.signal._file_backend') as file_backend:
+            create_signal('one_too_many')
+            file_backend.create.assert_called_with('one_too_many')
+
+    def test_invalid_table(self):
+        invalid_path = join(self.temp_dir, 'invalid')
+        with open(invalid_path, 'wb') as f:
+            f.write(b'\xff' * MmapSignalBackend.SIZE)
+        with self.assertRaises(ValueError):
+            MmapSignalBackend(invalid_path)
+
+
 if __name__ == "__main__":
     unittest.main()